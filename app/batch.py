@@ -0,0 +1,119 @@
+# app/batch.py
+from typing import Dict, List, Optional, Tuple
+
+from app.profile_manager import ProfileManager
+from app.session import ProfileSession
+
+MAX_OPERATIONS = 500
+
+# op -> required field
+OPERATIONS = {
+    "add_subject": "subject",
+    "remove_subject": "subject",
+    "create_subject": "subject",
+    "delete_class": "class",
+}
+
+
+class BatchError(ValueError):
+    """The request itself is malformed (not one of its operations)"""
+
+
+def parse_operations(payload) -> Tuple[List[Dict], bool]:
+    """Validate {"operations": [...], "atomic": true}, returns (operations, atomic)"""
+    if not isinstance(payload, dict) or not isinstance(payload.get("operations"), list):
+        raise BatchError("operations ro'yxati kerak")
+    operations = payload["operations"]
+    if not operations:
+        raise BatchError("operations bo'sh")
+    if len(operations) > MAX_OPERATIONS:
+        raise BatchError(f"Bir so'rovda ko'pi bilan {MAX_OPERATIONS} ta amal")
+    atomic = payload.get("atomic", True)
+    if not isinstance(atomic, bool):
+        # bool("false") is True - only real JSON booleans are accepted
+        raise BatchError("atomic true yoki false bo'lishi kerak")
+    return operations, atomic
+
+
+class _Draft:
+    """Copy of the profile parts batch operations touch, applied only on commit"""
+
+    def __init__(self, profile: Dict, master_subjects: List[str]):
+        self.subjects = list(profile["data"]["subjects"])
+        self.classes = dict(profile["data"]["classes"])
+        self.master_subjects = set(master_subjects)
+        self.new_master_subjects: List[str] = []
+
+    def add_master_subject(self, subject: str):
+        if subject not in self.master_subjects:
+            self.master_subjects.add(subject)
+            self.new_master_subjects.append(subject)
+
+    def add_subject(self, subject: str):
+        # Adding keeps the list sorted, removing keeps the order - as the endpoints do
+        if subject not in self.subjects:
+            self.subjects.append(subject)
+            self.subjects.sort()
+
+    def apply(self, op: str, value: str) -> Tuple[bool, str]:
+        """Same semantics as the single-action endpoints"""
+        if op == "add_subject":
+            self.add_subject(value)
+            self.add_master_subject(value)
+            return True, f"'{value}' fani profilga qo'shildi"
+        if op == "remove_subject":
+            if value in self.subjects:
+                self.subjects.remove(value)
+            return True, f"'{value}' fani profildan olib tashlandi"
+        if op == "create_subject":
+            self.add_master_subject(value)
+            self.add_subject(value)
+            return True, f"'{value}' fani yaratildi va profilga qo'shildi"
+        if op == "delete_class":
+            if value not in self.classes:
+                return False, f"'{value}' sinfi topilmadi!"
+            del self.classes[value]
+            return True, f"'{value}' sinfi profilidan o'chirildi!"
+        return False, f"Noma'lum amal: {op}"
+
+
+def apply_batch(session: ProfileSession, profile_manager: ProfileManager,
+                operations: List[Dict], atomic: bool = True) -> Dict:
+    """Apply operations in order with one profile save and at most one master save
+
+    With `atomic` nothing is kept when any operation fails; otherwise
+    failed operations are skipped and the rest are applied. The profile
+    is saved first, so a failed save leaves master data unchanged.
+    """
+    profile: Optional[Dict] = session.profile
+    if not profile:
+        raise BatchError("Profil topilmadi")
+
+    draft = _Draft(profile, profile_manager.get_master_subjects())
+    subjects_before = list(draft.subjects)
+    classes_before = set(draft.classes)
+    results = []
+    for index, operation in enumerate(operations):
+        op = operation.get("op") if isinstance(operation, dict) else None
+        field = OPERATIONS.get(op)
+        value = str(operation.get(field) or "").strip() if field else ""
+        if field is None:
+            success, message = False, f"Noma'lum amal: {op}"
+        elif not value:
+            success, message = False, "Fan nomi kerak" if field == "subject" else "Sinf nomi kerak"
+        else:
+            success, message = draft.apply(op, value)
+        results.append({"index": index, "op": op, "success": success, "message": message})
+
+    failed = sum(1 for r in results if not r["success"])
+    if atomic and failed:
+        return {"success": False, "applied": False, "failed": failed, "results": results}
+
+    if draft.subjects != subjects_before or set(draft.classes) != classes_before:
+        profile["data"]["subjects"] = draft.subjects
+        profile["data"]["classes"] = draft.classes
+        session.mark_dirty()
+    session.flush()
+    if draft.new_master_subjects:
+        profile_manager.add_to_master_subjects(draft.new_master_subjects)
+    return {"success": not failed, "applied": True, "failed": failed, "results": results}
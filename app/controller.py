@@ -1,55 +1,112 @@
 # app/controller.py - TO'G'RILANGAN
-import json
 import os
 from typing import Optional
-from core import create_assessment_template
+from app.generation_cache import GenerationCache
+from app.log import get_logger
+from app.models import Profile
 from app.profile_manager import ProfileManager
 
+logger = get_logger(__name__)
+
 class AppController:
-    def __init__(self):
-        self.profile_manager = ProfileManager()
+    def __init__(self, profile_manager: Optional[ProfileManager] = None,
+                 shared_formulas: Optional[bool] = None,
+                 generation_cache: Optional[GenerationCache] = None):
+        self.profile_manager = profile_manager or ProfileManager()
+        # Identical requests (and pre-generated ones) are served from here when set
+        self.generation_cache = generation_cache
+        # Jami/% columns as shared formulas - smaller files, opt in with TAHLILCHI_SHARED_FORMULAS=1
+        if shared_formulas is None:
+            shared_formulas = os.environ.get("TAHLILCHI_SHARED_FORMULAS", "0") == "1"
+        self.shared_formulas = shared_formulas
+    
+    def _profile(self, profile_id: str, profile: Optional[dict]):
+        """Use the request's profile snapshot when given, else load it"""
+        if profile is not None:
+            return profile
+        return self.profile_manager.get_profile(profile_id)
+    
+    def _model(self, profile_id: str) -> Optional[Profile]:
+        """Cached typed profile (falls back to default like get_profile)"""
+        return self.profile_manager.get_profile_model(profile_id, fallback=True)
         
-    def get_classes(self, profile_id: str = "default"):
+    def get_classes(self, profile_id: str = "default", profile: Optional[dict] = None):
         """Get classes from profile"""
         try:
-            profile = self.profile_manager.get_profile(profile_id)
-            if profile and "data" in profile:
+            if profile is None:
+                model = self._model(profile_id)
+                return model.class_names() if model else []
+            if "data" in profile:
                 classes = profile["data"].get("classes", {})
                 return sorted(classes.keys())
-        except Exception as e:
-            print(f"❌ Error getting classes: {e}")
+        except Exception:
+            logger.exception("Error getting classes of profile %s", profile_id)
         return []
     
-    def get_students(self, sinf: str, profile_id: str = "default"):
+    def get_students(self, sinf: str, profile_id: str = "default", profile: Optional[dict] = None):
         """Get students from profile"""
         try:
-            profile = self.profile_manager.get_profile(profile_id)
-            if profile and "data" in profile:
+            if profile is None:
+                model = self._model(profile_id)
+                roster = model.classes.get(sinf) if model else None
+                if roster is None:
+                    return []
+                if roster.is_reference:
+                    return list(self.profile_manager.get_master_classes().get(roster.master, []))
+                return list(roster.students)
+            if "data" in profile:
                 return profile["data"].get("classes", {}).get(sinf, [])
-        except Exception as e:
-            print(f"❌ Error getting students: {e}")
+        except Exception:
+            logger.exception("Error getting students of %s in profile %s", sinf, profile_id)
         return []
     
-    def get_subjects(self, profile_id: str = "default"):
+    def get_subjects(self, profile_id: str = "default", profile: Optional[dict] = None):
         """Get subjects from profile"""
         try:
-            profile = self.profile_manager.get_profile(profile_id)
-            if profile and "data" in profile:
+            if profile is None:
+                model = self._model(profile_id)
+                return list(model.subjects) if model else []
+            if "data" in profile:
                 return profile["data"].get("subjects", [])
-        except Exception as e:
-            print(f"❌ Error getting subjects: {e}")
+        except Exception:
+            logger.exception("Error getting subjects of profile %s", profile_id)
         return []
     
-    def get_settings(self, profile_id: str = "default"):
+    def get_settings(self, profile_id: str = "default", profile: Optional[dict] = None):
         """Get settings from profile"""
         try:
-            profile = self.profile_manager.get_profile(profile_id)
-            if profile and "settings" in profile:
+            if profile is None:
+                model = self._model(profile_id)
+                return model.settings.to_dict() if model else {}
+            if "settings" in profile:
                 return profile["settings"]
-        except Exception as e:
-            print(f"❌ Error getting settings: {e}")
+        except Exception:
+            logger.exception("Error getting settings of profile %s", profile_id)
         return {}
     
+    def _template_input(self, sinf, fan, chorak, imtihon_nomi, profile_id, tuman, maktab,
+                        oibdo, metod_rahbari, fan_oqituvchisi, profile):
+        """Students of the class and the sheet config (form values override profile settings)"""
+        students = self.get_students(sinf, profile_id, profile=profile)
+        if not students:
+            raise ValueError(f"Tanlangan sinfda o'quvchilar yo'q: {sinf}")
+        
+        # Get settings from profile or use provided values
+        profile_settings = self.get_settings(profile_id, profile=profile)
+        
+        config = {
+            "tuman": tuman or profile_settings.get("tuman", ""),
+            "maktab": maktab or profile_settings.get("maktab", ""),
+            "oibdo": oibdo or profile_settings.get("oibdo", ""),
+            "metod_rahbari": metod_rahbari or profile_settings.get("metod_rahbari", ""),
+            "fan_oqituvchisi": fan_oqituvchisi or profile_settings.get("fan_oqituvchisi", ""),
+            "sinf": sinf,
+            "fan": fan,
+            "chorak": chorak,
+            "imtihon_nomi": imtihon_nomi
+        }
+        return students, config
+    
     def generate_excel(
         self,
         sinf: str,
@@ -65,31 +122,110 @@ class AppController:
         oibdo: str = None,
         metod_rahbari: str = None,
         fan_oqituvchisi: str = None,
+        profile: Optional[dict] = None,
     ):
         """Generate Excel with profile support"""
-        students = self.get_students(sinf, profile_id)
-        if not students:
-            raise ValueError(f"Tanlangan sinfda o'quvchilar yo'q: {sinf}")
+        students, config = self._template_input(sinf, fan, chorak, imtihon_nomi, profile_id, tuman,
+                                                maktab, oibdo, metod_rahbari, fan_oqituvchisi, profile)
         
-        # Get settings from profile or use provided values
-        profile_settings = self.get_settings(profile_id)
+        cache = self.generation_cache
+        if cache is not None:
+            key = cache.key(students, num_tasks, max_scores, config, self.shared_formulas)
+            cached_path = cache.get(key, output_dir)
+            if cached_path is not None:
+                return {
+                    'file_path': cached_path,
+                    'total_students': len(students),
+                    'total_tasks': num_tasks,
+                    'config': config,
+                    'cached': True
+                }
         
-        config = {
-            "tuman": tuman or profile_settings.get("tuman", ""),
-            "maktab": maktab or profile_settings.get("maktab", ""),
-            "oibdo": oibdo or profile_settings.get("oibdo", ""),
-            "metod_rahbari": metod_rahbari or profile_settings.get("metod_rahbari", ""),
-            "fan_oqituvchisi": fan_oqituvchisi or profile_settings.get("fan_oqituvchisi", ""),
-            "sinf": sinf,
-            "fan": fan,
-            "chorak": chorak,
-            "imtihon_nomi": imtihon_nomi
-        }
+        # openpyxl is only needed here - keep it out of app startup
+        from core import create_assessment_template
         
-        return create_assessment_template(
+        result = create_assessment_template(
             students_list=students,
             num_tasks=num_tasks,
             max_scores=max_scores,
             config=config,
-            output_dir=output_dir
-        )
\ No newline at end of file
+            output_dir=output_dir,
+            shared_formulas=self.shared_formulas
+        )
+        if cache is not None:
+            cache.put(key, result['file_path'])
+        return result
+    
+    def pregenerate(self, sinf: str, fan: str, chorak: str, imtihon_nomi: str, num_tasks: int,
+                    max_scores: list, profile_id: str = "default") -> bool:
+        """Build the workbook straight into the generation cache, False if it was already there"""
+        if self.generation_cache is None:
+            return False
+        students, config = self._template_input(sinf, fan, chorak, imtihon_nomi, profile_id,
+                                                None, None, None, None, None, None)
+        key = self.generation_cache.key(students, num_tasks, max_scores, config, self.shared_formulas)
+        if self.generation_cache.contains(key):
+            return False
+        
+        from core import create_assessment_template
+        
+        create_assessment_template(
+            students_list=students,
+            num_tasks=num_tasks,
+            max_scores=max_scores,
+            config=config,
+            output_dir=self.generation_cache.entry_dir(key),
+            shared_formulas=self.shared_formulas
+        )
+        return True
+    
+    def update_excel(
+        self,
+        source,
+        filename: str,
+        sinf: str,
+        output_dir: str,
+        profile_id: str = "default",
+        profile: Optional[dict] = None,
+    ):
+        """Fit an uploaded, partly filled workbook to the class's current roster"""
+        students = self.get_students(sinf, profile_id, profile=profile)
+        if not students:
+            raise ValueError(f"Tanlangan sinfda o'quvchilar yo'q: {sinf}")
+        
+        from core import update_assessment_workbook
+        from core.file_utils import ensure_output_dir, get_safe_filename
+        
+        name = get_safe_filename(os.path.splitext(os.path.basename(filename or ""))[0])
+        output_path = os.path.join(ensure_output_dir(output_dir), f"{name or get_safe_filename(sinf)}.xlsx")
+        return update_assessment_workbook(
+            source,
+            students_list=list(students),
+            output_path=output_path,
+            shared_formulas=self.shared_formulas
+        )
+    
+    def preview_html(
+        self,
+        sinf: str,
+        fan: str,
+        chorak: str,
+        imtihon_nomi: str,
+        num_tasks: int,
+        max_scores: list,
+        profile_id: str = "default",
+        tuman: str = None,
+        maktab: str = None,
+        oibdo: str = None,
+        metod_rahbari: str = None,
+        fan_oqituvchisi: str = None,
+        profile: Optional[dict] = None,
+    ) -> str:
+        """HTML table of the same sheet generate_excel would build, nothing is written"""
+        students, config = self._template_input(sinf, fan, chorak, imtihon_nomi, profile_id, tuman,
+                                                maktab, oibdo, metod_rahbari, fan_oqituvchisi, profile)
+        
+        from core import build_layout, render_html
+        
+        layout = build_layout(students, num_tasks, config, max_scores, self.shared_formulas)
+        return render_html(layout)
@@ -0,0 +1,66 @@
+# app/generation.py
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+
+
+class GenerationCounter:
+    """Host-wide change tokens shared by all worker processes
+
+    Every writer calls `bump(name)` after it saved, which atomically replaces
+    a tiny token file with a new unique value. Caches remember the token
+    they loaded under and compare it with `get(name)` before each use, so
+    a write in any worker invalidates the caches of all the others.
+    Tokens are unique rather than incremented, so concurrent writers
+    never need a lock and never produce the same value twice.
+    """
+
+    def __init__(self, directory: str = "data/.generations"):
+        self.directory = directory
+        self._prefix = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        safe = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in name)
+        return os.path.join(self.directory, safe)
+
+    def get(self, name: str) -> Optional[str]:
+        """Current token, None if nothing was written yet"""
+        try:
+            with open(self._path(name), 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def bump(self, name: str) -> str:
+        """Mark `name` as changed for every process on this host"""
+        with self._lock:
+            self._seq += 1
+            token = f"{self._prefix}-{self._seq}-{time.time_ns()}"
+        path = self._path(name)
+        tmp_path = f"{path}.{token}.tmp"
+        try:
+            f = open(tmp_path, 'w', encoding='utf-8')
+        except FileNotFoundError:
+            # First write on this host
+            os.makedirs(self.directory, exist_ok=True)
+            f = open(tmp_path, 'w', encoding='utf-8')
+        with f:
+            f.write(token)
+        os.replace(tmp_path, path)
+        return token
+
+
+_default: Optional[GenerationCounter] = None
+
+
+def default_generations() -> GenerationCounter:
+    """Process-wide counter under TAHLILCHI_GENERATIONS_DIR (data/.generations)"""
+    global _default
+    if _default is None:
+        _default = GenerationCounter(
+            os.environ.get("TAHLILCHI_GENERATIONS_DIR", "data/.generations"))
+    return _default
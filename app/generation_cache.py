@@ -0,0 +1,159 @@
+# app/generation_cache.py
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app.log import get_logger
+from app.metrics import record_cache
+
+logger = get_logger(__name__)
+
+# Bump when the workbook layout changes - old entries then never match
+CACHE_FORMAT = 1
+
+
+class GenerationCache:
+    """Generated workbooks keyed by everything that ends up in the sheet
+
+    The key hashes the roster, task count, max scores, sheet config and
+    formula mode, so a roster or settings change simply produces a new key
+    and nothing has to be invalidated. Entries live in `root/<key>/<file>`
+    and are replaced atomically. `get()` hands out a hard link outside the
+    cache, so `prune()` - which drops least recently used entries until the
+    cache fits into `max_bytes` - never deletes a file that is being served.
+    Entries used or written within `grace_seconds` are never pruned.
+    """
+
+    def __init__(self, root: str = "outputs/.cache", max_bytes: Optional[int] = 256 * 1024 * 1024,
+                 grace_seconds: float = 60):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.grace_seconds = grace_seconds
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, root: str = "outputs/.cache") -> Optional["GenerationCache"]:
+        """None unless TAHLILCHI_GENERATION_CACHE_MB sets a budget (opt-in, e.g. 256)"""
+        max_mb = os.environ.get("TAHLILCHI_GENERATION_CACHE_MB", "0")
+        if not max_mb or float(max_mb) <= 0:
+            return None
+        return cls(root, int(float(max_mb) * 1024 * 1024))
+
+    @staticmethod
+    def key(students: List[str], num_tasks: int, max_scores: Optional[list],
+            config: Dict, shared_formulas: bool) -> str:
+        payload = json.dumps([CACHE_FORMAT, list(students), num_tasks,
+                              [float(x) for x in max_scores] if max_scores else None,
+                              sorted((k, str(v or "")) for k, v in config.items()),
+                              bool(shared_formulas)],
+                             ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def _entry_file(self, key: str) -> Optional[str]:
+        try:
+            with os.scandir(self.entry_dir(key)) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".xlsx") and entry.is_file():
+                        return entry.path
+        except FileNotFoundError:
+            pass
+        return None
+
+    def contains(self, key: str) -> bool:
+        return self._entry_file(key) is not None
+
+    def get(self, key: str, output_dir: str) -> Optional[str]:
+        """Copy of the cached workbook in output_dir (hard link when possible), None on a miss
+
+        The caller serves its own link, so a prune() in this or another
+        worker can drop the entry without breaking the download.
+        """
+        path = self._entry_file(key)
+        if path is not None:
+            os.makedirs(output_dir, exist_ok=True)
+            try:
+                # Recently used entries survive prune()
+                os.utime(path)
+                path = self._link(path, os.path.join(output_dir, os.path.basename(path)))
+            except FileNotFoundError:
+                # Pruned between the lookup and the link
+                path = None
+        record_cache("generation", hit=path is not None)
+        return path
+
+    @staticmethod
+    def _link(source: str, target: str) -> str:
+        tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.link(source, tmp_path)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            # Other filesystem or no hard links there
+            shutil.copyfile(source, tmp_path)
+        # rename() is a no-op when both names are links to the same file
+        # (a repeated hit), which would leave the temp name behind
+        os.replace(tmp_path, target)
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        return target
+
+    def put(self, key: str, file_path: str) -> str:
+        """Store a copy of a freshly generated workbook (hard link when possible)"""
+        directory = self.entry_dir(key)
+        os.makedirs(directory, exist_ok=True)
+        return self._link(file_path, os.path.join(directory, os.path.basename(file_path)))
+
+    def _entries(self) -> List[tuple]:
+        """(mtime, size, directory) of every entry"""
+        entries = []
+        try:
+            dirs = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return entries
+        for entry in dirs:
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            mtime, size = 0.0, 0
+            try:
+                for f in os.scandir(entry.path):
+                    st = f.stat(follow_symlinks=False)
+                    mtime = max(mtime, st.st_mtime)
+                    size += st.st_size
+            except FileNotFoundError:
+                continue
+            entries.append((mtime, size, entry.path))
+        return entries
+
+    def usage(self) -> Dict:
+        entries = self._entries()
+        return {"entries": len(entries), "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes}
+
+    def prune(self, max_bytes: Optional[int] = None) -> int:
+        """Remove least recently used entries over the budget, returns how many"""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        if limit is None:
+            return 0
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            grace_limit = time.time() - self.grace_seconds
+            removed = 0
+            for mtime, size, path in entries:
+                if total <= limit or mtime > grace_limit:
+                    # Oldest first - the rest are in use or still being written
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                removed += 1
+            if removed:
+                logger.info("Generation cache pruned %d entries", removed)
+            return removed
@@ -0,0 +1,35 @@
+# app/log.py
+import logging
+import threading
+import time
+
+
+class RateLimitFilter(logging.Filter):
+    """Drop repeats of the same message template within `interval` seconds"""
+
+    def __init__(self, interval: float = 60.0):
+        super().__init__()
+        self.interval = interval
+        self._last_seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_seen.get(key)
+            if last is not None and now - last < self.interval:
+                return False
+            self._last_seen[key] = now
+        return True
+
+
+_rate_limit = RateLimitFilter()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for app modules - repeated messages are rate limited"""
+    logger = logging.getLogger(name)
+    if _rate_limit not in logger.filters:
+        logger.addFilter(_rate_limit)
+    return logger
@@ -0,0 +1,201 @@
+# app/master_data.py
+import hashlib
+import json
+import os
+import sys
+import threading
+from typing import Dict, List, Optional
+
+from app.generation import GenerationCounter, default_generations
+from app.log import get_logger
+from app.metrics import record_cache
+from app.models import intern_names
+from app.storage import Stamp, file_stamp, write_json_atomic
+
+logger = get_logger(__name__)
+
+
+def roster_digest(students: List[str]) -> str:
+    """Content stamp of one roster, stored next to its version"""
+    payload = json.dumps(list(students), ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class MasterDataService:
+    """In-memory copy of master subjects and classes
+
+    Files are read once and reloaded only when they change on disk
+    (inode/mtime/size), after a write through this service or when another
+    worker bumps the "master" generation. `version` grows on every reload
+    or write so callers can use it as a cache key.
+
+    Every class also has a roster version that profiles referencing it
+    remember. Writes through this service bump it when the roster changes;
+    a roster edited by hand no longer matches its stored digest and is
+    read one version higher, identically in every worker.
+    """
+
+    GENERATION = "master"
+
+    def __init__(self, profiles_dir: str = "data/profiles",
+                 generations: Optional[GenerationCounter] = None):
+        self.subjects_path = os.path.join(profiles_dir, "_master_subjects.json")
+        self.classes_path = os.path.join(profiles_dir, "_master_classes.json")
+        self.generations = generations or default_generations()
+        self.version = 0
+
+        self._lock = threading.RLock()
+        self._token: Optional[str] = None
+        self._stamps: Dict[str, Optional[Stamp]] = {}
+        self._subjects: List[str] = []
+        self._subject_set: set = set()
+        self._classes: Dict[str, List[str]] = {}
+        self._class_versions: Dict[str, int] = {}
+
+    def _read(self, path: str) -> Dict:
+        if not os.path.exists(path):
+            logger.warning("Master file not found: %s", path)
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error("Error loading master file %s: %s", path, e)
+            return {}
+
+    def _refresh(self):
+        """Reload files whose stamp changed since the last load"""
+        with self._lock:
+            token = self.generations.get(self.GENERATION)
+            if token != self._token:
+                # Another worker wrote master data - don't trust mtime resolution
+                self._stamps.clear()
+                self._token = token
+
+            version = self.version
+            stamp = file_stamp(self.subjects_path)
+            if self.subjects_path not in self._stamps or self._stamps[self.subjects_path] != stamp:
+                subjects = self._read(self.subjects_path).get("subjects", [])
+                self._subjects = subjects
+                self._subject_set = set(subjects)
+                self._stamps[self.subjects_path] = stamp
+                self.version += 1
+                logger.debug("Loaded %d master subjects", len(subjects))
+
+            stamp = file_stamp(self.classes_path)
+            if self.classes_path not in self._stamps or self._stamps[self.classes_path] != stamp:
+                data = self._read(self.classes_path)
+                # Interned names are shared with every profile that edits a copy
+                classes = {sys.intern(name): list(intern_names(roster))
+                           for name, roster in data.get("classes", {}).items()}
+                versions = data.get("versions", {})
+                digests = data.get("digests", {})
+                self._classes = classes
+                # Old master files have no versions yet - every class starts at 1
+                self._class_versions = {
+                    name: versions.get(name, 1) + (name in digests and digests[name] != roster_digest(roster))
+                    for name, roster in classes.items()}
+                self._stamps[self.classes_path] = stamp
+                self.version += 1
+                logger.debug("Loaded %d master classes", len(classes))
+
+            record_cache("master_data", hit=self.version == version)
+
+    def invalidate(self):
+        """Force a reload on next access"""
+        with self._lock:
+            self._stamps.clear()
+
+    def current_version(self) -> int:
+        """Version after picking up changes made on disk or by other workers"""
+        self._refresh()
+        return self.version
+
+    def etag(self) -> str:
+        """Content stamp of both master files - identical in every worker"""
+        with self._lock:
+            self._refresh()
+            return f"{self._stamps.get(self.subjects_path)}-{self._stamps.get(self.classes_path)}"
+
+    def last_modified(self) -> Optional[float]:
+        """Latest modification time (epoch seconds) of the master files"""
+        with self._lock:
+            self._refresh()
+            times = [stamp[1] for stamp in self._stamps.values() if stamp is not None]
+            return max(times) / 1e9 if times else None
+
+    def get_subjects(self) -> List[str]:
+        self._refresh()
+        return list(self._subjects)
+
+    def has_subject(self, subject: str) -> bool:
+        self._refresh()
+        return subject in self._subject_set
+
+    def get_classes(self) -> Dict[str, List[str]]:
+        """Class name -> roster; rosters are shared, replace them instead of editing"""
+        self._refresh()
+        return dict(self._classes)
+
+    def has_class(self, class_name: str) -> bool:
+        self._refresh()
+        return class_name in self._classes
+
+    def get_class_versions(self) -> Dict[str, int]:
+        self._refresh()
+        return dict(self._class_versions)
+
+    def _write(self, path: str, data: Dict):
+        self._stamps[path] = write_json_atomic(path, data)
+        self._token = self.generations.bump(self.GENERATION)
+        self.version += 1
+
+    def add_subjects(self, subjects: List[str]) -> List[str]:
+        """Add subjects to master list, returns the ones that were new"""
+        with self._lock:
+            self._refresh()
+            new_subjects = []
+            for subject in subjects:
+                if subject and subject not in self._subject_set:
+                    new_subjects.append(subject)
+                    self._subject_set.add(subject)
+
+            if new_subjects:
+                self._subjects = self._subjects + new_subjects
+                self._write(self.subjects_path, {"subjects": self._subjects})
+            return new_subjects
+
+    def _write_classes(self, rosters: Dict[str, List[str]]):
+        classes, versions = dict(self._classes), dict(self._class_versions)
+        for class_name, students in rosters.items():
+            classes[class_name] = list(intern_names(students))
+            versions[class_name] = versions.get(class_name, 0) + 1
+        self._classes = classes
+        self._class_versions = versions
+        self._write(self.classes_path, {
+            "classes": self._classes,
+            "versions": self._class_versions,
+            "digests": {name: roster_digest(roster) for name, roster in self._classes.items()},
+        })
+
+    def add_class(self, class_name: str, students: List[str]) -> bool:
+        """Add class to master data if it does not exist yet"""
+        with self._lock:
+            self._refresh()
+            if class_name in self._classes:
+                return False
+            self._write_classes({class_name: students})
+            return True
+
+    def set_classes(self, rosters: Dict[str, List[str]]) -> List[str]:
+        """Replace (or add) master rosters in one write, bumping their versions
+
+        Returns the classes that actually changed.
+        """
+        with self._lock:
+            self._refresh()
+            changed = {name: students for name, students in rosters.items()
+                       if self._classes.get(name) != list(students)}
+            if changed:
+                self._write_classes(changed)
+            return list(changed)
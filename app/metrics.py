@@ -0,0 +1,133 @@
+# app/metrics.py
+import bisect
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+from core.timing import add_stage_observer
+
+# Prometheus client defaults, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., sum, count]
+        self._values: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                row[index] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, row in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, row):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', repr(bound))])} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {int(row[-1])}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {row[-2]!r}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {int(row[-1])}")
+        return lines
+
+
+http_requests = Counter("tahlilchi_http_requests_total", "HTTP requests by route, method and status")
+http_duration = Histogram("tahlilchi_http_request_duration_seconds", "HTTP request latency by route")
+stage_duration = Histogram("tahlilchi_stage_duration_seconds",
+                           "Latency of pipeline stages (generate, upload parsing, profile storage)")
+cache_requests = Counter("tahlilchi_cache_requests_total", "Cache lookups by cache and result")
+
+_METRICS = (http_requests, http_duration, stage_duration, cache_requests)
+
+
+def record_request(route: str, method: str, status: int, seconds: float):
+    http_requests.inc(route=route, method=method, status=status)
+    http_duration.observe(seconds, route=route, method=method)
+
+
+def record_cache(cache: str, hit: bool):
+    cache_requests.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def _observe_stage(name: str, seconds: float):
+    stage_duration.observe(seconds, stage=name)
+
+
+def _cache_ratio_lines() -> List[str]:
+    totals: Dict[str, List[float]] = {}
+    for key, value in list(cache_requests._values.items()):
+        labels = dict(key)
+        row = totals.setdefault(labels["cache"], [0, 0])
+        row[0 if labels["result"] == "hit" else 1] += value
+    name = "tahlilchi_cache_hit_ratio"
+    lines = [f"# HELP {name} Share of cache lookups that were hits", f"# TYPE {name} gauge"]
+    for cache, (hits, misses) in sorted(totals.items()):
+        ratio = hits / (hits + misses) if hits + misses else 0
+        lines.append(f'{name}{{cache="{cache}"}} {ratio!r}')
+    return lines
+
+
+def render_prometheus() -> str:
+    """All metrics in Prometheus text exposition format 0.0.4"""
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    lines.extend(_cache_ratio_lines())
+    return "\n".join(lines) + "\n"
+
+
+add_stage_observer(_observe_stage)
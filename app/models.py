@@ -0,0 +1,171 @@
+# app/models.py
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def intern_names(names: Iterable) -> Tuple[str, ...]:
+    """Tuple of interned strings - equal names share one object across profiles"""
+    return tuple(sys.intern(str(n)) for n in names)
+
+
+class Settings:
+    """Profile settings (tuman, maktab, signatures, output_dir)"""
+
+    FIELDS = ("tuman", "maktab", "oibdo", "metod_rahbari", "fan_oqituvchisi", "output_dir")
+    __slots__ = FIELDS + ("extra",)
+
+    def __init__(self, tuman: str = "", maktab: str = "", oibdo: str = "",
+                 metod_rahbari: str = "", fan_oqituvchisi: str = "",
+                 output_dir: str = "outputs", extra: Optional[Dict] = None):
+        self.tuman = tuman
+        self.maktab = maktab
+        self.oibdo = oibdo
+        self.metod_rahbari = metod_rahbari
+        self.fan_oqituvchisi = fan_oqituvchisi
+        self.output_dir = output_dir
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "Settings":
+        data = data or {}
+        extra = {k: v for k, v in data.items() if k not in cls.FIELDS}
+        values = {k: sys.intern(data[k]) if isinstance(data[k], str) else data[k]
+                  for k in cls.FIELDS if k in data}
+        return cls(**values, extra=extra)
+
+    def to_dict(self) -> Dict:
+        data = {k: getattr(self, k) for k in self.FIELDS}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class ClassRoster:
+    """Students of one class
+
+    Either a private roster (`students` holds the names) or a reference
+    to the master roster of `master` at `master_version`.
+    """
+
+    __slots__ = ("name", "students", "master", "master_version")
+
+    def __init__(self, name: str, students: Tuple[str, ...] = (),
+                 master: Optional[str] = None, master_version: Optional[int] = None):
+        self.name = sys.intern(name)
+        self.students = students
+        self.master = master
+        self.master_version = master_version
+
+    @property
+    def is_reference(self) -> bool:
+        return self.master is not None
+
+    @classmethod
+    def from_stored(cls, name: str, value) -> "ClassRoster":
+        """Parse a roster as written in the profile file (list or master reference)"""
+        if isinstance(value, dict):
+            return cls(name, master=value.get("master", name), master_version=value.get("version"))
+        return cls(name, intern_names(value or []))
+
+    def to_stored(self):
+        if self.is_reference:
+            return {"master": self.master, "version": self.master_version}
+        return list(self.students)
+
+    def __len__(self) -> int:
+        return len(self.students)
+
+
+class Profile:
+    """Profile loaded from data/profiles/<profile_id>.json"""
+
+    HEADER = ("profile_id", "profile_name", "owner", "created_at", "last_modified", "is_active")
+    __slots__ = HEADER + ("settings", "classes", "subjects", "meta", "extra")
+
+    def __init__(self, profile_id: str, profile_name: str = "", owner: str = "user",
+                 created_at: str = "", last_modified: str = "", is_active: bool = True,
+                 settings: Optional[Settings] = None,
+                 classes: Optional[Dict[str, ClassRoster]] = None,
+                 subjects: Tuple[str, ...] = (),
+                 meta: Optional[Dict] = None, extra: Optional[Dict] = None):
+        self.profile_id = profile_id
+        self.profile_name = profile_name
+        self.owner = owner
+        self.created_at = created_at
+        self.last_modified = last_modified
+        self.is_active = is_active
+        self.settings = settings or Settings()
+        self.classes = classes or {}
+        self.subjects = subjects
+        self.meta = meta or {}
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Profile":
+        """Build from the JSON layout; classes may be lists or master references"""
+        known = set(cls.HEADER) | {"settings", "data", "meta"}
+        body = data.get("data", {}) or {}
+        return cls(
+            **{k: data[k] for k in cls.HEADER if k in data},
+            settings=Settings.from_dict(data.get("settings")),
+            classes={name: ClassRoster.from_stored(name, value)
+                     for name, value in (body.get("classes") or {}).items()},
+            subjects=intern_names(body.get("subjects") or []),
+            meta=dict(data.get("meta") or {}),
+            extra={k: v for k, v in data.items() if k not in known},
+        )
+
+    def _header_dict(self) -> Dict:
+        data = {k: getattr(self, k) for k in self.HEADER}
+        data["settings"] = self.settings.to_dict()
+        return data
+
+    def to_stored(self) -> Dict:
+        """JSON layout for the profile file, master references kept as is"""
+        data = self._header_dict()
+        data["data"] = {
+            "classes": {name: roster.to_stored() for name, roster in self.classes.items()},
+            "subjects": list(self.subjects),
+        }
+        data["meta"] = dict(self.meta)
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def to_dict(self, master_classes: Dict[str, List[str]]) -> Dict:
+        """JSON layout with master references replaced by the master rosters
+
+        Every roster is a fresh list - editing it never touches master data.
+        """
+        data = self._header_dict()
+        classes = {}
+        for name, roster in self.classes.items():
+            if roster.is_reference:
+                if roster.master in master_classes:
+                    classes[name] = list(master_classes[roster.master])
+            else:
+                classes[name] = list(roster.students)
+        data["data"] = {"classes": classes, "subjects": list(self.subjects)}
+        data["meta"] = dict(self.meta)
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def summary(self, master_classes: Dict[str, List[str]]) -> Dict:
+        """Header fields, meta and stats - what profile lists show, no rosters or settings"""
+        data = {k: getattr(self, k) for k in self.HEADER}
+        data["meta"] = dict(self.meta)
+        data["stats"] = self.stats(master_classes)
+        return data
+
+    def class_names(self) -> List[str]:
+        return sorted(self.classes)
+
+    def stats(self, master_classes: Dict[str, List[str]]) -> Dict:
+        students = 0
+        for roster in self.classes.values():
+            if roster.is_reference:
+                students += len(master_classes.get(roster.master, ()))
+            else:
+                students += len(roster.students)
+        return {"classes": len(self.classes), "students": students, "subjects": len(self.subjects)}
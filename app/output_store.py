@@ -0,0 +1,141 @@
+# app/output_store.py
+import hashlib
+import os
+import shutil
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.log import get_logger
+from core.file_utils import get_safe_filename
+
+logger = get_logger(__name__)
+
+
+class OutputStore:
+    """Generated workbooks under outputs/<profile_id>-<hash>/ with retention and quota
+
+    `sweep()` deletes files older than `max_age_days`, then the oldest files
+    until the whole store fits into `max_total_bytes`. Files younger than
+    `grace_seconds` are never deleted so in-flight downloads survive.
+    Dot-directories (the generation cache in outputs/.cache) have their
+    own budget and are left alone.
+    """
+
+    def __init__(self, root: str = "outputs", max_age_days: float = 30,
+                 max_total_bytes: Optional[int] = 1024 * 1024 * 1024,
+                 grace_seconds: float = 300):
+        self.root = root
+        self.max_age_days = max_age_days
+        self.max_total_bytes = max_total_bytes
+        self.grace_seconds = grace_seconds
+        self.last_report: Optional[Dict] = None
+        self._known_dirs = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, root: str = "outputs") -> "OutputStore":
+        max_mb = os.environ.get("TAHLILCHI_OUTPUT_MAX_MB", "1024")
+        return cls(
+            root=root,
+            max_age_days=float(os.environ.get("TAHLILCHI_OUTPUT_MAX_AGE_DAYS", "30")),
+            max_total_bytes=int(float(max_mb) * 1024 * 1024) if max_mb else None,
+        )
+
+    def profile_dir(self, profile_id: str) -> str:
+        """Directory for one profile's files, created on first use
+
+        Sanitizing can map different ids to the same name ("a/b", "a_b"),
+        so a short hash of the raw id keeps their directories apart.
+        """
+        profile_id = profile_id or "default"
+        digest = hashlib.sha1(profile_id.encode("utf-8")).hexdigest()[:8]
+        name = f"{get_safe_filename(profile_id) or 'default'}-{digest}"
+        path = os.path.join(self.root, name)
+        if path not in self._known_dirs:
+            os.makedirs(path, exist_ok=True)
+            self._known_dirs.add(path)
+        return path
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        """(mtime, size, path) of every file in the store"""
+        files = []
+        stack = [self.root]
+        while stack:
+            try:
+                entries = list(os.scandir(stack.pop()))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not entry.name.startswith("."):
+                            stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        files.append((st.st_mtime, st.st_size, entry.path))
+                except FileNotFoundError:
+                    continue
+        return files
+
+    def _remove_empty_dirs(self):
+        """Drop empty leftovers (old timestamp dirs, deleted profiles)"""
+        for dirpath, dirnames, filenames in os.walk(self.root, topdown=False):
+            if dirpath == self.root or dirnames or filenames:
+                continue
+            if any(part.startswith(".") for part in os.path.relpath(dirpath, self.root).split(os.sep)):
+                continue
+            try:
+                os.rmdir(dirpath)
+                self._known_dirs.discard(dirpath)
+            except OSError:
+                pass
+
+    def sweep(self) -> Dict:
+        """Enforce age and size limits, returns what was reclaimed"""
+        with self._lock:
+            started = time.perf_counter()
+            now = time.time()
+            files = sorted(self._scan())
+            total = sum(size for _, size, _ in files)
+            removed, reclaimed = 0, 0
+
+            age_limit = now - self.max_age_days * 86400 if self.max_age_days else None
+            grace_limit = now - self.grace_seconds
+            for mtime, size, path in files:
+                too_old = age_limit is not None and mtime < age_limit
+                over_quota = self.max_total_bytes is not None and total > self.max_total_bytes
+                if not (too_old or over_quota):
+                    # Sorted oldest first - nothing newer is too old either
+                    break
+                if mtime > grace_limit:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning("Could not remove %s: %s", path, e)
+                    continue
+                removed += 1
+                reclaimed += size
+                total -= size
+
+            self._remove_empty_dirs()
+            self.last_report = {
+                "removed_files": removed,
+                "reclaimed_bytes": reclaimed,
+                "remaining_files": len(files) - removed,
+                "remaining_bytes": total,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                "finished_at": now,
+            }
+            if removed:
+                logger.info("Output sweep removed %d files, reclaimed %.1f MB",
+                            removed, reclaimed / (1024 * 1024))
+            return self.last_report
+
+    def usage(self) -> Dict:
+        files = self._scan()
+        return {"files": len(files), "bytes": sum(size for _, size, _ in files),
+                "disk_free_bytes": shutil.disk_usage(self.root).free if os.path.isdir(self.root) else None}
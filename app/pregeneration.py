@@ -0,0 +1,210 @@
+# app/pregeneration.py
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.log import get_logger
+
+logger = get_logger(__name__)
+
+# Quarter start dates (MM-DD) of the school year, chorak 1..4
+DEFAULT_QUARTER_STARTS = ("09-02", "11-10", "01-12", "04-01")
+# Values of the generate form when a profile never submitted it
+DEFAULT_FORM = {"imtihon_nomi": "BSB", "num_tasks": 5, "max_scores": None}
+
+# (profile_id, class name, subject, chorak)
+Job = Tuple[str, str, str, str]
+
+
+def parse_quarter_starts(value: str) -> Tuple[Tuple[int, int], ...]:
+    """"09-02,11-10,01-12,04-01" -> ((9, 2), (11, 10), (1, 12), (4, 1))"""
+    starts = []
+    for part in value.split(","):
+        month, day = part.strip().split("-")
+        starts.append((int(month), int(day)))
+    return tuple(starts)
+
+
+def current_chorak(today: date, starts: Iterable[Tuple[int, int]]) -> str:
+    """Quarter the date falls into - the latest start on or before it"""
+    starts = list(starts)
+    # The school year begins with the first start; months before it belong to the previous year
+    year_start = starts[0]
+
+    def position(month_day):
+        month, day = month_day
+        return ((month - year_start[0]) % 12, day)
+
+    today_pos = position((today.month, today.day))
+    chorak = len(starts)
+    for index, start in enumerate(starts):
+        if position(start) <= today_pos:
+            chorak = index + 1
+    return str(chorak)
+
+
+class Pregenerator:
+    """Speculative background generation into the generation cache
+
+    After a roster upload (and on each quarter start) the likely
+    (class, subject, chorak) workbooks of a profile are queued and built
+    one by one in a worker thread, so the teachers' /generate requests
+    that follow are cache hits. The warmer yields to real traffic: it
+    waits until no request is in flight and the app was idle for
+    `idle_seconds`, sleeps after each job so that it uses at most
+    `cpu_share` of one core, and keeps the cache within its disk budget.
+    """
+
+    def __init__(self, controller, cpu_share: float = 0.25, idle_seconds: float = 2.0,
+                 quarter_starts: Iterable[Tuple[int, int]] = (), max_queue: int = 2000):
+        self.controller = controller
+        self.cpu_share = min(max(cpu_share, 0.01), 1.0)
+        self.idle_seconds = idle_seconds
+        self.quarter_starts = tuple(quarter_starts)
+        self.max_queue = max_queue
+        self._queue: "OrderedDict[Job, None]" = OrderedDict()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._in_flight = 0
+        self._last_request = 0.0
+        # profile_id -> last submitted generate form values
+        self._forms: Dict[str, Dict] = {}
+        self._last_scheduled: Optional[date] = None
+        self.stats = {"generated": 0, "skipped": 0, "failed": 0, "paused_seconds": 0.0,
+                      "last_job_at": None}
+
+    @classmethod
+    def from_env(cls, controller) -> Optional["Pregenerator"]:
+        """None unless TAHLILCHI_PREGENERATE=1 and the generation cache is enabled"""
+        if os.environ.get("TAHLILCHI_PREGENERATE", "0") != "1":
+            return None
+        if controller.generation_cache is None:
+            # The warmer only fills the cache - nothing to do without one
+            logger.warning("TAHLILCHI_PREGENERATE=1 ignored: set TAHLILCHI_GENERATION_CACHE_MB to enable the cache")
+            return None
+        starts = os.environ.get("TAHLILCHI_QUARTER_STARTS", ",".join(DEFAULT_QUARTER_STARTS))
+        return cls(
+            controller,
+            cpu_share=float(os.environ.get("TAHLILCHI_PREGENERATE_CPU", "0.25")),
+            idle_seconds=float(os.environ.get("TAHLILCHI_PREGENERATE_IDLE_SECONDS", "2")),
+            quarter_starts=parse_quarter_starts(starts) if starts.strip() else (),
+        )
+
+    # Demand tracking (called by the HTTP middleware)
+
+    def request_started(self):
+        self._in_flight += 1
+        self._last_request = time.monotonic()
+
+    def request_finished(self):
+        self._in_flight -= 1
+        self._last_request = time.monotonic()
+
+    def _busy(self) -> bool:
+        return self._in_flight > 0 or time.monotonic() - self._last_request < self.idle_seconds
+
+    # Queueing
+
+    def remember_form(self, profile_id: str, chorak: str, imtihon_nomi: str,
+                      num_tasks: int, max_scores: Optional[list]):
+        """Values of the last generate request - the next ones will most likely repeat them"""
+        self._forms[profile_id] = {"chorak": chorak, "imtihon_nomi": imtihon_nomi,
+                                   "num_tasks": num_tasks, "max_scores": max_scores}
+
+    def _chorak(self, profile_id: str) -> str:
+        form = self._forms.get(profile_id)
+        if form:
+            return form["chorak"]
+        if self.quarter_starts:
+            return current_chorak(date.today(), self.quarter_starts)
+        return "1"
+
+    def schedule(self, profile_id: str, classes: Optional[Iterable[str]] = None,
+                 chorak: Optional[str] = None) -> int:
+        """Queue every subject of the given classes (all classes by default), returns how many"""
+        class_names = list(classes) if classes is not None else self.controller.get_classes(profile_id)
+        subjects = self.controller.get_subjects(profile_id)
+        chorak = chorak or self._chorak(profile_id)
+        added = 0
+        for class_name in class_names:
+            for subject in subjects:
+                if len(self._queue) >= self.max_queue:
+                    logger.warning("Pre-generation queue is full, dropping the rest")
+                    break
+                job = (profile_id, class_name, subject, chorak)
+                if job not in self._queue:
+                    self._queue[job] = None
+                    added += 1
+        if added and self._wakeup is not None:
+            self._wakeup.set()
+        return added
+
+    def schedule_quarter_start(self, today: Optional[date] = None) -> int:
+        """Queue every profile once on the day a quarter starts"""
+        today = today or date.today()
+        if (today.month, today.day) not in self.quarter_starts or self._last_scheduled == today:
+            return 0
+        self._last_scheduled = today
+        chorak = current_chorak(today, self.quarter_starts)
+        profile_ids = [p["profile_id"] for p in self.controller.profile_manager.list_profiles()]
+        return sum(self.schedule(profile_id, chorak=chorak) for profile_id in profile_ids)
+
+    # Worker
+
+    def _run_job(self, job: Job) -> bool:
+        profile_id, class_name, subject, chorak = job
+        form = {**DEFAULT_FORM, **self._forms.get(profile_id, {})}
+        num_tasks = form["num_tasks"]
+        max_scores = form["max_scores"] or [10] * num_tasks
+        cache = self.controller.generation_cache
+        created = self.controller.pregenerate(class_name, subject, chorak, form["imtihon_nomi"],
+                                              num_tasks, max_scores, profile_id)
+        if created and cache.max_bytes is not None:
+            cache.prune()
+        return created
+
+    async def _wait_for_idle(self):
+        started = time.monotonic()
+        while self._busy():
+            await asyncio.sleep(max(0.05, self.idle_seconds / 4))
+        self.stats["paused_seconds"] = round(self.stats["paused_seconds"] + time.monotonic() - started, 3)
+
+    async def run(self):
+        """Worker loop, run as a background task for the app's lifetime"""
+        self._wakeup = asyncio.Event()
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            await self._wait_for_idle()
+            job, _ = self._queue.popitem(last=False)
+            started = time.perf_counter()
+            try:
+                created = await asyncio.to_thread(self._run_job, job)
+                self.stats["generated" if created else "skipped"] += 1
+            except Exception as e:
+                # Class or subject removed in the meantime, empty roster ...
+                self.stats["failed"] += 1
+                logger.warning("Pre-generation of %s failed: %s", job, e)
+            self.stats["last_job_at"] = time.time()
+            elapsed = time.perf_counter() - started
+            # Duty cycle: busy `elapsed`, then idle so the share stays at cpu_share
+            await asyncio.sleep(elapsed * (1 - self.cpu_share) / self.cpu_share)
+
+    async def run_schedule(self, check_seconds: float = 3600):
+        """Queue all profiles on quarter start days"""
+        while True:
+            try:
+                added = self.schedule_quarter_start()
+                if added:
+                    logger.info("Quarter start: %d workbooks queued for pre-generation", added)
+            except Exception:
+                logger.exception("Pre-generation schedule failed")
+            await asyncio.sleep(check_seconds)
+
+    def status(self) -> Dict:
+        return {"queued": len(self._queue), "in_flight_requests": self._in_flight,
+                "cpu_share": self.cpu_share, **self.stats}
@@ -1,16 +1,50 @@
 # app/profile_manager.py - TO'LIQ YANGILANGAN
 import json
 import os
-import shutil
 from datetime import datetime
-from typing import Dict, List, Optional, Set
+from typing import Dict, List, Optional
+
+from app.generation import GenerationCounter, default_generations
+from app.log import get_logger
+from app.metrics import record_cache
+from app.master_data import MasterDataService, roster_digest
+from app.models import ClassRoster, Profile, intern_names
+from app.storage import file_stamp, write_json_atomic
+from core.timing import stage
+
+logger = get_logger(__name__)
+
+# Generation names shared with other workers (see app.generation)
+PROFILES_INDEX_GENERATION = "profiles"
+
+
+def profile_generation(profile_id: str) -> str:
+    return f"profile.{profile_id}"
+
 
 class ProfileManager:
-    def __init__(self, profiles_dir: str = "data/profiles"):
+    def __init__(self, profiles_dir: str = "data/profiles",
+                 generations: Optional[GenerationCounter] = None,
+                 initialize: bool = True):
         self.profiles_dir = profiles_dir
-        os.makedirs(profiles_dir, exist_ok=True)
-        self._ensure_default_profile()
+        self.generations = generations or default_generations()
+        self.master = MasterDataService(profiles_dir, self.generations)
+        # profile_id -> (generation token, file stamp, Profile model)
+        self._cache: Dict[str, tuple] = {}
+        self._index_cache: Optional[tuple] = None
+        self.initialized = False
+        if initialize:
+            self.initialize()
+    
+    def initialize(self):
+        """Create profiles dir, master data and default profile (once per process)"""
+        if self.initialized:
+            return
+        os.makedirs(self.profiles_dir, exist_ok=True)
+        # Master data first - default profile references its rosters
         self._ensure_master_data()
+        self._ensure_default_profile()
+        self.initialized = True
     
     def _ensure_master_data(self):
         """Create master data files if not exists"""
@@ -39,8 +73,11 @@ class ProfileManager:
             else:
                 master_classes = {}
             
+            versions = {name: 1 for name in master_classes}
+            digests = {name: roster_digest(roster) for name, roster in master_classes.items()}
             with open(master_classes_path, 'w', encoding='utf-8') as f:
-                json.dump({"classes": master_classes}, f, ensure_ascii=False, indent=2)
+                json.dump({"classes": master_classes, "versions": versions, "digests": digests},
+                          f, ensure_ascii=False, indent=2)
     
     def _ensure_default_profile(self):
         """Create default profile if not exists"""
@@ -48,7 +85,7 @@ class ProfileManager:
         if os.path.exists(default_path):
             return
         
-        print("🔄 Default profile yaratilmoqda...")
+        logger.info("Default profile yaratilmoqda...")
         
         # Load master data
         master_subjects = self.get_master_subjects()
@@ -76,7 +113,9 @@ class ProfileManager:
                 "output_dir": settings.get("output_dir", "outputs")
             },
             "data": {
-                "classes": master_classes.copy(),  
+                # Rosters are shared with master data; save_profile stores
+                # them as references instead of copies
+                "classes": dict(master_classes),
                 "subjects": master_subjects.copy()
             },
             "meta": {
@@ -87,97 +126,206 @@ class ProfileManager:
         }
         
         self.save_profile("default", default_profile)
-        print(f"✅ Default profile yaratildi")
+        logger.info("Default profile yaratildi")
     
     def get_master_subjects(self) -> List[str]:
         """Get all subjects from master data"""
-        master_path = os.path.join(self.profiles_dir, "_master_subjects.json")
-        print(f"📂 Loading master subjects from: {master_path}")
-        
-        if os.path.exists(master_path):
-            try:
-                with open(master_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    subjects = data.get("subjects", [])
-                    print(f"✅ Loaded {len(subjects)} subjects from master file")
-                    return subjects
-            except Exception as e:
-                print(f"❌ Error loading master subjects: {e}")
-                return []
-        else:
-            print(f"❌ Master subjects file not found: {master_path}")
-            return []
+        return self.master.get_subjects()
 
     def get_master_classes(self) -> Dict:
         """Get all classes from master data"""
-        master_path = os.path.join(self.profiles_dir, "_master_classes.json")
-        print(f"📂 Loading master classes from: {master_path}")
-        
-        if os.path.exists(master_path):
-            try:
-                with open(master_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    classes = data.get("classes", {})
-                    print(f"✅ Loaded {len(classes)} classes from master file")
-                    return classes
-            except Exception as e:
-                print(f"❌ Error loading master classes: {e}")
-                return {}
-        else:
-            print(f"❌ Master classes file not found: {master_path}")
-            return {}
+        return self.master.get_classes()
+    
+    def get_master_class_versions(self) -> Dict[str, int]:
+        """Get roster version of every master class"""
+        return self.master.get_class_versions()
     
     def add_to_master_subjects(self, subjects: List[str]):
         """Add subjects to master list"""
-        master_path = os.path.join(self.profiles_dir, "_master_subjects.json")
-        current = self.get_master_subjects()
-        
-        new_subjects = []
-        for subject in subjects:
-            if subject and subject not in current:
-                new_subjects.append(subject)
-        
-        if new_subjects:
-            current.extend(new_subjects)
-            with open(master_path, 'w', encoding='utf-8') as f:
-                json.dump({"subjects": current}, f, ensure_ascii=False, indent=2)
-        
-        return new_subjects
+        return self.master.add_subjects(subjects)
     
     def add_to_master_classes(self, class_name: str, students: List[str]):
         """Add class to master data"""
-        master_path = os.path.join(self.profiles_dir, "_master_classes.json")
-        current = self.get_master_classes()
+        return self.master.add_class(class_name, students)
+    
+    def update_master_classes(self, rosters: Dict[str, List[str]]) -> List[str]:
+        """Replace (or add) master rosters copy-on-write, returns the classes that changed
+
+        Profiles referencing a class that changes first get its current
+        roster as a private copy, so a master edit never changes what
+        another profile shows.
+        """
+        master_classes = self.get_master_classes()
+        changed = {name: list(students) for name, students in rosters.items()
+                   if master_classes.get(name) != list(students)}
+        if not changed:
+            return []
+        for profile_id in self.profile_ids():
+            model = self.get_profile_model(profile_id)
+            if model is None:
+                continue
+            pinned = {name: roster.master for name, roster in model.classes.items()
+                      if roster.is_reference and roster.master in changed and roster.master in master_classes}
+            if not pinned:
+                continue
+            # Cached models are shared - detach a copy
+            detached = Profile.from_dict(model.to_stored())
+            for name, master in pinned.items():
+                detached.classes[name] = ClassRoster(name, intern_names(master_classes[master]))
+            detached.last_modified = datetime.now().isoformat()
+            self._write_model(profile_id, detached)
+            logger.info("Profile %s keeps its copy of %s before the master update",
+                        profile_id, ", ".join(sorted(pinned)))
+        return self.master.set_classes(changed)
+    
+    def _check_class_refs(self, model: Profile, master_versions: Dict[str, int]):
+        """Log references whose master roster is gone or was edited outside the app"""
+        for roster in model.classes.values():
+            if not roster.is_reference:
+                continue
+            if roster.master not in master_versions:
+                logger.error("Master class not found for reference: %s", roster.master)
+            elif roster.master_version != master_versions[roster.master]:
+                # update_master_classes() detaches references first - only a
+                # hand-edited master file gets here, and its old roster is gone
+                logger.warning("Master class '%s' changed outside the app since v%s, using current roster",
+                               roster.master, roster.master_version)
+    
+    def _keep_dangling_refs(self, previous: Profile, model: Profile):
+        """Carry over references whose master class is missing
+
+        They are left out of the dict callers edit (there is no roster to
+        show), so without this the next save would drop them for good.
+        """
+        master_classes = None
+        for name, roster in previous.classes.items():
+            if not roster.is_reference or name in model.classes:
+                continue
+            if master_classes is None:
+                master_classes = self.get_master_classes()
+            if roster.master not in master_classes:
+                model.classes[name] = roster
+    
+    def _dehydrate_classes(self, model: Profile):
+        """Store rosters equal to master data as references (copy-on-write)"""
+        if not model.classes:
+            return
         
-        if class_name not in current:
-            current[class_name] = students
-            with open(master_path, 'w', encoding='utf-8') as f:
-                json.dump({"classes": current}, f, ensure_ascii=False, indent=2)
-            return True
-        return False
+        master_classes = self.get_master_classes()
+        master_versions = self.get_master_class_versions()
+        for name, roster in model.classes.items():
+            if roster.is_reference:
+                continue
+            master_roster = master_classes.get(name)
+            if master_roster is not None and len(master_roster) == len(roster.students) \
+                    and tuple(master_roster) == roster.students:
+                model.classes[name] = ClassRoster(name, master=name,
+                                                  master_version=master_versions.get(name, 1))
+            # Otherwise the profile edited this class - keep its private copy
     
     def get_profile(self, profile_id: str = "default") -> Optional[Dict]:
         """Get profile by ID"""
         if not profile_id or profile_id == "undefined":
             profile_id = "default"
         
-        path = os.path.join(self.profiles_dir, f"{profile_id}.json")
-        if os.path.exists(path):
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+        model = self.get_profile_model(profile_id)
+        if model is not None:
+            self._check_class_refs(model, self.get_master_class_versions())
+            return model.to_dict(self.get_master_classes())
         
         # Fallback to default
         if profile_id != "default":
             return self.get_profile("default")
         return None
     
+    def get_profile_model(self, profile_id: str, fallback: bool = False) -> Optional[Profile]:
+        """Typed profile, served from cache while its generation and file are unchanged
+
+        The model is shared with other callers - read it, don't modify it.
+        With `fallback` unknown IDs resolve to the default profile like get_profile.
+        """
+        if not profile_id or profile_id == "undefined":
+            profile_id = "default"
+        if fallback:
+            model = self.get_profile_model(profile_id)
+            if model is None and profile_id != "default":
+                model = self.get_profile_model("default")
+            return model
+        
+        # Read token and stamp before the file: a concurrent save then only
+        # causes one extra reload, never a stale cache entry. The stamp also
+        # catches profile files edited by hand.
+        path = os.path.join(self.profiles_dir, f"{profile_id}.json")
+        token = self.generations.get(profile_generation(profile_id))
+        stamp = file_stamp(path)
+        cached = self._cache.get(profile_id)
+        if cached is not None and cached[:2] == (token, stamp):
+            record_cache("profile", hit=True)
+            return cached[2]
+        
+        record_cache("profile", hit=False)
+        if stamp is None:
+            self._cache.pop(profile_id, None)
+            return None
+        try:
+            with stage("profile.load"), open(path, 'r', encoding='utf-8') as f:
+                model = Profile.from_dict(json.load(f))
+        except FileNotFoundError:
+            self._cache.pop(profile_id, None)
+            return None
+        self._cache[profile_id] = (token, stamp, model)
+        return model
+    
+    def iter_classes(self, profile_id: str = "default", after: Optional[str] = None):
+        """Yield (class_name, students) in name order, resolving one roster at a time
+
+        `after` is a pagination cursor: only classes sorted after it are yielded.
+        """
+        model = self.get_profile_model(profile_id, fallback=True)
+        if model is None:
+            return
+        
+        master_classes = None
+        for name in model.class_names():
+            if after is not None and name <= after:
+                continue
+            roster = model.classes[name]
+            if roster.is_reference:
+                if master_classes is None:
+                    master_classes = self.get_master_classes()
+                if roster.master not in master_classes:
+                    continue
+                yield name, list(master_classes[roster.master])
+            else:
+                yield name, list(roster.students)
+    
+    def get_profile_stamp(self, profile_id: str = "default") -> Optional[tuple]:
+        """(resolved profile_id, last_modified) without materializing the profile"""
+        model = self.get_profile_model(profile_id, fallback=True)
+        if model is None:
+            return None
+        return model.profile_id, model.last_modified
+    
     def save_profile(self, profile_id: str, data: Dict):
         """Save profile to file"""
         data["last_modified"] = datetime.now().isoformat()
+        previous = self.get_profile_model(profile_id)
+        # Caller keeps the materialized rosters, only the file holds references
+        model = Profile.from_dict(data)
+        if previous is not None:
+            self._keep_dangling_refs(previous, model)
+        self._dehydrate_classes(model)
+        self._write_model(profile_id, model)
+    
+    def _write_model(self, profile_id: str, model: Profile):
         path = os.path.join(self.profiles_dir, f"{profile_id}.json")
-        
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        with stage("profile.save"):
+            stamp = write_json_atomic(path, model.to_stored())
+        token = self.generations.bump(profile_generation(profile_id))
+        self.generations.bump(PROFILES_INDEX_GENERATION)
+        # The stamp is of this write: if another worker replaced the file
+        # meanwhile, the next read sees a different stamp and reloads
+        self._cache[profile_id] = (token, stamp, model)
     
     def update_profile_settings(self, profile_id: str, settings: Dict):
         """Update only settings of a profile"""
@@ -211,7 +359,7 @@ class ProfileManager:
         # Filter subjects
         if selected_subjects:
             # Only include subjects that exist in master
-            subjects = [s for s in selected_subjects if s in master_subjects]
+            subjects = [s for s in selected_subjects if self.master.has_subject(s)]
             if not subjects:  # If none selected, use all
                 subjects = master_subjects.copy()
         else:
@@ -219,9 +367,10 @@ class ProfileManager:
         
         # Filter classes
         if selected_classes:
-            classes = {k: v for k, v in master_classes.items() if k in selected_classes}
+            selected = set(selected_classes)
+            classes = {k: v for k, v in master_classes.items() if k in selected}
         else:
-            classes = master_classes.copy()
+            classes = dict(master_classes)
         
         # Create profile
         profile = {
@@ -261,8 +410,7 @@ class ProfileManager:
             self.save_profile(profile_id, profile)
         
         # Also add to master if not exists
-        master_subjects = self.get_master_subjects()
-        if subject not in master_subjects:
+        if not self.master.has_subject(subject):
             self.add_to_master_subjects([subject])
         
         return True
@@ -294,22 +442,38 @@ class ProfileManager:
         
         return True
     
+    def profiles_version(self) -> str:
+        """Changes whenever any profile or master data is saved, in any worker"""
+        return f"{self.generations.get(PROFILES_INDEX_GENERATION)}-{self.master.etag()}"
+    
+    def profile_ids(self) -> List[str]:
+        """IDs of all profile files (master data files excluded)"""
+        return [filename[:-5] for filename in os.listdir(self.profiles_dir)
+                if filename.endswith('.json') and not filename.startswith('_')]
+    
     def list_profiles(self) -> List[Dict]:
-        """List all available profiles (excluding master data files)"""
+        """Header fields, meta and stats of every profile (rosters are not resolved)"""
+        # Profile files edited by hand or removed change the stamps, not the generation
+        profile_ids = sorted(self.profile_ids())
+        stamps = tuple((profile_id, file_stamp(os.path.join(self.profiles_dir, f"{profile_id}.json")))
+                       for profile_id in profile_ids)
+        index_key = (self.generations.get(PROFILES_INDEX_GENERATION),
+                     self.master.current_version(), stamps)
+        if self._index_cache is not None and self._index_cache[0] == index_key:
+            record_cache("profile_index", hit=True)
+            return self._copy_summaries(self._index_cache[1])
+        record_cache("profile_index", hit=False)
+        
         profiles = []
-        for filename in os.listdir(self.profiles_dir):
-            if filename.endswith('.json') and not filename.startswith('_'):
-                profile_id = filename[:-5]
-                profile = self.get_profile(profile_id)
-                if profile:
-                    # Add statistics
-                    profile_stats = {
-                        **profile,
-                        "stats": {
-                            "classes": len(profile.get("data", {}).get("classes", {})),
-                            "students": sum(len(c) for c in profile.get("data", {}).get("classes", {}).values()),
-                            "subjects": len(profile.get("data", {}).get("subjects", []))
-                        }
-                    }
-                    profiles.append(profile_stats)
-        return profiles
\ No newline at end of file
+        master_classes = self.get_master_classes()
+        for profile_id in profile_ids:
+            model = self.get_profile_model(profile_id)
+            if model:
+                profiles.append(model.summary(master_classes))
+        self._index_cache = (index_key, profiles)
+        return self._copy_summaries(profiles)
+    
+    @staticmethod
+    def _copy_summaries(profiles: List[Dict]) -> List[Dict]:
+        # Callers may edit what they get - the cached entries stay untouched
+        return [{**p, "meta": dict(p["meta"]), "stats": dict(p["stats"])} for p in profiles]
@@ -0,0 +1,161 @@
+# app/profiling.py
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.log import get_logger
+
+logger = get_logger(__name__)
+
+TOKEN_HEADER = "X-Profile-Token"
+REPORT_HEADER = "X-Profile-Report"
+_REPORT_NAME = re.compile(r"^[0-9]{8}-[0-9]{6}-[0-9]{3}-[A-Za-z0-9_.-]+\.(prof|txt)$")
+
+
+class RequestProfiler:
+    """Opt-in CPU (cProfile) and memory (tracemalloc) profiling of live requests
+
+    A request is profiled when it carries the admin token in the
+    X-Profile-Token header, or when its path is listed in `routes`
+    ("/admin-upload", or "/profile/*" for a prefix). Each profiled request
+    leaves `<stamp>-<path>.prof` (pstats, e.g. for snakeviz) and a `.txt`
+    summary in `report_dir`; only the newest `max_reports` are kept.
+
+    Only one request is profiled at a time - cProfile is per interpreter,
+    and concurrent requests on the event loop show up in the same profile.
+    """
+
+    def __init__(self, token: str, routes: Optional[List[str]] = None,
+                 report_dir: str = "logs/profiles", max_reports: int = 50, top: int = 30):
+        self.token = token
+        self.routes = [r for r in (routes or []) if r]
+        self.report_dir = report_dir
+        self.max_reports = max_reports
+        self.top = top
+        self._busy = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["RequestProfiler"]:
+        """None unless TAHLILCHI_PROFILING_TOKEN is set - then nothing is installed at all"""
+        token = os.environ.get("TAHLILCHI_PROFILING_TOKEN", "")
+        if not token:
+            return None
+        routes = os.environ.get("TAHLILCHI_PROFILE_ROUTES", "").split(",")
+        return cls(
+            token=token,
+            routes=[r.strip() for r in routes],
+            report_dir=os.environ.get("TAHLILCHI_PROFILE_DIR", "logs/profiles"),
+            max_reports=int(os.environ.get("TAHLILCHI_PROFILE_MAX_REPORTS", "50")),
+        )
+
+    def authorized(self, headers, query_params=None) -> bool:
+        supplied = headers.get(TOKEN_HEADER) or (query_params or {}).get("token") or ""
+        return hmac.compare_digest(supplied.encode(), self.token.encode())
+
+    def wants(self, path: str, headers) -> bool:
+        if TOKEN_HEADER in headers:
+            return self.authorized(headers)
+        for route in self.routes:
+            if path == route or (route.endswith("*") and path.startswith(route[:-1])):
+                return True
+        return False
+
+    async def profile(self, request, call_next):
+        """Run the rest of the stack under the profilers and save a report"""
+        if not self._busy.acquire(blocking=False):
+            response = await call_next(request)
+            response.headers[REPORT_HEADER] = "busy"
+            return response
+
+        try:
+            tracing = tracemalloc.is_tracing()
+            if not tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                response = await call_next(request)
+            finally:
+                profiler.disable()
+                elapsed = time.perf_counter() - started
+                snapshot = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+                if not tracing:
+                    tracemalloc.stop()
+        finally:
+            self._busy.release()
+
+        try:
+            name = self._save(request.method, request.url.path, response.status_code,
+                              elapsed, peak, profiler, snapshot)
+            response.headers[REPORT_HEADER] = name
+        except OSError as e:
+            logger.warning("Could not save profile report: %s", e)
+        return response
+
+    def _save(self, method: str, path: str, status: int, elapsed: float, peak: int,
+              profiler: cProfile.Profile, snapshot: tracemalloc.Snapshot) -> str:
+        os.makedirs(self.report_dir, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", path.strip("/")) or "root"
+        stem = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')[:-3]}-{slug[:60]}"
+        profiler.dump_stats(os.path.join(self.report_dir, f"{stem}.prof"))
+
+        out = io.StringIO()
+        out.write(f"{method} {path} -> {status}\n")
+        out.write(f"duration: {elapsed * 1000:.1f} ms\n")
+        out.write(f"peak traced memory: {peak / (1024 * 1024):.2f} MB\n\n")
+        out.write(f"== CPU: top {self.top} by cumulative time ==\n")
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(self.top)
+        out.write(f"\n== Memory: top {self.top} allocation sites ==\n")
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        for line in snapshot.statistics("lineno")[:self.top]:
+            out.write(f"{line}\n")
+        with open(os.path.join(self.report_dir, f"{stem}.txt"), "w", encoding="utf-8") as f:
+            f.write(out.getvalue())
+
+        self._prune()
+        logger.info("Profile report saved: %s (%.1f ms)", stem, elapsed * 1000)
+        return f"{stem}.txt"
+
+    def _prune(self):
+        """Keep the newest `max_reports` reports (.prof + .txt pairs)"""
+        stems = sorted({os.path.splitext(n)[0] for n in os.listdir(self.report_dir)
+                        if _REPORT_NAME.match(n)})
+        for stem in stems[:-self.max_reports] if self.max_reports > 0 else stems:
+            for ext in (".prof", ".txt"):
+                try:
+                    os.remove(os.path.join(self.report_dir, stem + ext))
+                except FileNotFoundError:
+                    pass
+
+    def list_reports(self) -> List[Dict]:
+        try:
+            names = os.listdir(self.report_dir)
+        except FileNotFoundError:
+            return []
+        reports = []
+        for name in sorted(names, reverse=True):
+            if _REPORT_NAME.match(name):
+                st = os.stat(os.path.join(self.report_dir, name))
+                reports.append({"name": name, "bytes": st.st_size, "modified": st.st_mtime})
+        return reports
+
+    def report_path(self, name: str) -> Optional[str]:
+        """Path of a saved report, None for unknown or unsafe names"""
+        if not _REPORT_NAME.match(name):
+            return None
+        path = os.path.join(self.report_dir, name)
+        return path if os.path.isfile(path) else None
@@ -0,0 +1,219 @@
+# app/request_log.py
+"""Structured per-request timing log (JSON lines) and its offline analyzer
+
+Each request appends one record to logs/requests-<pid>.jsonl (rotated):
+route, profile id, roster size, num_tasks, upload bytes, stage timings
+and outcome. Every worker process writes and rotates its own file, so
+`uvicorn --workers N` never has two processes rotating the same one.
+Analyze with:
+
+    python -m app.request_log 'logs/requests-*.jsonl*' --top 10
+"""
+import argparse
+import contextvars
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Dict, Iterable, List, Optional
+
+from core.timing import add_stage_observer
+
+_current: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("request_record", default=None)
+
+
+def annotate(**fields):
+    """Add fields (roster_size, num_tasks, upload_bytes, ...) to the current request's record"""
+    record = _current.get()
+    if record is not None:
+        record.update(fields)
+
+
+def _collect_stage(name: str, seconds: float):
+    record = _current.get()
+    if record is not None:
+        stages = record.setdefault("stages", {})
+        stages[name] = round(stages.get(name, 0) + seconds * 1000, 3)
+
+
+add_stage_observer(_collect_stage)
+
+
+class RequestLog:
+    """Appends one JSON line per request; disabled when path is empty
+
+    Nothing is created until `open()` (called from the app's lifespan hook,
+    i.e. inside each worker) - importing the app leaves the disk alone.
+    """
+
+    def __init__(self, path: Optional[str] = "logs/requests.jsonl",
+                 max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.file_path: Optional[str] = None
+        self._logger = None
+
+    @classmethod
+    def from_env(cls) -> "RequestLog":
+        return cls(os.environ.get("TAHLILCHI_REQUEST_LOG", "logs/requests.jsonl"))
+
+    def open(self):
+        """Start writing to <path stem>-<pid><ext> (logs/requests-1234.jsonl)"""
+        if not self.path or self._logger is not None:
+            return
+        stem, ext = os.path.splitext(self.path)
+        self.file_path = f"{stem}-{os.getpid()}{ext}"
+        os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+        handler = RotatingFileHandler(self.file_path, maxBytes=self.max_bytes,
+                                      backupCount=self.backup_count, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger(f"tahlilchi.request_log.{self.file_path}")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.handlers = [handler]
+        self._logger = logger
+
+    def close(self):
+        if self._logger is None:
+            return
+        for handler in self._logger.handlers:
+            handler.close()
+        self._logger.handlers = []
+        self._logger = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._logger is not None
+
+    def start(self, method: str, path: str, profile_id: Optional[str]):
+        """Begin the record for this request, returns a token for finish()"""
+        record = {"ts": datetime.now().isoformat(timespec="milliseconds"),
+                  "method": method, "path": path, "profile_id": profile_id}
+        return _current.set(record), time.perf_counter()
+
+    def finish(self, started, route: str, status: int, error: Optional[str] = None):
+        token, t0 = started
+        record = _current.get()
+        _current.reset(token)
+        if record is None or not self.enabled:
+            return
+        record["route"] = route
+        record["status"] = status
+        record["duration_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+        if error:
+            record["outcome"] = "error"
+            record["error"] = error
+        elif "outcome" not in record:
+            # Handlers annotate errors they render as a 200 page themselves
+            record["outcome"] = "ok" if status < 400 else ("client_error" if status < 500 else "error")
+        self._logger.info(json.dumps(record, ensure_ascii=False))
+
+
+# --- Offline analyzer ---
+
+def read_records(paths: Iterable[str]) -> List[Dict]:
+    records = []
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+    return records
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5 - 1e-9)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(values: List[float]) -> Dict:
+    values = sorted(values)
+    return {"count": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": values[-1] if values else 0.0}
+
+
+def analyze(records: List[Dict], top: int = 10) -> Dict:
+    by_route: Dict[str, List[float]] = {}
+    by_stage: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for r in records:
+        route = f"{r.get('method', '')} {r.get('route', r.get('path', '?'))}"
+        by_route.setdefault(route, []).append(r.get("duration_ms", 0.0))
+        if r.get("outcome") == "error":
+            errors[route] = errors.get(route, 0) + 1
+        for stage, ms in (r.get("stages") or {}).items():
+            by_stage.setdefault(stage, []).append(ms)
+
+    slowest = sorted(records, key=lambda r: r.get("duration_ms", 0.0), reverse=True)[:top]
+    return {
+        "routes": {k: {**summarize(v), "errors": errors.get(k, 0)} for k, v in sorted(by_route.items())},
+        "stages": {k: summarize(v) for k, v in sorted(by_stage.items())},
+        "slowest": slowest,
+    }
+
+
+def _print_table(title: str, rows: Dict[str, Dict], extra: str = None):
+    print(f"\n{title}")
+    header = f"{'':<45} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"
+    if extra:
+        header += f" {extra:>7}"
+    print(header)
+    for name, s in rows.items():
+        line = (f"{name[:45]:<45} {s['count']:>7} {s['p50']:>9.1f} {s['p95']:>9.1f} "
+                f"{s['p99']:>9.1f} {s['max']:>9.1f}")
+        if extra:
+            line += f" {s[extra]:>7}"
+        print(line)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Per-route / per-stage latency report (ms) from request logs")
+    parser.add_argument("paths", nargs="*", default=["logs/requests-*.jsonl*"],
+                        help="log files or globs (all workers and rotated files by default)")
+    parser.add_argument("--top", type=int, default=10, help="number of slowest requests to list")
+    parser.add_argument("--route", help="only requests whose route contains this text")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    records = read_records(args.paths)
+    if args.route:
+        records = [r for r in records if args.route in str(r.get("route", r.get("path", "")))]
+    if not records:
+        print("No request records found", file=sys.stderr)
+        return 1
+
+    report = analyze(records, args.top)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+
+    _print_table("Routes (ms)", report["routes"], extra="errors")
+    _print_table("Stages (ms)", report["stages"])
+    print(f"\nSlowest {len(report['slowest'])} requests")
+    for r in report["slowest"]:
+        stages = ", ".join(f"{k}={v:.0f}" for k, v in (r.get("stages") or {}).items())
+        print(f"{r.get('duration_ms', 0):>9.1f}  {r.get('ts', '')}  {r.get('method', '')} "
+              f"{r.get('path', '')}  profile={r.get('profile_id')}  status={r.get('status')}"
+              f"{'  ' + stages if stages else ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
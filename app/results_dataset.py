@@ -0,0 +1,191 @@
+# app/results_dataset.py
+import os
+import uuid
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import quote
+
+from app.log import get_logger
+from core.timing import stage
+
+logger = get_logger(__name__)
+
+# Directory levels: school_year=2025-2026/chorak=1/subject=Matematika/
+PARTITIONS = ("school_year", "chorak", "subject")
+COLUMNS = PARTITIONS + ("profile_id", "class_name", "student", "task", "score",
+                        "max_score", "total", "percent")
+FILTERABLE = PARTITIONS + ("profile_id", "class_name", "task")
+_ROW_COLUMNS = ("student", "task", "score", "max_score", "total", "percent")
+
+
+def _segment(value) -> str:
+    # Class and subject names may contain '/', spaces and apostrophes
+    return quote(str(value), safe="")
+
+
+class ResultsDataset:
+    """Hive-partitioned Parquet copy of the results store, student x task rows
+
+    One file per result set, named by profile, class and the set's content
+    digest, so re-ingesting a set replaces just that file and `sync()` can
+    tell stale files apart without reading them. Files are written to a
+    dot-prefixed temp name first - readers skip those - and then renamed.
+    pandas and pyarrow are imported on first use only.
+    """
+
+    def __init__(self, root: str = "data/results_parquet"):
+        self.root = root
+
+    @classmethod
+    def from_env(cls) -> "ResultsDataset":
+        return cls(os.environ.get("TAHLILCHI_RESULTS_DATASET", "data/results_parquet"))
+
+    def _partition_dir(self, result_set: Dict) -> str:
+        return os.path.join(self.root, *(f"{name}={_segment(result_set[name])}" for name in PARTITIONS))
+
+    @staticmethod
+    def _file_prefix(result_set: Dict) -> str:
+        return f"{_segment(result_set['profile_id'])}+{_segment(result_set['class_name'])}+"
+
+    def set_path(self, result_set: Dict) -> str:
+        name = f"{self._file_prefix(result_set)}{result_set['digest'][:16]}.parquet"
+        return os.path.join(self._partition_dir(result_set), name)
+
+    # Writing
+
+    def write_set(self, result_set: Dict, rows: List[Dict]) -> str:
+        """Write one set (a ResultsStore.result_sets() item) and drop its older files"""
+        import pandas as pd
+
+        frame = pd.DataFrame(rows, columns=list(_ROW_COLUMNS))
+        frame.insert(0, "profile_id", result_set["profile_id"])
+        frame.insert(1, "class_name", result_set["class_name"])
+        frame = frame.astype({"task": "int32", "score": "float64", "max_score": "float64",
+                              "total": "float64", "percent": "float64"})
+        path = self.set_path(result_set)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, f".{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            with stage("dataset.write"):
+                frame.to_parquet(tmp_path, engine="pyarrow", index=False)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._remove_files(directory, self._file_prefix(result_set), keep=os.path.basename(path))
+        return path
+
+    @staticmethod
+    def _remove_files(directory: str, prefix: str, keep: Optional[str] = None) -> int:
+        removed = 0
+        for entry in os.scandir(directory):
+            if entry.name.startswith(prefix) and entry.name != keep:
+                os.remove(entry.path)
+                removed += 1
+        return removed
+
+    def remove_sets(self, result_sets: List[Dict]) -> int:
+        """Delete the files of sets removed from the store, returns how many"""
+        removed = 0
+        for result_set in result_sets:
+            directory = self._partition_dir(result_set)
+            if os.path.isdir(directory):
+                removed += self._remove_files(directory, self._file_prefix(result_set))
+        return removed
+
+    def _files(self) -> List[str]:
+        paths = []
+        for directory, _, names in os.walk(self.root):
+            paths.extend(os.path.join(directory, name) for name in names if name.endswith(".parquet"))
+        return paths
+
+    def sync(self, store, year: Optional[str] = None) -> Dict:
+        """Bring the dataset in line with the store: write missing sets, remove stale files"""
+        result_sets = store.result_sets(year)
+        expected = {os.path.normpath(self.set_path(s)): s for s in result_sets}
+        existing = set(map(os.path.normpath, self._files()))
+        if year:
+            year_dir = os.path.normpath(os.path.join(self.root, f"school_year={_segment(year)}"))
+            existing = {path for path in existing if path.startswith(year_dir + os.sep)}
+
+        written = 0
+        for path, result_set in expected.items():
+            if path not in existing:
+                self.write_set(result_set, store.score_rows(result_set["id"]))
+                written += 1
+        removed = 0
+        for path in existing - set(expected):
+            if os.path.exists(path):
+                os.remove(path)
+                removed += 1
+        logger.info("Results dataset synced: %d written, %d removed", written, removed)
+        return {"sets": len(expected), "written": written, "removed": removed}
+
+    # Reading
+
+    def query(self, columns: Optional[Sequence[str]] = None,
+              filters: Optional[Dict[str, Sequence]] = None,
+              group_by: Optional[Sequence[str]] = None, limit: Optional[int] = None):
+        """pandas DataFrame of the selected columns
+
+        Only the requested columns are read, and `filters` on partition
+        columns skip whole directories (others use Parquet row-group
+        statistics). With `group_by` the result is one row per group with
+        row and student counts and mean score / percentage.
+        """
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        filters = {name: list(values) for name, values in (filters or {}).items() if values}
+        unknown = [name for name in filters if name not in FILTERABLE]
+        if unknown:
+            raise ValueError(f"Bu ustunlar bo'yicha filtrlash mumkin emas: {', '.join(unknown)}")
+        group_by = list(group_by or [])
+        unknown = [name for name in group_by if name not in FILTERABLE]
+        if unknown:
+            raise ValueError(f"Bu ustunlar bo'yicha guruhlash mumkin emas: {', '.join(unknown)}")
+        if group_by:
+            # Everything that identifies a student's result, plus the measures
+            needed = list(dict.fromkeys(group_by + ["profile_id", "school_year", "class_name",
+                                                    "subject", "chorak", "student", "score", "percent"]))
+        else:
+            needed = list(columns or COLUMNS)
+            unknown = [name for name in needed if name not in COLUMNS]
+            if unknown:
+                raise ValueError(f"Noma'lum ustunlar: {', '.join(unknown)}")
+
+        if not os.path.isdir(self.root):
+            return pd.DataFrame(columns=group_by + ["rows", "students", "score_mean", "percent_mean"]
+                                if group_by else needed)
+        # Partition values stay strings ("1", not 1) and are URL-decoded
+        partitioning = ds.HivePartitioning(pa.schema([(name, pa.string()) for name in PARTITIONS]),
+                                           segment_encoding="uri")
+        dataset = ds.dataset(self.root, format="parquet", partitioning=partitioning)
+        expression = None
+        for name, values in filters.items():
+            if name == "task":
+                if not all(str(value).isdigit() for value in values):
+                    raise ValueError("task butun son bo'lishi kerak")
+                values = [int(value) for value in values]
+            condition = ds.field(name).isin(values)
+            expression = condition if expression is None else expression & condition
+
+        with stage("dataset.query"):
+            if group_by:
+                frame = dataset.to_table(columns=needed, filter=expression).to_pandas()
+                frame["_student"] = (frame["profile_id"] + "|" + frame["school_year"] + "|"
+                                     + frame["class_name"] + "|" + frame["subject"] + "|"
+                                     + frame["chorak"] + "|" + frame["student"])
+                result = frame.groupby(group_by, dropna=False).agg(
+                    rows=("score", "size"), students=("_student", "nunique"), score_mean=("score", "mean"))
+                # Percentage is per student - count it once, not once per task row
+                percent = (frame.drop_duplicates(group_by + ["_student"])
+                           .groupby(group_by, dropna=False)["percent"].mean().rename("percent_mean"))
+                result = result.join(percent).reset_index().round({"score_mean": 2, "percent_mean": 2})
+                return result.head(limit) if limit else result
+            if limit:
+                table = dataset.head(limit, columns=needed, filter=expression)
+            else:
+                table = dataset.to_table(columns=needed, filter=expression)
+            return table.to_pandas()
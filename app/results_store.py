@@ -0,0 +1,397 @@
+# app/results_store.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional
+
+from app.log import get_logger
+from core.timing import stage
+
+logger = get_logger(__name__)
+
+# Score histogram: 10 buckets of 10 percentage points, 100% falls into the last one
+HIST_BUCKETS = 10
+_HIST = [f"h{i}" for i in range(HIST_BUCKETS)]
+_HIST_COLUMNS = ", ".join(f"{h} INTEGER NOT NULL DEFAULT 0" for h in _HIST)
+# Month the school year starts in (chorak 1)
+SCHOOL_YEAR_START_MONTH = 9
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS result_sets (
+    id INTEGER PRIMARY KEY,
+    profile_id TEXT NOT NULL,
+    school_year TEXT NOT NULL,
+    class_name TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    chorak TEXT NOT NULL,
+    num_tasks INTEGER NOT NULL,
+    max_total REAL NOT NULL,
+    students INTEGER NOT NULL,
+    sum_percent REAL NOT NULL,
+    digest TEXT NOT NULL,
+    ingested_at TEXT NOT NULL,
+    {_HIST_COLUMNS},
+    UNIQUE (profile_id, school_year, class_name, subject, chorak)
+);
+CREATE TABLE IF NOT EXISTS task_results (
+    set_id INTEGER NOT NULL REFERENCES result_sets(id) ON DELETE CASCADE,
+    task INTEGER NOT NULL,
+    max_score REAL NOT NULL,
+    n INTEGER NOT NULL,
+    total REAL NOT NULL,
+    PRIMARY KEY (set_id, task)
+);
+CREATE TABLE IF NOT EXISTS student_results (
+    set_id INTEGER NOT NULL REFERENCES result_sets(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    student TEXT NOT NULL,
+    student_key TEXT NOT NULL,
+    total REAL NOT NULL,
+    percent REAL NOT NULL,
+    scores TEXT NOT NULL,
+    PRIMARY KEY (set_id, position)
+);
+CREATE INDEX IF NOT EXISTS student_results_key ON student_results (student_key);
+CREATE TABLE IF NOT EXISTS subject_rollup (
+    profile_id TEXT NOT NULL,
+    school_year TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    chorak TEXT NOT NULL,
+    sets INTEGER NOT NULL DEFAULT 0,
+    students INTEGER NOT NULL DEFAULT 0,
+    sum_percent REAL NOT NULL DEFAULT 0,
+    {_HIST_COLUMNS},
+    PRIMARY KEY (profile_id, school_year, subject, chorak)
+);
+"""
+
+
+def school_year(day: Optional[date] = None) -> str:
+    """"2025-2026" for any day from September 2025 to August 2026"""
+    day = day or date.today()
+    first = day.year if day.month >= SCHOOL_YEAR_START_MONTH else day.year - 1
+    return f"{first}-{first + 1}"
+
+
+def student_key(name: str) -> str:
+    return " ".join(str(name).split()).casefold()
+
+
+def _bucket(percent: float) -> int:
+    return min(max(int(percent // (100 / HIST_BUCKETS)), 0), HIST_BUCKETS - 1)
+
+
+def summarize(results: Dict) -> Dict:
+    """Per-set aggregates of read_assessment_results() output
+
+    Students without a single entered score did not sit the assessment
+    and are left out; empty tasks of the others count as not attempted.
+    """
+    max_scores = [float(x) for x in results["max_scores"]]
+    max_total = sum(max_scores)
+    students = []
+    histogram = [0] * HIST_BUCKETS
+    task_n = [0] * len(max_scores)
+    task_total = [0.0] * len(max_scores)
+    for name, scores in results["students"]:
+        if all(score is None for score in scores):
+            continue
+        total = sum(score for score in scores if score is not None)
+        percent = total / max_total * 100 if max_total else 0.0
+        students.append((name, total, percent, scores))
+        histogram[_bucket(percent)] += 1
+        for task, score in enumerate(scores):
+            if score is not None:
+                task_n[task] += 1
+                task_total[task] += score
+    payload = json.dumps([max_scores, [(name, scores) for name, _, _, scores in students]],
+                         ensure_ascii=False, separators=(",", ":"))
+    return {
+        "max_scores": max_scores,
+        "max_total": max_total,
+        "students": students,
+        "sum_percent": sum(percent for _, _, percent, _ in students),
+        "histogram": histogram,
+        "tasks": list(zip(max_scores, task_n, task_total)),
+        "digest": hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32],
+    }
+
+
+def _average(total: float, count: int) -> Optional[float]:
+    return round(total / count, 2) if count else None
+
+
+def _histogram(row) -> List[int]:
+    return [row[h] for h in _HIST]
+
+
+class ResultsStore:
+    """Filled workbook results with rollups maintained at ingest time
+
+    Each (profile, school year, class, subject, chorak) result set is
+    ingested once: its per-task sums/counts and percentage histogram are
+    computed on the way in, and the profile-wide (school year, subject,
+    chorak) rollup gets the set's contribution added - or, on re-ingest of
+    a changed workbook, the old contribution subtracted first, in the same
+    transaction. Trend and
+    ranking queries read those rollups and never rescan student rows;
+    only per-student progression reads student rows, by index.
+    """
+
+    def __init__(self, path: str = "data/results.sqlite3"):
+        self.path = path
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ResultsStore":
+        return cls(os.environ.get("TAHLILCHI_RESULTS_DB", "data/results.sqlite3"))
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def _ensure_schema(self):
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = self._open()
+            try:
+                # WAL: other workers keep reading while one ingests
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.executescript(SCHEMA)
+            finally:
+                conn.close()
+            self._ready = True
+
+    @contextmanager
+    def _connect(self, write: bool = False) -> Iterator[sqlite3.Connection]:
+        self._ensure_schema()
+        conn = self._open()
+        try:
+            if write:
+                # Take the write lock before reading what gets subtracted
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    yield conn
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("COMMIT")
+            else:
+                yield conn
+        finally:
+            conn.close()
+
+    # Ingest
+
+    def _apply_rollup(self, conn, profile_id: str, year: str, subject: str, chorak: str,
+                      students: int, sum_percent: float, histogram: List[int], sign: int):
+        conn.execute(
+            "INSERT OR IGNORE INTO subject_rollup (profile_id, school_year, subject, chorak) "
+            "VALUES (?, ?, ?, ?)", (profile_id, year, subject, chorak))
+        assignments = ", ".join(f"{h} = {h} + ?" for h in _HIST)
+        conn.execute(
+            f"UPDATE subject_rollup SET sets = sets + ?, students = students + ?, "
+            f"sum_percent = sum_percent + ?, {assignments} "
+            f"WHERE profile_id = ? AND school_year = ? AND subject = ? AND chorak = ?",
+            (sign, sign * students, sign * sum_percent, *(sign * n for n in histogram),
+             profile_id, year, subject, chorak))
+
+    def _remove_set(self, conn, row):
+        key = (row["profile_id"], row["school_year"], row["subject"], row["chorak"])
+        self._apply_rollup(conn, *key, row["students"], row["sum_percent"], _histogram(row), -1)
+        conn.execute("DELETE FROM subject_rollup WHERE profile_id = ? AND school_year = ? "
+                     "AND subject = ? AND chorak = ? AND sets <= 0", key)
+        conn.execute("DELETE FROM result_sets WHERE id = ?", (row["id"],))
+
+    def _find_set(self, conn, profile_id: str, year: str, class_name: str, subject: str, chorak: str):
+        return conn.execute(
+            "SELECT * FROM result_sets WHERE profile_id = ? AND school_year = ? AND class_name = ? "
+            "AND subject = ? AND chorak = ?", (profile_id, year, class_name, subject, chorak)).fetchone()
+
+    def ingest(self, profile_id: str, class_name: str, subject: str, chorak: str,
+               results: Dict, year: Optional[str] = None) -> Dict:
+        """Store one result set, returns {"status": added|replaced|unchanged, ...}"""
+        year = year or school_year()
+        summary = summarize(results)
+        if not summary["students"]:
+            raise ValueError("Faylda kiritilgan ballar yo'q")
+        with stage("results.ingest"), self._connect(write=True) as conn:
+            old = self._find_set(conn, profile_id, year, class_name, subject, chorak)
+            if old is not None and old["digest"] == summary["digest"]:
+                return {"status": "unchanged", "set_id": old["id"], "school_year": year,
+                        "students": old["students"],
+                        "average": _average(old["sum_percent"], old["students"])}
+            if old is not None:
+                self._remove_set(conn, old)
+
+            cursor = conn.execute(
+                f"INSERT INTO result_sets (profile_id, school_year, class_name, subject, chorak, "
+                f"num_tasks, max_total, students, sum_percent, digest, ingested_at, {', '.join(_HIST)}) "
+                f"VALUES ({', '.join('?' * (11 + HIST_BUCKETS))})",
+                (profile_id, year, class_name, subject, chorak, len(summary["max_scores"]),
+                 summary["max_total"], len(summary["students"]), summary["sum_percent"],
+                 summary["digest"], datetime.now().isoformat(timespec="seconds"),
+                 *summary["histogram"]))
+            set_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO task_results (set_id, task, max_score, n, total) VALUES (?, ?, ?, ?, ?)",
+                [(set_id, task, max_score, n, total)
+                 for task, (max_score, n, total) in enumerate(summary["tasks"], start=1)])
+            conn.executemany(
+                "INSERT INTO student_results (set_id, position, student, student_key, total, percent, scores) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(set_id, position, name, student_key(name), total, percent,
+                  json.dumps(scores, separators=(",", ":")))
+                 for position, (name, total, percent, scores) in enumerate(summary["students"])])
+            self._apply_rollup(conn, profile_id, year, subject, chorak, len(summary["students"]),
+                               summary["sum_percent"], summary["histogram"], 1)
+        logger.info("Results %s: %s/%s/%s/%s chorak %s (%d students)",
+                    "replaced" if old is not None else "added",
+                    profile_id, year, class_name, subject, chorak, len(summary["students"]))
+        return {"status": "replaced" if old is not None else "added", "set_id": set_id,
+                "school_year": year, "students": len(summary["students"]),
+                "average": _average(summary["sum_percent"], len(summary["students"]))}
+
+    def delete(self, profile_id: str, class_name: str, subject: str, chorak: str,
+               year: Optional[str] = None) -> bool:
+        with self._connect(write=True) as conn:
+            row = self._find_set(conn, profile_id, year or school_year(), class_name, subject, chorak)
+            if row is None:
+                return False
+            self._remove_set(conn, row)
+            return True
+
+    def delete_class(self, profile_id: str, class_name: str) -> List[Dict]:
+        """Drop every set of a class deleted from the profile, returns them (result_sets() items)"""
+        with self._connect(write=True) as conn:
+            rows = conn.execute("SELECT * FROM result_sets WHERE profile_id = ? AND class_name = ?",
+                                (profile_id, class_name)).fetchall()
+            for row in rows:
+                self._remove_set(conn, row)
+        if rows:
+            logger.info("Results of %s/%s removed (%d sets)", profile_id, class_name, len(rows))
+        return [{key: row[key] for key in ("id", "profile_id", "school_year", "class_name",
+                                           "subject", "chorak", "digest")} for row in rows]
+
+    # Queries
+
+    def class_trend(self, profile_id: str, class_name: str, subject: str,
+                    year: Optional[str] = None) -> Dict:
+        """Class average, histogram and per-task averages (% of max) for every chorak"""
+        year = year or school_year()
+        with self._connect() as conn:
+            sets = conn.execute(
+                "SELECT * FROM result_sets WHERE profile_id = ? AND school_year = ? "
+                "AND class_name = ? AND subject = ? ORDER BY chorak",
+                (profile_id, year, class_name, subject)).fetchall()
+            tasks = conn.execute(
+                "SELECT r.chorak, t.task, t.max_score, t.n, t.total FROM task_results t "
+                "JOIN result_sets r ON r.id = t.set_id "
+                "WHERE r.profile_id = ? AND r.school_year = ? AND r.class_name = ? AND r.subject = ? "
+                "ORDER BY t.task, r.chorak", (profile_id, year, class_name, subject)).fetchall()
+        by_task: Dict[int, Dict] = {}
+        for row in tasks:
+            mean = row["total"] / row["n"] if row["n"] else None
+            by_task.setdefault(row["task"], {})[row["chorak"]] = {
+                "max_score": row["max_score"], "attempted": row["n"],
+                "average": round(mean, 2) if mean is not None else None,
+                "percent": round(mean / row["max_score"] * 100, 2) if mean is not None else None,
+            }
+        return {
+            "class": class_name, "subject": subject, "school_year": year,
+            "chorak": [{"chorak": row["chorak"], "students": row["students"],
+                        "average": _average(row["sum_percent"], row["students"]),
+                        "histogram": _histogram(row), "ingested_at": row["ingested_at"]}
+                       for row in sets],
+            "tasks": [{"task": task, "chorak": values} for task, values in sorted(by_task.items())],
+        }
+
+    def subject_trend(self, profile_id: str, subject: str, year: Optional[str] = None) -> List[Dict]:
+        """Profile-wide average and histogram of a subject per chorak"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM subject_rollup WHERE profile_id = ? AND school_year = ? AND subject = ? "
+                "ORDER BY chorak", (profile_id, year or school_year(), subject)).fetchall()
+        return [{"chorak": row["chorak"], "classes": row["sets"], "students": row["students"],
+                 "average": _average(row["sum_percent"], row["students"]),
+                 "histogram": _histogram(row)} for row in rows]
+
+    def ranking(self, profile_id: str, subject: str, chorak: str, limit: int = 50,
+                year: Optional[str] = None) -> List[Dict]:
+        """Classes by average percentage, best first"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT class_name, students, sum_percent FROM result_sets "
+                "WHERE profile_id = ? AND school_year = ? AND subject = ? AND chorak = ? AND students > 0 "
+                "ORDER BY sum_percent / students DESC, class_name LIMIT ?",
+                (profile_id, year or school_year(), subject, chorak, limit)).fetchall()
+        return [{"rank": rank, "class": row["class_name"], "students": row["students"],
+                 "average": _average(row["sum_percent"], row["students"])}
+                for rank, row in enumerate(rows, start=1)]
+
+    def student_progress(self, profile_id: str, name: str,
+                         class_name: Optional[str] = None) -> Dict[str, List[Dict]]:
+        """Subject -> results of one student over every school year and chorak"""
+        query = ("SELECT r.subject, r.school_year, r.chorak, r.class_name, r.max_total, "
+                 "s.total, s.percent, s.scores "
+                 "FROM student_results s JOIN result_sets r ON r.id = s.set_id "
+                 "WHERE s.student_key = ? AND r.profile_id = ?")
+        params = [student_key(name), profile_id]
+        if class_name:
+            query += " AND r.class_name = ?"
+            params.append(class_name)
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY r.subject, r.school_year, r.chorak", params).fetchall()
+        progress: Dict[str, List[Dict]] = {}
+        for row in rows:
+            progress.setdefault(row["subject"], []).append({
+                "school_year": row["school_year"], "chorak": row["chorak"], "class": row["class_name"],
+                "total": row["total"], "max_total": row["max_total"], "percent": round(row["percent"], 2),
+                "scores": json.loads(row["scores"]),
+            })
+        return progress
+
+    # Raw rows (columnar export)
+
+    def result_sets(self, year: Optional[str] = None, set_id: Optional[int] = None) -> List[Dict]:
+        """Keys and digests of stored sets - all, of one school year or one set"""
+        query = "SELECT id, profile_id, school_year, class_name, subject, chorak, digest FROM result_sets"
+        params = []
+        if set_id is not None:
+            query += " WHERE id = ?"
+            params.append(set_id)
+        elif year:
+            query += " WHERE school_year = ?"
+            params.append(year)
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(query, params)]
+
+    def score_rows(self, set_id: int) -> List[Dict]:
+        """Student x task rows of one set (unattempted tasks with score None)"""
+        with self._connect() as conn:
+            tasks = conn.execute("SELECT task, max_score FROM task_results WHERE set_id = ? ORDER BY task",
+                                 (set_id,)).fetchall()
+            students = conn.execute(
+                "SELECT student, total, percent, scores FROM student_results WHERE set_id = ? "
+                "ORDER BY position", (set_id,)).fetchall()
+        rows = []
+        for student in students:
+            scores = json.loads(student["scores"])
+            for task, score in zip(tasks, scores):
+                rows.append({"student": student["student"], "task": task["task"], "score": score,
+                             "max_score": task["max_score"], "total": student["total"],
+                             "percent": student["percent"]})
+        return rows
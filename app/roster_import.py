@@ -0,0 +1,150 @@
+# app/roster_import.py
+from difflib import SequenceMatcher
+from io import BytesIO, StringIO
+from typing import Dict, List, Tuple
+
+from core.timing import StageClock, stage
+
+
+class RosterFormatError(ValueError):
+    """The file was read but does not look like a school roster export"""
+
+
+def read_admin_export(contents: bytes, filename: str) -> Dict[str, List[str]]:
+    """Classes and students from the school-wide export (.xlsx, .xls or .html)
+
+    Students are in column B and their class in column F, starting from
+    the third row. Many .xls exports are HTML tables in disguise.
+    """
+    # pandas (and lxml/openpyxl/xlrd readers) load on first upload
+    import pandas as pd
+
+    filename = filename.lower()
+    if b'<html' in contents.lower()[:100] or filename.endswith(('.html', '.htm')):
+        html_text = contents.decode('utf-8', errors='ignore')
+        with stage("upload.read_html"):
+            df_list: list[pd.DataFrame] = pd.read_html(StringIO(html_text), flavor='lxml')
+    else:
+        engine = 'openpyxl' if filename.endswith('.xlsx') else 'xlrd'
+        with stage("upload.read_excel"):
+            df = pd.read_excel(BytesIO(contents), header=None, engine=engine)
+        df_list: list[pd.DataFrame] = [df]
+
+    if len(df_list) == 0:
+        raise RosterFormatError("Jadval topilmadi!")
+
+    clock = StageClock()
+    df = df_list[0]
+    df_data = df.iloc[2:].copy()
+    df_data.reset_index(drop=True, inplace=True)
+
+    if df_data.shape[1] < 6:
+        raise RosterFormatError("Jadvalda yetarli ustun yo'q (kamida 6 ta bo'lishi kerak)")
+
+    names_series = df_data.iloc[:, 1].dropna()
+    classes_series = df_data.iloc[:, 5].dropna()
+
+    min_len = min(len(names_series), len(classes_series))
+    names = names_series.iloc[:min_len].astype(str).str.strip().tolist()
+    classes = classes_series.iloc[:min_len].astype(str).str.strip().tolist()
+
+    new_classes = {}
+    # Set per class - membership check stays O(1) for large classes
+    seen = {}
+    for name, sinf in zip(names, classes):
+        if name.lower() == "nan" or sinf.lower() == "nan":
+            continue
+        name = name.strip()
+        sinf = sinf.strip()
+        if name and sinf:
+            if sinf not in new_classes:
+                new_classes[sinf] = []
+                seen[sinf] = set()
+            if name not in seen[sinf]:
+                seen[sinf].add(name)
+                new_classes[sinf].append(name)
+    clock.lap("upload.normalize")
+    return new_classes
+
+
+def diff_class(old: List[str], new: List[str]) -> Dict[str, List[str]]:
+    """Added, removed and moved students of one class
+
+    Moved are students in both rosters whose order relative to the
+    others changed (outside the longest common ordering).
+    """
+    old_set, new_set = set(old), set(new)
+    added = [name for name in new if name not in old_set]
+    removed = [name for name in old if name not in new_set]
+    old_common = [name for name in old if name in new_set]
+    new_common = [name for name in new if name in old_set]
+    moved = []
+    if old_common != new_common:
+        matcher = SequenceMatcher(None, old_common, new_common, autojunk=False)
+        kept = set()
+        for block in matcher.get_matching_blocks():
+            kept.update(range(block.b, block.b + block.size))
+        moved = [name for i, name in enumerate(new_common) if i not in kept]
+    return {"added": added, "removed": removed, "moved": moved}
+
+
+def merge_rosters(stored: Dict[str, List[str]], incoming: Dict[str, List[str]],
+                  remove_missing: bool = False) -> Tuple[Dict[str, List[str]], Dict]:
+    """Merge an export into the stored classes, class by class
+
+    Classes in the export replace the stored roster; classes only in the
+    profile (added by hand or by journal upload) are kept unless
+    `remove_missing`. Unchanged classes keep their stored list object.
+    Returns the merged classes and a report; report["changed"] is empty
+    when there is nothing to save.
+    """
+    merged = {}
+    classes = {}
+    changed = []
+    for name, students in incoming.items():
+        old = stored.get(name)
+        if old is None:
+            merged[name] = list(students)
+            classes[name] = {"status": "added", "added": list(students), "removed": [], "moved": []}
+            changed.append(name)
+            continue
+        if len(old) == len(students) and list(old) == list(students):
+            merged[name] = old
+            classes[name] = {"status": "unchanged", "added": [], "removed": [], "moved": []}
+            continue
+        merged[name] = list(students)
+        classes[name] = {"status": "changed", **diff_class(list(old), list(students))}
+        changed.append(name)
+
+    for name, old in stored.items():
+        if name in incoming:
+            continue
+        if remove_missing:
+            classes[name] = {"status": "removed", "added": [], "removed": list(old), "moved": []}
+            changed.append(name)
+        else:
+            merged[name] = old
+            classes[name] = {"status": "kept", "added": [], "removed": [], "moved": []}
+
+    # Removed from one class and added to another - a transfer, not two unrelated edits
+    added_in = {}
+    for name, entry in classes.items():
+        for student in entry["added"]:
+            added_in.setdefault(student, name)
+    transferred = [{"name": student, "from": name, "to": added_in[student]}
+                   for name, entry in classes.items() for student in entry["removed"]
+                   if student in added_in and added_in[student] != name]
+
+    report = {
+        "classes": {name: classes[name] for name in sorted(classes)},
+        "changed": sorted(changed),
+        "transferred": transferred,
+        "totals": {
+            "classes": len(merged),
+            "students": sum(len(students) for students in merged.values()),
+            "added": sum(len(e["added"]) for e in classes.values()),
+            "removed": sum(len(e["removed"]) for e in classes.values()),
+            "moved": sum(len(e["moved"]) for e in classes.values()),
+        },
+    }
+    return merged, report
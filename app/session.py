@@ -0,0 +1,66 @@
+# app/session.py
+from typing import Dict, List, Optional
+
+from app.profile_manager import ProfileManager
+
+
+class ProfileSession:
+    """Active profile loaded once per request (unit of work)
+
+    Handlers, the controller and templates all read the same snapshot.
+    Mutations go to `profile` directly, followed by `mark_dirty()`;
+    `flush()` then persists them with a single save.
+    """
+
+    def __init__(self, profile_manager: ProfileManager, profile_id: Optional[str] = "default"):
+        self.profile_manager = profile_manager
+        self.requested_id = profile_id or "default"
+        self.dirty = False
+        self._profile: Optional[Dict] = None
+        self._loaded = False
+
+    @property
+    def profile(self) -> Optional[Dict]:
+        if not self._loaded:
+            self._profile = self.profile_manager.get_profile(self.requested_id)
+            self._loaded = True
+        return self._profile
+
+    @property
+    def profile_id(self) -> str:
+        """ID of the loaded profile - unknown IDs fall back to default"""
+        profile = self.profile
+        if profile:
+            return profile.get("profile_id", self.requested_id)
+        return "default"
+
+    @property
+    def profile_name(self) -> str:
+        profile = self.profile
+        return profile.get("profile_name", "Default") if profile else "Default"
+
+    @property
+    def settings(self) -> Dict:
+        profile = self.profile
+        return profile.get("settings", {}) if profile else {}
+
+    @property
+    def classes(self) -> Dict[str, List[str]]:
+        profile = self.profile
+        return profile.get("data", {}).get("classes", {}) if profile else {}
+
+    @property
+    def subjects(self) -> List[str]:
+        profile = self.profile
+        return profile.get("data", {}).get("subjects", []) if profile else []
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    def flush(self) -> bool:
+        """Persist pending changes, returns True if something was written"""
+        if not self.dirty or not self._profile:
+            return False
+        self.profile_manager.save_profile(self.profile_id, self._profile)
+        self.dirty = False
+        return True
@@ -1,11 +1,19 @@
 # app/settings_manager.py
 import json
 import os
+from typing import Optional
+
+from app.generation import GenerationCounter, default_generations
+from app.metrics import record_cache
+from app.storage import file_stamp, write_json_atomic
 
 
 class SettingsManager:
-    def __init__(self, path="settings.json"):
+    GENERATION = "settings"
+
+    def __init__(self, path="settings.json", generations: Optional[GenerationCounter] = None):
         self.path = path
+        self.generations = generations or default_generations()
         self.defaults = {
             "tuman": "",
             "maktab": "",
@@ -14,18 +22,41 @@ class SettingsManager:
             "fan_oqituvchisi": "",
             "output_dir": ""
         }
+        # (generation token, file stamp, settings) - reloaded once another
+        # worker saves or the file is edited by hand
+        self._cache = None
 
     def load(self) -> dict:
+        token = self.generations.get(self.GENERATION)
+        stamp = file_stamp(self.path)
+        if self._cache is not None and self._cache[:2] == (token, stamp):
+            record_cache("settings", hit=True)
+            return dict(self._cache[2])
+        record_cache("settings", hit=False)
+
         if not os.path.exists(self.path):
             return self.defaults.copy()
 
         try:
             with open(self.path, "r", encoding="utf-8") as f:
                 data = json.load(f)
-            return {**self.defaults, **data}
+            settings = {**self.defaults, **data}
         except Exception:
             return self.defaults.copy()
 
+        self._cache = (token, stamp, settings)
+        return dict(settings)
+
+    def version(self) -> str:
+        """Changes whenever any worker saves or the file is edited"""
+        try:
+            st = os.stat(self.path)
+            stamp = f"{st.st_mtime_ns}-{st.st_size}"
+        except FileNotFoundError:
+            stamp = "missing"
+        return f"{self.generations.get(self.GENERATION)}-{stamp}"
+
     def save(self, data: dict):
-        with open(self.path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        stamp = write_json_atomic(self.path, data, indent=4)
+        token = self.generations.bump(self.GENERATION)
+        self._cache = (token, stamp, {**self.defaults, **data})
@@ -0,0 +1,31 @@
+# app/startup.py
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+class StartupReport:
+    """Durations of the startup phases, served at /startup-report"""
+
+    def __init__(self, origin: float = None):
+        self._origin = origin if origin is not None else time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.ready_after = None
+
+    def record(self, name: str, started: float):
+        """Store a phase that began at `started` (perf_counter) and ends now"""
+        self.phases[name] = round((time.perf_counter() - started) * 1000, 2)
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, started)
+
+    def mark_ready(self):
+        self.ready_after = round((time.perf_counter() - self._origin) * 1000, 2)
+
+    def as_dict(self) -> Dict:
+        return {"phases_ms": dict(self.phases), "ready_after_ms": self.ready_after}
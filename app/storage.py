@@ -0,0 +1,35 @@
+# app/storage.py
+import json
+import os
+import uuid
+from typing import Optional, Tuple
+
+# (inode, mtime_ns, size) - a replaced file always gets a new inode
+Stamp = Tuple[int, int, int]
+
+
+def file_stamp(path: str) -> Optional[Stamp]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def write_json_atomic(path: str, data, indent: int = 2) -> Stamp:
+    """Write JSON through a temp file so other workers never read a half-written file
+
+    Returns the stamp of the written file, taken before it is renamed into
+    place: a concurrent writer replacing it right after cannot leak its
+    stamp into the caller's cache.
+    """
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+        stamp = file_stamp(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return stamp
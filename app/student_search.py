@@ -0,0 +1,242 @@
+# app/student_search.py
+import heapq
+import sys
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.metrics import record_cache
+from app.profile_manager import ProfileManager, profile_generation
+from core.file_utils import normalize_chars
+from core.timing import stage
+
+# Characters dropped from keys - "Oʻrinboyev", "O'rinboyev" and "Orinboyev" all match
+_DROP = str.maketrans("", "", "'\"-.,")
+
+
+def search_key(text: str) -> str:
+    """Lowercase, apostrophe-insensitive form of a name or query"""
+    return " ".join(normalize_chars(str(text)).translate(_DROP).casefold().split())
+
+
+def _trigrams(word: str) -> Set[str]:
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+def _grams(key: str) -> Set[str]:
+    """Trigrams of every word plus its 1-2 letter prefixes (for short queries)"""
+    grams = set()
+    for word in key.split():
+        grams.add("^" + word[:1])
+        if len(word) > 1:
+            grams.add("^" + word[:2])
+        grams.update(_trigrams(word))
+    return grams
+
+
+def _query_grams(word: str) -> Set[str]:
+    return _trigrams(word) if len(word) >= 3 else {"^" + word}
+
+
+class StudentIndex:
+    """Trigram / word-prefix index over the rosters of one profile
+
+    Every query word must occur in the name (words of 1-2 letters as a
+    word prefix), in any order. Classes are indexed separately, so a
+    roster change only re-indexes the classes that differ.
+    """
+
+    def __init__(self):
+        # entry id -> (name, class name, key); None for freed ids
+        self._entries: List[Optional[Tuple[str, str, str]]] = []
+        self._free: List[int] = []
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        # class name -> (students tuple, entry ids)
+        self._classes: Dict[str, Tuple[Tuple[str, ...], List[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries) - len(self._free)
+
+    def _add(self, name: str, class_name: str) -> int:
+        key = search_key(name)
+        entry = (name, class_name, key)
+        if self._free:
+            entry_id = self._free.pop()
+            self._entries[entry_id] = entry
+        else:
+            entry_id = len(self._entries)
+            self._entries.append(entry)
+        for gram in _grams(key):
+            self._postings[sys.intern(gram)].add(entry_id)
+        return entry_id
+
+    def _remove(self, entry_id: int):
+        key = self._entries[entry_id][2]
+        for gram in _grams(key):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(entry_id)
+                if not posting:
+                    del self._postings[gram]
+        self._entries[entry_id] = None
+        self._free.append(entry_id)
+
+    def remove_class(self, class_name: str):
+        _, ids = self._classes.pop(class_name, ((), []))
+        for entry_id in ids:
+            self._remove(entry_id)
+
+    def set_class(self, class_name: str, students: Iterable[str]) -> bool:
+        """Index one class, False when its roster did not change"""
+        students = tuple(students)
+        current = self._classes.get(class_name)
+        if current is not None and current[0] == students:
+            return False
+        self.remove_class(class_name)
+        self._classes[class_name] = (students, [self._add(name, class_name) for name in students])
+        return True
+
+    def sync(self, rosters: Iterable[Tuple[str, List[str]]]) -> int:
+        """Bring the index in line with (class, students) pairs, returns re-indexed classes"""
+        changed = 0
+        seen = set()
+        for class_name, students in rosters:
+            seen.add(class_name)
+            changed += self.set_class(class_name, students)
+        for class_name in [name for name in self._classes if name not in seen]:
+            self.remove_class(class_name)
+            changed += 1
+        return changed
+
+    def matches(self, query: str) -> List[Tuple[int, str, str, str]]:
+        """Unsorted (rank, key, class, name) of every match, lower rank is better"""
+        key = search_key(query)
+        words = key.split()
+        if not words:
+            return []
+        candidates = None
+        for gram in sorted(set().union(*(_query_grams(w) for w in words)),
+                           key=lambda g: len(self._postings.get(g, ()))):
+            posting = self._postings.get(gram)
+            if not posting:
+                return []
+            candidates = set(posting) if candidates is None else candidates & posting
+            if not candidates:
+                return []
+
+        matches = []
+        for entry_id in candidates:
+            name, class_name, entry_key = self._entries[entry_id]
+            entry_words = entry_key.split()
+            if not all(w in entry_key if len(w) >= 3 else any(ew.startswith(w) for ew in entry_words)
+                       for w in words):
+                continue
+            # Exact, whole-name prefix, word prefix, substring
+            if entry_key == key:
+                rank = 0
+            elif entry_key.startswith(key):
+                rank = 1
+            elif all(any(ew.startswith(w) for ew in entry_words) for w in words):
+                rank = 2
+            else:
+                rank = 3
+            matches.append((rank, entry_key, class_name, name))
+        return matches
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, str]]:
+        """(name, class) pairs, best matches first"""
+        matches = heapq.nsmallest(limit, self.matches(query))
+        return [(name, class_name) for _, _, class_name, name in matches]
+
+
+class StudentSearch:
+    """Per-profile student indexes, refreshed lazily on the next search after a change
+
+    A profile's index is stamped with its generation token and the master
+    data version (reference rosters resolve to master classes). When the
+    stamp moved, only classes whose roster differs are re-indexed. Each
+    profile has its own lock, so one profile's rebuild doesn't hold up
+    searches in the others. Indexes of profiles whose file is gone are
+    dropped on the next rebuild.
+    """
+
+    def __init__(self, profile_manager: ProfileManager):
+        self.profile_manager = profile_manager
+        # profile_id -> (stamp, StudentIndex, {class name: master class} for reference rosters)
+        self._indexes: Dict[str, Tuple[tuple, StudentIndex, Dict[str, str]]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        # Guards _indexes / _locks membership only
+        self._lock = threading.Lock()
+
+    def _stamp(self, profile_id: str) -> tuple:
+        return (self.profile_manager.generations.get(profile_generation(profile_id)),
+                self.profile_manager.master.current_version())
+
+    def _profile_lock(self, profile_id: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(profile_id, threading.Lock())
+
+    def evict(self, live_ids: Optional[Iterable[str]] = None):
+        """Drop indexes of profiles that no longer exist"""
+        live = set(self.profile_manager.profile_ids() if live_ids is None else live_ids)
+        with self._lock:
+            for profile_id in [p for p in self._indexes if p not in live]:
+                del self._indexes[profile_id]
+                self._locks.pop(profile_id, None)
+
+    def _refresh(self, profile_id: str) -> Tuple[tuple, StudentIndex, Dict[str, str]]:
+        """Current index of a profile, call with its lock held; KeyError for unknown profiles"""
+        stamp = self._stamp(profile_id)
+        cached = self._indexes.get(profile_id)
+        if cached is not None and cached[0] == stamp:
+            record_cache("student_search", hit=True)
+            return cached
+        record_cache("student_search", hit=False)
+        self.evict()
+        model = self.profile_manager.get_profile_model(profile_id)
+        if model is None:
+            raise KeyError(profile_id)
+        index = cached[1] if cached is not None else StudentIndex()
+        with stage("search.index"):
+            index.sync(self.profile_manager.iter_classes(model.profile_id))
+        shared = {name: roster.master for name, roster in model.classes.items() if roster.is_reference}
+        entry = (stamp, index, shared)
+        with self._lock:
+            self._indexes[profile_id] = entry
+        return entry
+
+    def index_for(self, profile_id: str) -> StudentIndex:
+        """Index of an existing profile (no fallback to default), KeyError otherwise"""
+        with self._profile_lock(profile_id):
+            return self._refresh(profile_id)[1]
+
+    def search(self, query: str, profile_ids: Iterable[str], limit: int = 20,
+               missing_ok: bool = False) -> List[Dict]:
+        """Best `limit` matches ranked across all given profiles
+
+        A student of a master class shows up once, with every profile that
+        references that class in `profile_ids`. Unknown profiles raise
+        KeyError, or are skipped with `missing_ok`.
+        """
+        found = {}
+        for profile_id in profile_ids:
+            # Queried under the lock too: a rebuild re-indexes in place
+            with self._profile_lock(profile_id):
+                try:
+                    _, index, shared = self._refresh(profile_id)
+                except KeyError:
+                    if missing_ok:
+                        continue
+                    raise
+                matches = index.matches(query)
+            for rank, key, class_name, name in matches:
+                master = shared.get(class_name)
+                dedupe = ("master", master, name) if master else (profile_id, class_name, name)
+                hit = found.get(dedupe)
+                if hit is None:
+                    found[dedupe] = [(rank, key, class_name, profile_id), name, [profile_id]]
+                else:
+                    hit[2].append(profile_id)
+        best = heapq.nsmallest(limit, found.values(), key=lambda hit: hit[0])
+        return [{"name": name, "class": sort_key[2], "profile_id": sort_key[3], "profile_ids": ids}
+                for sort_key, name, ids in best]
@@ -0,0 +1,98 @@
+# benchmarks/harness.py
+"""Timing / peak-memory measurement and baseline comparison"""
+import gc
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+
+def measure(fn: Callable[[], object], setup: Optional[Callable[[], object]] = None,
+            min_repeat: int = 3, max_repeat: int = 20, budget_seconds: float = 2.0) -> Dict:
+    """Median/min wall time over repeated runs, then one extra run for peak memory
+
+    `setup` runs before every call and is not timed. Big cases stop after
+    `min_repeat` runs once `budget_seconds` is used up.
+    """
+    times: List[float] = []
+    spent = 0.0
+    while len(times) < max_repeat and (len(times) < min_repeat or spent < budget_seconds):
+        if setup is not None:
+            setup()
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        times.append(elapsed)
+        spent += elapsed
+
+    # Separate run: tracemalloc slows the code down, keep it out of the timings
+    if setup is not None:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "median_ms": round(statistics.median(times) * 1000, 3),
+        "min_ms": round(min(times) * 1000, 3),
+        "runs": len(times),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def environment() -> Dict:
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def save(path: str, results: Dict[str, Dict]):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2, ensure_ascii=False)
+
+
+def load(path: str) -> Dict[str, Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def compare(baseline: Dict[str, Dict], current: Dict[str, Dict],
+            time_threshold: float = 0.25, memory_threshold: float = 0.25,
+            min_time_ms: float = 5.0, min_peak_kb: float = 256.0) -> List[Dict]:
+    """Per-case ratios against the baseline, `regressed` set beyond the thresholds
+
+    Cases faster than `min_time_ms` in the baseline are too noisy for the
+    time gate, and cases peaking below `min_peak_kb` (warm cache hits) for
+    the memory gate; each is still checked by the other one.
+    """
+    rows = []
+    for name, now in current.items():
+        base = baseline.get(name)
+        if base is None:
+            rows.append({"case": name, "status": "new"})
+            continue
+        time_ratio = now["median_ms"] / base["median_ms"] if base["median_ms"] else 1.0
+        memory_ratio = now["peak_kb"] / base["peak_kb"] if base["peak_kb"] else 1.0
+        slower = base["median_ms"] >= min_time_ms and time_ratio > 1 + time_threshold
+        bigger = base["peak_kb"] >= min_peak_kb and memory_ratio > 1 + memory_threshold
+        rows.append({
+            "case": name,
+            "time_ratio": round(time_ratio, 3),
+            "memory_ratio": round(memory_ratio, 3),
+            "status": "regressed" if slower or bigger else "ok",
+        })
+    for name in baseline:
+        if name not in current:
+            rows.append({"case": name, "status": "missing"})
+    return rows
@@ -0,0 +1,452 @@
+# benchmarks/load.py
+"""Load test and traffic replay against the web app
+
+    python -m benchmarks.load --concurrency 8 --duration 30
+    python -m benchmarks.load --url http://127.0.0.1:8000 --concurrency 32
+    python -m benchmarks.load --replay 'logs/requests-*.jsonl' --speed 2
+
+Without --url the app is started in this process with uvicorn on a free
+localhost port, inside a temporary working directory (its data/, outputs/
+and logs/ are thrown away). That server shares the GIL with the load
+generator, so to validate worker counts start `uvicorn web.main:app
+--workers N` yourself and pass --url.
+
+Setup creates --profiles school profiles with synthetic rosters through
+the public endpoints, then every virtual user picks one and runs the
+weighted --mix of operations.
+"""
+import argparse
+import contextlib
+import http.client
+import json
+import os
+import queue
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from app.request_log import read_records, summarize
+from benchmarks.synthetic import admin_export, journal_xlsx, make_school
+
+XLSX_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+DEFAULT_MIX = "page=35,classes=15,switch=10,generate=30,journal=7,admin_upload=3"
+
+
+class Response:
+    __slots__ = ("status", "content_type", "body")
+
+    def __init__(self, status: int, content_type: str, body: bytes):
+        self.status = status
+        self.content_type = content_type
+        self.body = body
+
+    def json(self) -> Dict:
+        return json.loads(self.body or b"{}")
+
+
+class Client:
+    """One keep-alive HTTP connection with a cookie jar (stdlib only)"""
+
+    def __init__(self, base_url: str, timeout: float = 120):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.timeout = timeout
+        self.cookies: Dict[str, str] = {}
+        self._conn: Optional[http.client.HTTPConnection] = None
+
+    def request(self, method: str, path: str, body: bytes = None,
+                headers: Optional[Dict[str, str]] = None) -> Response:
+        headers = dict(headers or {})
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        for attempt in (1, 2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(method, path, body=body, headers=headers)
+                raw = self._conn.getresponse()
+                data = raw.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # Server closed the idle keep-alive connection - retry once on a new one
+                self.close()
+                if attempt == 2:
+                    raise
+        for header in raw.headers.get_all("set-cookie") or []:
+            name, _, rest = header.partition("=")
+            self.cookies[name.strip()] = rest.split(";", 1)[0]
+        return Response(raw.status, raw.headers.get("content-type", ""), data)
+
+    def post_json(self, path: str, data: Dict) -> Response:
+        return self.request("POST", path, json.dumps(data).encode(),
+                            {"Content-Type": "application/json"})
+
+    def post_form(self, path: str, fields: Dict, files: Optional[Dict[str, Tuple[str, bytes]]] = None) -> Response:
+        body, content_type = encode_multipart(fields, files or {})
+        return self.request("POST", path, body, {"Content-Type": content_type})
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def encode_multipart(fields: Dict, files: Dict[str, Tuple[str, bytes]]) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+# --- Workload ---
+
+class School:
+    """One profile on the server and the synthetic files that belong to it"""
+
+    def __init__(self, profile_id: str, classes: Dict[str, List[str]], export: bytes, journals: List[bytes]):
+        self.profile_id = profile_id
+        self.classes = classes
+        self.class_names = list(classes)
+        self.export = export
+        self.journals = journals
+
+
+def setup_schools(base_url: str, count: int, students: int, seed: int = 0) -> List[School]:
+    """Create `count` profiles and upload a roster into each"""
+    client = Client(base_url)
+    subjects = client.request("GET", "/profile/master-data").json().get("subjects") or ["Matematika"]
+    schools = []
+    for i in range(count):
+        created = client.post_json("/profile/create-with-selection",
+                                   {"name": f"Yuklama maktab {i + 1}", "owner": "load",
+                                    "subjects": subjects[:5], "classes": []}).json()
+        if not created.get("success"):
+            raise RuntimeError(f"Profile setup failed: {created.get('message')}")
+        profile_id = created["profile"]["profile_id"]
+        client.post_json("/profile/switch", {"profile_id": profile_id})
+
+        classes = make_school(students, seed=seed + i)
+        export = admin_export(classes, "xlsx")
+        uploaded = client.post_form("/admin-upload", {}, {"file": ("roster.xlsx", export)})
+        if uploaded.status != 200:
+            raise RuntimeError(f"Roster upload failed with HTTP {uploaded.status}")
+        journals = [journal_xlsx(name, roster) for name, roster in list(classes.items())[:3]]
+        schools.append(School(profile_id, classes, export, journals))
+    client.close()
+    return schools
+
+
+def _generate(client: Client, school: School, rng: random.Random) -> Response:
+    tasks = rng.choice((5, 10, 20))
+    return client.post_form("/generate", {
+        "sinf": rng.choice(school.class_names), "fan": "Matematika",
+        "chorak": str(rng.randint(1, 4)), "imtihon_nomi": "Nazorat ishi",
+        "num_tasks": tasks, "max_scores_str": ",".join(["10"] * tasks),
+    })
+
+
+def _journal(client: Client, school: School, rng: random.Random) -> Response:
+    return client.post_form("/journal-upload", {
+        "fan": "Ona tili", "chorak": "2", "imtihon_nomi": "Diktant", "num_tasks": 5,
+    }, {"file": ("jurnal.xlsx", rng.choice(school.journals))})
+
+
+def _switch(client: Client, schools: List[School], rng: random.Random) -> Tuple[Response, School]:
+    school = rng.choice(schools)
+    return client.post_json("/profile/switch", {"profile_id": school.profile_id}), school
+
+
+# op -> (call, success check); page ops are GETs
+OPERATIONS: Dict[str, Tuple[Callable, Callable[[Response], bool]]] = {
+    "page": (lambda c, s, r: c.request("GET", r.choice(("/", "/", "/admin", "/admin-upload"))),
+             lambda resp: resp.status == 200),
+    "classes": (lambda c, s, r: c.request("GET", f"/profile/{s.profile_id}/classes?fields=counts"),
+                lambda resp: resp.status in (200, 304)),
+    "generate": (_generate, lambda resp: resp.status == 200 and resp.content_type.startswith(XLSX_TYPE)),
+    "journal": (_journal, lambda resp: resp.status == 200 and resp.content_type.startswith(XLSX_TYPE)),
+    "admin_upload": (lambda c, s, r: c.post_form("/admin-upload", {}, {"file": ("roster.xlsx", s.export)}),
+                     lambda resp: resp.status == 200 and (b'data-upload-status="saved"' in resp.body
+                                                          or b'data-upload-status="unchanged"' in resp.body)),
+    "switch": (None, lambda resp: resp.status == 200 and resp.json().get("success", False)),
+}
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{name}' (one of {', '.join(OPERATIONS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class Recorder:
+    """Thread-safe list of (operation, seconds, ok, status) samples"""
+
+    def __init__(self):
+        self.samples: List[Tuple[str, float, bool, int]] = []
+        self._lock = threading.Lock()
+
+    def add(self, op: str, seconds: float, ok: bool, status: int):
+        with self._lock:
+            self.samples.append((op, seconds, ok, status))
+
+
+def run_operation(client: Client, op: str, school: School, schools: List[School],
+                  rng: random.Random, recorder: Recorder) -> School:
+    """Run one operation, returns the (possibly switched) school of the user"""
+    call, check = OPERATIONS[op]
+    started = time.perf_counter()
+    status, ok = 0, False
+    try:
+        if op == "switch":
+            response, school = _switch(client, schools, rng)
+        else:
+            response = call(client, school, rng)
+        status = response.status
+        ok = check(response)
+    except Exception:
+        client.close()
+    recorder.add(op, time.perf_counter() - started, ok, status)
+    return school
+
+
+def run_mix(base_url: str, schools: List[School], mix: Dict[str, float], concurrency: int,
+            duration: float, max_requests: Optional[int], seed: int = 0) -> Recorder:
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+    budget = [max_requests]
+    budget_lock = threading.Lock()
+    ops, weights = list(mix), list(mix.values())
+
+    def user(index: int):
+        rng = random.Random(seed + index)
+        client = Client(base_url)
+        school = schools[index % len(schools)]
+        client.cookies["active_profile"] = school.profile_id
+        while time.perf_counter() < deadline:
+            if budget[0] is not None:
+                with budget_lock:
+                    if budget[0] <= 0:
+                        break
+                    budget[0] -= 1
+            op = rng.choices(ops, weights)[0]
+            school = run_operation(client, op, school, schools, rng, recorder)
+        client.close()
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return recorder
+
+
+# --- Replay ---
+
+REPLAY_OPERATIONS = {"/generate": "generate", "/journal-upload": "journal",
+                     "/admin-upload": "admin_upload", "/profile/switch": "switch"}
+
+
+def replay(base_url: str, schools: List[School], records: List[Dict], concurrency: int,
+           speed: float, seed: int = 0) -> Tuple[Recorder, int]:
+    """Replay logged requests in order; POST bodies are not logged, so they are synthesized
+
+    speed > 0 keeps the recorded gaps (2 = twice as fast), 0 sends as fast as possible.
+    Recorded profile ids are mapped onto the setup profiles.
+    """
+    recorder = Recorder()
+    jobs: "queue.Queue[Optional[Tuple[float, Dict]]]" = queue.Queue()
+    skipped = 0
+    first_ts = None
+    # One file per worker - merge them back into arrival order
+    for record in sorted(records, key=lambda r: r.get("ts") or ""):
+        method, route = record.get("method", "GET"), record.get("route", "")
+        if method != "GET" and route not in REPLAY_OPERATIONS:
+            skipped += 1
+            continue
+        ts = datetime.fromisoformat(record["ts"]).timestamp() if record.get("ts") else 0.0
+        first_ts = ts if first_ts is None else first_ts
+        jobs.put(((ts - first_ts) / speed if speed > 0 else 0.0, record))
+    for _ in range(concurrency):
+        jobs.put(None)
+
+    mapping: Dict[str, School] = {}
+    started = time.perf_counter()
+
+    def school_for(profile_id: Optional[str]) -> School:
+        key = profile_id or "default"
+        if key not in mapping:
+            mapping[key] = schools[len(mapping) % len(schools)]
+        return mapping[key]
+
+    def worker(index: int):
+        rng = random.Random(seed + index)
+        client = Client(base_url)
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            due, record = job
+            delay = started + due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            school = school_for(record.get("profile_id"))
+            client.cookies["active_profile"] = school.profile_id
+            op = REPLAY_OPERATIONS.get(record.get("route", ""))
+            if op and record.get("method") != "GET":
+                run_operation(client, op, school, schools, rng, recorder)
+                continue
+            path = record.get("path", "/")
+            if record.get("profile_id"):
+                path = path.replace(f"/profile/{record['profile_id']}/", f"/profile/{school.profile_id}/")
+            t0 = time.perf_counter()
+            try:
+                status = client.request("GET", path).status
+            except Exception:
+                client.close()
+                status = 0
+            recorder.add(f"GET {record.get('route', path)}", time.perf_counter() - t0,
+                         0 < status < 400, status)
+        client.close()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return recorder, skipped
+
+
+# --- Report ---
+
+def build_report(recorder: Recorder, elapsed: float) -> Dict:
+    by_op: Dict[str, List[Tuple[float, bool, int]]] = {}
+    for op, seconds, ok, status in recorder.samples:
+        by_op.setdefault(op, []).append((seconds, ok, status))
+    total = len(recorder.samples)
+    errors = sum(1 for _, _, ok, _ in recorder.samples if not ok)
+    operations = {}
+    for op, samples in sorted(by_op.items()):
+        stats = summarize([s * 1000 for s, _, _ in samples])
+        failed = sum(1 for _, ok, _ in samples if not ok)
+        statuses: Dict[str, int] = {}
+        for _, _, status in samples:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        operations[op] = {**stats, "errors": failed, "error_rate": round(failed / len(samples), 4),
+                          "statuses": statuses}
+    return {
+        "requests": total,
+        "duration_s": round(elapsed, 2),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "operations": operations,
+    }
+
+
+def print_report(report: Dict):
+    print(f"\n{report['requests']} requests in {report['duration_s']} s  "
+          f"-> {report['throughput_rps']} req/s, error rate {report['error_rate'] * 100:.2f}%")
+    print(f"\n{'operation (ms)':<32} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'errors':>7}")
+    for op, s in report["operations"].items():
+        print(f"{op[:32]:<32} {s['count']:>7} {s['p50']:>9.1f} {s['p95']:>9.1f} "
+              f"{s['p99']:>9.1f} {s['max']:>9.1f} {s['errors']:>7}")
+
+
+# --- In-process server ---
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def serve_in_process() -> Iterator[str]:
+    """Run web.main:app with uvicorn in a thread, inside a throwaway working directory"""
+    import uvicorn
+
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="tahlilchi-load-") as workdir:
+        # Templates and static files are loaded relative to the working directory
+        os.symlink(os.path.join(repo_root, "web"), os.path.join(workdir, "web"))
+        if repo_root not in sys.path:
+            sys.path.insert(0, repo_root)
+        os.chdir(workdir)
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config("web.main:app", host="127.0.0.1", port=port,
+                                               log_level="warning", access_log=False))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        try:
+            while not server.started:
+                if not thread.is_alive():
+                    raise RuntimeError("In-process server failed to start")
+                time.sleep(0.05)
+            yield f"http://127.0.0.1:{port}"
+        finally:
+            server.should_exit = True
+            thread.join(timeout=10)
+            os.chdir(previous_cwd)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="target server (default: start one in this process)")
+    parser.add_argument("--concurrency", type=int, default=8, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run the mix")
+    parser.add_argument("--requests", type=int, help="stop after this many requests")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"weighted operations (default {DEFAULT_MIX})")
+    parser.add_argument("--profiles", type=int, default=3, help="school profiles to create")
+    parser.add_argument("--students", type=int, default=600, help="students per school")
+    parser.add_argument("--replay", nargs="+", help="request logs to replay instead of the mix")
+    parser.add_argument("--speed", type=float, default=0,
+                        help="replay speed factor (1 = recorded pace, 0 = as fast as possible)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also save the report as JSON")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    records = read_records(args.replay) if args.replay else None
+
+    with contextlib.ExitStack() as stack:
+        base_url = args.url or stack.enter_context(serve_in_process())
+        print(f"Target {base_url}; creating {args.profiles} profiles x {args.students} students...", flush=True)
+        schools = setup_schools(base_url, args.profiles, args.students, args.seed)
+
+        started = time.perf_counter()
+        if records is not None:
+            recorder, skipped = replay(base_url, schools, records, args.concurrency, args.speed, args.seed)
+            if skipped:
+                print(f"Skipped {skipped} logged requests that cannot be synthesized")
+        else:
+            recorder = run_mix(base_url, schools, mix, args.concurrency, args.duration,
+                               args.requests, args.seed)
+        report = build_report(recorder, time.perf_counter() - started)
+
+    report["concurrency"] = args.concurrency
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
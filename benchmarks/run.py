@@ -0,0 +1,171 @@
+# benchmarks/run.py
+"""Benchmarks for workbook generation, roster upload parsing and profile storage
+
+    python -m benchmarks.run --quick
+    python -m benchmarks.run --output baseline.json
+    python -m benchmarks.run --compare baseline.json --time-threshold 0.25
+
+--compare exits with status 1 when a case got slower or uses more peak
+memory than the baseline allows. Baselines are machine specific - compare
+runs made on the same host.
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from benchmarks import harness
+from benchmarks.synthetic import admin_export, make_names, make_school
+
+# (name, fn, setup)
+Case = Tuple[str, Callable[[], object], Optional[Callable[[], object]]]
+
+GENERATE_STUDENTS = (30, 300, 1000, 5000)
+GENERATE_TASKS = (1, 10, 50)
+UPLOAD_STUDENTS = (300, 3000, 15000)
+UPLOAD_FORMATS = ("xlsx", "xls", "html")
+PROFILE_COUNTS = (10, 100, 1000)
+
+
+def generate_cases(workdir: str, quick: bool) -> Iterator[Case]:
+    from core import create_assessment_template
+
+    config = {"tuman": "Chilonzor", "maktab": "12-maktab", "sinf": "5-A",
+              "fan": "Matematika", "chorak": "1", "imtihon_nomi": "Nazorat ishi"}
+    for students in GENERATE_STUDENTS[:2] if quick else GENERATE_STUDENTS:
+        names = make_names(students)
+        for tasks in GENERATE_TASKS[:2] if quick else GENERATE_TASKS:
+            def run(names=names, tasks=tasks):
+                create_assessment_template(names, tasks, config=config,
+                                           max_scores=[10] * tasks, output_dir=workdir)
+            yield f"generate/students={students}/tasks={tasks}", run, None
+
+
+def upload_cases(quick: bool) -> Iterator[Case]:
+    from app.roster_import import read_admin_export
+
+    for students in UPLOAD_STUDENTS[:1] if quick else UPLOAD_STUDENTS:
+        school = make_school(students)
+        for fmt in UPLOAD_FORMATS:
+            contents = admin_export(school, fmt)
+
+            def run(contents=contents, fmt=fmt):
+                read_admin_export(contents, f"export.{fmt}")
+            yield f"upload/{fmt}/students={students}", run, None
+
+
+def profile_cases(workdir: str, quick: bool) -> Iterator[Case]:
+    from app.generation import GenerationCounter
+    from app.profile_manager import ProfileManager
+
+    for count in PROFILE_COUNTS[:2] if quick else PROFILE_COUNTS:
+        root = os.path.join(workdir, f"profiles-{count}")
+        generations = GenerationCounter(os.path.join(root, ".generations"))
+        profiles_dir = os.path.join(root, "profiles")
+        seed = ProfileManager(profiles_dir, generations)
+        classes = make_school(150, seed=count)
+        ids = []
+        for i in range(count):
+            profile = seed.create_profile_with_selection(f"Profil {i}", owner=f"user{i}")
+            profile["data"]["classes"] = {k: list(v) for k, v in classes.items()}
+            seed.save_profile(profile["profile_id"], profile)
+            ids.append(profile["profile_id"])
+        sample = ids[:50]
+        state = {}
+
+        def cold():
+            # A fresh worker: no parsed profiles, no profile index
+            state["pm"] = ProfileManager(profiles_dir, generations)
+
+        def warm():
+            if "warm" not in state:
+                state["warm"] = ProfileManager(profiles_dir, generations)
+                state["warm"].list_profiles()
+                for profile_id in sample:
+                    state["warm"].get_profile(profile_id)
+            state["pm"] = state["warm"]
+
+        def get_sample():
+            for profile_id in sample:
+                state["pm"].get_profile(profile_id)
+
+        target = seed.get_profile(ids[0])
+
+        def save_one():
+            seed.save_profile(ids[0], target)
+
+        yield f"profiles/get_50/cold/n={count}", get_sample, cold
+        yield f"profiles/get_50/warm/n={count}", get_sample, warm
+        yield f"profiles/list/cold/n={count}", lambda: state["pm"].list_profiles(), cold
+        yield f"profiles/list/warm/n={count}", lambda: state["pm"].list_profiles(), warm
+        yield f"profiles/save/n={count}", save_one, None
+
+
+def select_cases(workdir: str, quick: bool, only: Optional[str]) -> Iterator[Case]:
+    """Cases lazily, group by group - fixtures of groups the filter excludes are never built"""
+    groups = {"generate": lambda: generate_cases(workdir, quick),
+              "upload": lambda: upload_cases(quick),
+              "profiles": lambda: profile_cases(workdir, quick)}
+    prefix = only.split("/")[0] if only else ""
+    for name, build in groups.items():
+        if not prefix or prefix not in groups or name == prefix:
+            yield from build()
+
+
+def run_cases(cases: Iterator[Case], only: Optional[str]) -> Dict[str, Dict]:
+    results = {}
+    for name, fn, setup in cases:
+        if only and only not in name:
+            continue
+        result = harness.measure(fn, setup)
+        results[name] = result
+        print(f"{name:<45} {result['median_ms']:>10.1f} ms  {result['peak_kb'] / 1024:>8.1f} MB"
+              f"  ({result['runs']} runs)", flush=True)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="small sizes only")
+    parser.add_argument("--filter", help="run only cases whose name contains this text")
+    parser.add_argument("--output", help="save results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--time-threshold", type=float, default=0.25,
+                        help="allowed median time increase (0.25 = +25%%)")
+    parser.add_argument("--memory-threshold", type=float, default=0.25,
+                        help="allowed peak memory increase (0.25 = +25%%)")
+    parser.add_argument("--min-time-ms", type=float, default=5.0,
+                        help="skip the time gate for cases faster than this in the baseline")
+    parser.add_argument("--min-peak-kb", type=float, default=256.0,
+                        help="skip the memory gate for cases peaking below this in the baseline")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    with tempfile.TemporaryDirectory(prefix="tahlilchi-bench-") as workdir:
+        results = run_cases(select_cases(workdir, args.quick, args.filter), args.filter)
+
+    if args.output:
+        harness.save(args.output, results)
+        print(f"\nSaved {len(results)} results to {args.output}")
+
+    if args.compare:
+        baseline = harness.load(args.compare)
+        if args.filter:
+            baseline = {name: value for name, value in baseline.items() if args.filter in name}
+        rows = harness.compare(baseline, results, args.time_threshold, args.memory_threshold,
+                               args.min_time_ms, args.min_peak_kb)
+        print(f"\n{'case':<45} {'time':>8} {'memory':>8}  status")
+        for row in rows:
+            print(f"{row['case']:<45} {row.get('time_ratio', ''):>8} {row.get('memory_ratio', ''):>8}"
+                  f"  {row['status']}")
+        regressed = [row for row in rows if row["status"] == "regressed"]
+        if regressed:
+            print(f"\n{len(regressed)} case(s) regressed beyond the thresholds", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+# benchmarks/synthetic.py
+"""Synthetic schools, rosters and upload files for benchmarks and load tests"""
+import random
+from html import escape
+from io import BytesIO
+from typing import Dict, List
+
+FIRST_NAMES = (
+    "Abdulla", "Aziza", "Bekzod", "Dilnoza", "Elyor", "Farrux", "Gulnora", "Hasan",
+    "Iroda", "Jasur", "Kamola", "Laylo", "Madina", "Nodir", "Oʻktam", "Gʻayrat",
+    "Rustam", "Sardor", "Shahzoda", "Temur", "Umida", "Vali", "Xurshid", "Yulduz",
+    "Zarina", "Shoʻxrux", "Muxlisa", "Otabek", "Nilufar", "Sanjar",
+)
+LAST_NAMES = (
+    "Karimov", "Rahimova", "Toshmatov", "Yusupova", "Aliyev", "Qodirova", "Saidov",
+    "Ergasheva", "Nazarov", "Tursunova", "Xolmatov", "Gʻofurova", "Oʻrinboyev",
+    "Mirzayeva", "Sobirov", "Ismoilova", "Rashidov", "Normatova", "Hamidov", "Usmonova",
+)
+PARALLELS = "ABCDEFG"
+
+
+def make_names(count: int, seed: int = 0) -> List[str]:
+    """`count` distinct "Familiya Ism" names"""
+    rng = random.Random(seed)
+    names, seen = [], set()
+    while len(names) < count:
+        name = f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}"
+        if name in seen:
+            name = f"{name} {len(names)}"
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def make_school(num_students: int, class_size: int = 30, seed: int = 0) -> Dict[str, List[str]]:
+    """Classes "1-A" .. "11-G" with about `class_size` students each"""
+    names = make_names(num_students, seed)
+    classes: Dict[str, List[str]] = {}
+    per_grade = len(PARALLELS)
+    for i in range(0, num_students, class_size):
+        index = i // class_size
+        grade, parallel = index // per_grade % 11 + 1, PARALLELS[index % per_grade]
+        cycle = index // (11 * per_grade)
+        name = f"{grade}-{parallel}" + (f"{cycle + 1}" if cycle else "")
+        classes[name] = names[i:i + class_size]
+    return classes
+
+
+def _export_rows(school: Dict[str, List[str]]):
+    """Rows of the school-wide export: two header rows, then № | F.I.O | ... | Sinf"""
+    yield ["Oʻquvchilar roʻyxati", "", "", "", "", ""]
+    yield ["№", "F.I.O", "Tugʻilgan sana", "Jinsi", "Guvohnoma", "Sinf"]
+    n = 0
+    for class_name, students in school.items():
+        for student in students:
+            n += 1
+            yield [n, student, "2015-01-01", "", f"I-TN {n:07d}", class_name]
+
+
+def admin_export_xlsx(school: Dict[str, List[str]]) -> bytes:
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    for row in _export_rows(school):
+        ws.append(row)
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def admin_export_html(school: Dict[str, List[str]]) -> bytes:
+    """HTML table - the same bytes are what .xls exports usually contain"""
+    parts = ["<html><head><meta charset=\"utf-8\"></head><body><table>"]
+    for row in _export_rows(school):
+        parts.append("<tr>" + "".join(f"<td>{escape(str(v))}</td>" for v in row) + "</tr>")
+    parts.append("</table></body></html>")
+    return "\n".join(parts).encode("utf-8")
+
+
+def admin_export(school: Dict[str, List[str]], fmt: str) -> bytes:
+    """Upload body for `fmt` in xlsx, xls, html"""
+    if fmt == "xlsx":
+        return admin_export_xlsx(school)
+    if fmt in ("xls", "html"):
+        return admin_export_html(school)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+def journal_xlsx(class_name: str, students: List[str]) -> bytes:
+    """Class journal as /journal-upload expects it: "Sinf:" in A2, students from B11"""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["Sinf jurnali"])
+    ws.append([f"Sinf: {class_name} 2025-2026 oʻquv yili"])
+    for _ in range(8):
+        ws.append([])
+    for i, student in enumerate(students, start=1):
+        ws.append([i, student])
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
@@ -1 +1,18 @@
-from .generator import create_assessment_template
+def __getattr__(name):
+    # openpyxl faqat generator kerak bo'lganda yuklanadi
+    if name == "create_assessment_template":
+        from .generator import create_assessment_template
+        return create_assessment_template
+    if name == "update_assessment_workbook":
+        from .updater import update_assessment_workbook
+        return update_assessment_workbook
+    if name == "read_assessment_results":
+        from .reader import read_assessment_results
+        return read_assessment_results
+    if name == "build_layout":
+        from .generator import build_layout
+        return build_layout
+    if name == "render_html":
+        from .html_renderer import render_html
+        return render_html
+    raise AttributeError(f"module 'core' has no attribute '{name}'")
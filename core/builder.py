@@ -1,56 +1,56 @@
 from openpyxl.utils import get_column_letter
-from .styles import *
+from .layout import CENTER, CENTER_WRAP, BOLD, TITLE_FONT, RED_BOLD, YELLOW_FILL
 from .formula import *
 
 
-def build_title(ws, config, last_col_letter):
+def build_title(layout, config, last_col_letter):
     title = (
         f"{config['tuman']}dagi {config['maktab']}ning {config['sinf']} "
         f"{config['fan']} fanidan o'tkazilgan 2025-2026 o'quv yili{config['chorak']}-chorak "
         f"{config['imtihon_nomi']} tahlili"
     )
 
-    ws.merge_cells(f'A1:{last_col_letter}1')
-    cell = ws['A1']
+    layout.merge_cells(f'A1:{last_col_letter}1')
+    cell = layout['A1']
     cell.value = title
     cell.font = TITLE_FONT
     cell.alignment = CENTER_WRAP
-    ws.row_dimensions[1].height = 50
+    layout.set_row_height(1, 50)
 
 
-def build_header(ws, num_tasks, jami_col_letter, percent_col_letter):
-    ws.merge_cells('A2:A3')
-    ws['A2'].value = "№"
-    ws['A2'].font = BOLD
-    ws['A2'].alignment = CENTER
+def build_header(layout, num_tasks, jami_col_letter, percent_col_letter):
+    layout.merge_cells('A2:A3')
+    layout['A2'].value = "№"
+    layout['A2'].font = BOLD
+    layout['A2'].alignment = CENTER
 
-    ws.merge_cells('B2:B3')
-    ws['B2'].value = "FISH"
-    ws['B2'].font = BOLD
-    ws['B2'].alignment = CENTER
+    layout.merge_cells('B2:B3')
+    layout['B2'].value = "FISH"
+    layout['B2'].font = BOLD
+    layout['B2'].alignment = CENTER
 
     for i in range(1, num_tasks + 1):
         col_letter = get_column_letter(2 + i)
-        cell = ws[f"{col_letter}2"]
+        cell = layout[f"{col_letter}2"]
         cell.value = f"{i}-topshiriq maks.ball"
         cell.font = BOLD
         cell.alignment = CENTER_WRAP
 
-    ws[jami_col_letter + "2"] = "Jami ball"
-    ws[jami_col_letter + "2"].alignment = CENTER
-    ws[jami_col_letter + "2"].font = BOLD
+    layout[jami_col_letter + "2"] = "Jami ball"
+    layout[jami_col_letter + "2"].alignment = CENTER
+    layout[jami_col_letter + "2"].font = BOLD
 
-    ws[percent_col_letter + "2"] = "%"
-    ws[percent_col_letter + "2"].alignment = CENTER
-    ws[percent_col_letter + "2"].font = BOLD
+    layout[percent_col_letter + "2"] = "%"
+    layout[percent_col_letter + "2"].alignment = CENTER
+    layout[percent_col_letter + "2"].font = BOLD
 
-    ws.merge_cells(f"{percent_col_letter}2:{percent_col_letter}3")
+    layout.merge_cells(f"{percent_col_letter}2:{percent_col_letter}3")
 
 
-def build_max_scores_row(ws, max_scores, num_tasks, jami_col_letter):
+def build_max_scores_row(layout, max_scores, num_tasks, jami_col_letter):
     for idx, score in enumerate(max_scores, start=1):
         col_letter = get_column_letter(2 + idx)
-        cell = ws[f"{col_letter}3"]
+        cell = layout[f"{col_letter}3"]
         cell.value = score
         cell.alignment = CENTER
         cell.font = RED_BOLD
@@ -60,80 +60,112 @@ def build_max_scores_row(ws, max_scores, num_tasks, jami_col_letter):
     end_idx = 2 + num_tasks
     formula = build_max_row_total_formula(start_idx, end_idx)
 
-    cell = ws[f"{jami_col_letter}3"]
+    cell = layout[f"{jami_col_letter}3"]
     cell.value = formula
     cell.alignment = CENTER
     cell.font = RED_BOLD
     cell.fill = YELLOW_FILL
 
+    layout.cached_values[f"{jami_col_letter}3"] = sum_value(max_scores)
 
-def build_student_rows(ws, students_list, num_tasks, jami_col_letter, percent_col_letter):
+
+def build_student_rows(layout, students_list, num_tasks, jami_col_letter, percent_col_letter,
+                       shared_formulas=False):
+    """shared_formulas bo'lsa Jami va % formulalari faqat birinchi o'quvchi
+    qatoriga yoziladi, qolgan qatorlar umumiy (shared) formula guruhiga kiradi"""
     row = 4
+    cached_values = layout.cached_values
+    # Ballar hali kiritilmagan: Jami 0, % esa maks. jamiga bog'liq
+    jami_value = sum_value([])
+    percent_value = percentage_value(jami_value, cached_values.get(f"{jami_col_letter}3"))
     for idx, name in enumerate(students_list, start=1):
-        ws.cell(row=row, column=1, value=idx)
-        ws.cell(row=row, column=2, value=name)
+        layout.cell(row=row, column=1, value=idx)
+        layout.cell(row=row, column=2, value=name)
 
         for col in range(3, 3 + num_tasks):
-            ws.cell(row=row, column=col, value="")
+            layout.cell(row=row, column=col, value="")
+
+        write_formulas = not shared_formulas or row == 4
 
         # Jami formula
-        sum_formula = build_sum_formula(3, 2 + num_tasks, row)
-        c = ws[f"{jami_col_letter}{row}"]
-        c.value = sum_formula
+        c = layout[f"{jami_col_letter}{row}"]
+        if write_formulas:
+            c.value = build_sum_formula(3, 2 + num_tasks, row)
         c.font = RED_BOLD
         c.fill = YELLOW_FILL
 
         # % formula
-        total_col_letter = get_column_letter(num_tasks + 3)
-        percent_formula = build_percentage_formula(total_col_letter, row)
-        ws[f"{percent_col_letter}{row}"].value = percent_formula
+        c = layout[f"{percent_col_letter}{row}"]
+        if write_formulas:
+            total_col_letter = get_column_letter(num_tasks + 3)
+            c.value = build_percentage_formula(total_col_letter, row)
+
+        cached_values[f"{jami_col_letter}{row}"] = jami_value
+        cached_values[f"{percent_col_letter}{row}"] = percent_value
 
         row += 1
 
+    if shared_formulas:
+        layout.shared_groups.append((jami_col_letter, 4, row - 1))
+        layout.shared_groups.append((percent_col_letter, 4, row - 1))
+
     return row  # next "Jami" row
 
 
-def build_footer(ws, jami_row, num_tasks):
+def _column_average(cached_values, col_letter, start_row, end_row):
+    # Keshda yo'q kataklar bo'sh (kiritilmagan ballar)
+    values = [cached_values[f"{col_letter}{r}"] for r in range(start_row, end_row + 1)
+              if f"{col_letter}{r}" in cached_values]
+    return average_value(values)
+
+
+def build_footer(layout, jami_row, num_tasks):
     start_row = 4
     end_row = jami_row - 1
 
-    ws.cell(jami_row, 2, "Jami")
+    layout.cell(jami_row, 2, "Jami")
 
     for col in range(3, 3 + num_tasks):
         col_letter = get_column_letter(col)
         formula = build_average_formula(col_letter, start_row, end_row)
-        cell = ws.cell(row=jami_row, column=col, value=formula)
+        cell = layout.cell(row=jami_row, column=col, value=formula)
         cell.font = RED_BOLD
         cell.fill = YELLOW_FILL
+        layout.cached_values[f"{col_letter}{jami_row}"] = _column_average(
+            layout.cached_values, col_letter, start_row, end_row)
 
     # Jami
     total_col = num_tasks + 3
     col_letter = get_column_letter(total_col)
     formula = build_average_formula(col_letter, start_row, end_row)
-    c = ws.cell(row=jami_row, column=total_col, value=formula)
+    c = layout.cell(row=jami_row, column=total_col, value=formula)
     c.font = RED_BOLD
     c.fill = YELLOW_FILL
+    layout.cached_values[f"{col_letter}{jami_row}"] = _column_average(
+        layout.cached_values, col_letter, start_row, end_row)
 
     # %
     percent_col = num_tasks + 4
     col_letter = get_column_letter(percent_col)
     formula = build_average_formula(col_letter, start_row, end_row)
-    c = ws.cell(row=jami_row, column=percent_col, value=formula)
+    c = layout.cell(row=jami_row, column=percent_col, value=formula)
     c.font = RED_BOLD
     c.fill = YELLOW_FILL
+    layout.cached_values[f"{col_letter}{jami_row}"] = _column_average(
+        layout.cached_values, col_letter, start_row, end_row)
 
     return jami_row
 
 
-def build_signatures(ws, jami_row, total_columns, config):
+def build_signatures(layout, jami_row, total_columns, config):
     signature_row = jami_row + 2
     end_col_letter = get_column_letter(min(4, total_columns))
 
-    ws.merge_cells(f"A{signature_row}:{end_col_letter}{signature_row}")
-    ws[f"A{signature_row}"] = f"O'IBDO': _____________ {config['oibdo']}"
+    layout.merge_cells(f"A{signature_row}:{end_col_letter}{signature_row}")
+    layout[f"A{signature_row}"] = f"O'IBDO': _____________ {config['oibdo']}"
 
-    ws.merge_cells(f"A{signature_row+2}:{end_col_letter}{signature_row+2}")
-    ws[f"A{signature_row+2}"] = f"Metod birlashma rahbari: _____________ {config['metod_rahbari']}"
+    layout.merge_cells(f"A{signature_row+2}:{end_col_letter}{signature_row+2}")
+    layout[f"A{signature_row+2}"] = f"Metod birlashma rahbari: _____________ {config['metod_rahbari']}"
 
-    ws.merge_cells(f"A{signature_row+4}:{end_col_letter}{signature_row+4}")
-    ws[f"A{signature_row+4}"] = f"Fan o'qituvchisi: _____________ {config['fan_oqituvchisi']}"
+    layout.merge_cells(f"A{signature_row+4}:{end_col_letter}{signature_row+4}")
+    layout[f"A{signature_row+4}"] = f"Fan o'qituvchisi: _____________ {config['fan_oqituvchisi']}"
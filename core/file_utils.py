@@ -1,7 +1,20 @@
 # file_utils.py yaxshilangan versiya
 import os
 import re
-from datetime import datetime
+
+# O'zbekcha apostrof variantlari (oʻ, gʻ, oʼ ...), qo'shtirnoq va tirelar
+CHAR_REPLACEMENTS = {
+    'ʻ': "'", 'ʼ': "'", '‘': "'", '’': "'",
+    '`': "'", '“': '"', '”': '"',
+    '«': '"', '»': '"', '—': '-', '–': '-'
+}
+_CHAR_TABLE = str.maketrans(CHAR_REPLACEMENTS)
+
+
+def normalize_chars(text: str) -> str:
+    """Apostrof/qo'shtirnoq/tire variantlarini oddiy ', " va - ga keltirish"""
+    return text.translate(_CHAR_TABLE)
+
 
 def get_safe_filename(filename: str) -> str:
     """Fayl nomini xavfsiz qilish
@@ -13,14 +26,7 @@ def get_safe_filename(filename: str) -> str:
         Xavfsiz fayl nomi
     """
     # Lotin bo'lmagan harflarni almashtirish
-    replacements = {
-        'ʻ': "'", 'ʼ': "'", '‘': "'", '’': "'",
-        'ʻ': "'", '`': "'", '“': '"', '”': '"',
-        '«': '"', '»': '"', '—': '-', '–': '-'
-    }
-    
-    for old, new in replacements.items():
-        filename = filename.replace(old, new)
+    filename = normalize_chars(filename)
     
     # Faqat lotin harflari, raqamlar va allowed belgilar
     filename = re.sub(r'[^a-zA-Z0-9._\-() ]', '', filename)
@@ -36,16 +42,8 @@ def get_safe_filename(filename: str) -> str:
     return filename
 
 def ensure_output_dir(path: str) -> str:
-    """Chiqish papkasini yaratish va toza nom qaytarish"""
-    if not os.path.exists(path):
+    """Chiqish papkasini yaratish (bor bo'lsa tegmaslik) va yo'lini qaytarish"""
+    # Arzon tekshiruv - papka tarkibini o'qimaymiz
+    if not os.path.isdir(path):
         os.makedirs(path, exist_ok=True)
-    
-    # Papka bo'sh emasligini tekshirish
-    if os.listdir(path):
-        # Yangi kichik papka yaratish
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        new_path = os.path.join(path, timestamp)
-        os.makedirs(new_path, exist_ok=True)
-        return new_path
-    
-    return path
\ No newline at end of file
+    return path
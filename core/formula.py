@@ -18,3 +18,40 @@ def build_percentage_formula(total_col_letter: str, row: int) -> str:
 
 def build_average_formula(col_letter: str, start_row: int, end_row: int) -> str:
     return f"=AVERAGE({col_letter}{start_row}:{col_letter}{end_row})"
+
+
+# Keshlangan qiymatlar - formulalar natijasi Python'da hisoblanadi
+DIV0 = "#DIV/0!"
+
+
+def _numbers(values):
+    return [v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)]
+
+
+def sum_value(values):
+    """=SUM natijasi: matn va bo'sh kataklar hisobga olinmaydi"""
+    if DIV0 in values:
+        return DIV0
+    return sum(_numbers(values))
+
+
+def percentage_value(total, max_total):
+    """=Jami/$Jami$3*100 natijasi"""
+    if total == DIV0 or max_total == DIV0 or not max_total:
+        return DIV0
+    return total / max_total * 100
+
+
+def average_value(values):
+    """=AVERAGE natijasi: sonlar bo'lmasa #DIV/0!"""
+    if DIV0 in values:
+        return DIV0
+    numbers = _numbers(values)
+    if not numbers:
+        return DIV0
+    return sum(numbers) / len(numbers)
+
+
+def build_shared_formula_ref(col_letter: str, first_row: int, last_row: int) -> str:
+    """Umumiy (shared) formula oralig'i, masalan E4:E33"""
+    return f"{col_letter}{first_row}:{col_letter}{last_row}"
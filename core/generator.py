@@ -1,4 +1,5 @@
-from openpyxl import Workbook
+import os
+
 from openpyxl.utils import get_column_letter
 
 from .validators import (
@@ -15,19 +16,26 @@ from .builder import (
     build_footer,
     build_signatures,
 )
-from .styles import *
+from .layout import SheetLayout, CENTER, LEFT, THIN_BORDER
 from .file_utils import get_safe_filename, ensure_output_dir
+from .xlsx_renderer import render_xlsx
+from .timing import StageClock
 
 
 from typing import List, Dict, Optional
 
-def create_assessment_template(
+def build_layout(
     students_list: List[str],
     num_tasks: int,
     config: Optional[Dict] = None,
     max_scores: Optional[List[float]] = None,
-    output_dir: str = "."
-) -> Dict:
+    shared_formulas: bool = False,
+    clock: Optional[StageClock] = None
+) -> SheetLayout:
+    """Tahlil varag'i tuzilishi (formatdan mustaqil) - xlsx va HTML renderer uchun
+
+    clock berilsa "generate.build" va "generate.style" bosqichlari alohida yoziladi.
+    """
 
     # 1. Validatsiya
     validate_students_list(students_list)
@@ -35,9 +43,7 @@ def create_assessment_template(
     config = prepare_config(config)
     max_scores = validate_max_scores(max_scores, num_tasks)
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Tahlil"
+    layout = SheetLayout("Tahlil")
 
     total_columns = 2 + num_tasks + 2
     last_col_letter = get_column_letter(total_columns)
@@ -45,59 +51,84 @@ def create_assessment_template(
     percent_col_letter = get_column_letter(total_columns)
 
     # 2. Sarlavha
-    build_title(ws, config, last_col_letter)
+    build_title(layout, config, last_col_letter)
 
     # 3. Header
-    build_header(ws, num_tasks, jami_col_letter, percent_col_letter)
+    build_header(layout, num_tasks, jami_col_letter, percent_col_letter)
 
     # 4. Max scores row
-    build_max_scores_row(ws, max_scores, num_tasks, jami_col_letter)
+    build_max_scores_row(layout, max_scores, num_tasks, jami_col_letter)
 
     # 5. Students
-    jami_row = build_student_rows(ws, students_list, num_tasks,
-                                  jami_col_letter, percent_col_letter)
+    jami_row = build_student_rows(layout, students_list, num_tasks,
+                                  jami_col_letter, percent_col_letter, shared_formulas)
 
     # 6. Footer (jami)
-    build_footer(ws, jami_row, num_tasks)
+    build_footer(layout, jami_row, num_tasks)
 
     # 7. Signatures
-    build_signatures(ws, jami_row, total_columns, config)
+    build_signatures(layout, jami_row, total_columns, config)
+    if clock:
+        clock.lap("generate.build")
 
     # 8. Style & Borders
-    for row in ws.iter_rows(min_row=2, max_row=jami_row, min_col=1, max_col=total_columns):
+    for row in layout.iter_rows(min_row=2, max_row=jami_row, min_col=1, max_col=total_columns):
         for cell in row:
             cell.border = THIN_BORDER
 
     # Left-align name column
-    for row in ws.iter_rows(min_row=3, max_row=jami_row, min_col=1, max_col=2):
+    for row in layout.iter_rows(min_row=3, max_row=jami_row, min_col=1, max_col=2):
         for c in row:
             c.alignment = LEFT
 
-    for row in ws.iter_rows(min_row=4, max_row=jami_row, min_col=3, max_col=2 + num_tasks):
+    for row in layout.iter_rows(min_row=4, max_row=jami_row, min_col=3, max_col=2 + num_tasks):
         for c in row:
             c.alignment = CENTER
 
-    for row in ws.iter_rows(min_row=4, max_row=jami_row,
-                            min_col=2 + num_tasks + 1, max_col=total_columns):
+    for row in layout.iter_rows(min_row=4, max_row=jami_row,
+                                min_col=2 + num_tasks + 1, max_col=total_columns):
         for c in row:
             c.alignment = CENTER
 
     # 9. Column widths
-    ws.column_dimensions['A'].width = 4
-    ws.column_dimensions['B'].width = 30
+    layout.set_column_width('A', 4)
+    layout.set_column_width('B', 30)
 
     for i in range(num_tasks):
-        ws.column_dimensions[get_column_letter(3 + i)].width = 11
+        layout.set_column_width(get_column_letter(3 + i), 11)
 
-    ws.column_dimensions[get_column_letter(num_tasks + 3)].width = 8
-    ws.column_dimensions[get_column_letter(num_tasks + 4)].width = 8
+    layout.set_column_width(get_column_letter(num_tasks + 3), 8)
+    layout.set_column_width(get_column_letter(num_tasks + 4), 8)
+    if clock:
+        clock.lap("generate.style")
+
+    return layout
+
+
+def create_assessment_template(
+    students_list: List[str],
+    num_tasks: int,
+    config: Optional[Dict] = None,
+    max_scores: Optional[List[float]] = None,
+    output_dir: str = ".",
+    cache_values: bool = True,
+    shared_formulas: bool = False
+) -> Dict:
+
+    clock = StageClock()
+    config = prepare_config(config)
+    layout = build_layout(students_list, num_tasks, config, max_scores, shared_formulas, clock)
 
     # 10. Save
-    ensure_output_dir(output_dir)
+    output_dir = ensure_output_dir(output_dir)
     filename = f"{config['sinf']}_{config['fan']}_{config['chorak']}_chorak.xlsx"
     filename = get_safe_filename(filename)
     file_path = f"{output_dir}/{filename}"
-    wb.save(file_path)
+    # Vaqtinchalik faylga yozib, keyin almashtirish - yuklab olinayotgan
+    # eski fayl buzilmaydi
+    tmp_path = f"{file_path}.{os.getpid()}.{id(layout)}.tmp"
+    render_xlsx(layout, tmp_path, cache_values, clock)
+    os.replace(tmp_path, file_path)
 
     return {
         'file_path': file_path,
@@ -0,0 +1,95 @@
+from html import escape
+from typing import List
+
+from openpyxl.utils import get_column_letter
+
+from .formula import DIV0
+from .layout import SheetLayout
+
+# Excel ustun kengligi (belgilar) -> piksel
+_CHAR_PX = 7
+
+PREVIEW_CSS = """
+.tahlil-preview { border-collapse: collapse; font-family: Calibri, Arial, sans-serif; font-size: 11pt; }
+.tahlil-preview td { padding: 2px 4px; vertical-align: middle; white-space: nowrap; }
+.tahlil-preview .b-thin { border: 1px solid #000; }
+.tahlil-preview .a-center { text-align: center; }
+.tahlil-preview .a-center_wrap { text-align: center; white-space: normal; }
+.tahlil-preview .a-left { text-align: left; }
+.tahlil-preview .f-bold { font-weight: bold; }
+.tahlil-preview .f-title { font-weight: bold; font-size: 12pt; }
+.tahlil-preview .f-red_bold { font-weight: bold; color: #f00; }
+.tahlil-preview .fill-yellow { background: #ff0; }
+.tahlil-preview .error { color: #999; }
+"""
+
+
+def _display(layout: SheetLayout, row: int, column: int, value) -> str:
+    """Katakda ko'rinadigan matn - formulalar o'rniga hisoblangan natija"""
+    if isinstance(value, str) and value.startswith("="):
+        value = layout.cached_values.get(layout.coordinate(row, column), "")
+    elif value is None:
+        # Umumiy formula guruhidagi qatorlar: formula faqat birinchisida
+        value = layout.cached_values.get(layout.coordinate(row, column), "")
+    if isinstance(value, float):
+        return f"{value:.2f}".rstrip("0").rstrip(".")
+    return escape(str(value))
+
+
+def render_html(layout: SheetLayout, include_css: bool = True) -> str:
+    """Layout'ni HTML jadval sifatida (brauzerda oldindan ko'rish uchun)"""
+    spans = layout.merged_spans()
+    covered = set()
+    for (row, col), (rows, cols) in spans.items():
+        for r in range(row, row + rows):
+            for c in range(col, col + cols):
+                if (r, c) != (row, col):
+                    covered.add((r, c))
+
+    max_column = layout.max_column
+    parts: List[str] = []
+    if include_css:
+        parts.append(f"<style>{PREVIEW_CSS}</style>")
+    parts.append('<table class="tahlil-preview"><colgroup>')
+    for column in range(1, max_column + 1):
+        width = layout.column_widths.get(get_column_letter(column))
+        parts.append(f'<col style="width:{int(width * _CHAR_PX)}px">' if width else "<col>")
+    parts.append("</colgroup>")
+
+    for number in range(1, layout.max_row + 1):
+        layout_row = layout.rows.get(number)
+        height = layout_row.height if layout_row else None
+        parts.append(f'<tr style="height:{height * 4 / 3:.0f}px">' if height else "<tr>")
+        cells = layout_row.cells if layout_row else []
+        for column in range(1, max_column + 1):
+            if (number, column) in covered:
+                continue
+            cell = cells[column - 1] if column <= len(cells) else None
+            attrs = ""
+            span = spans.get((number, column))
+            if span:
+                if span[0] > 1:
+                    attrs += f' rowspan="{span[0]}"'
+                if span[1] > 1:
+                    attrs += f' colspan="{span[1]}"'
+            if cell is None:
+                parts.append(f"<td{attrs}></td>")
+                continue
+            classes = []
+            if cell.border:
+                classes.append(f"b-{cell.border}")
+            if cell.alignment:
+                classes.append(f"a-{cell.alignment}")
+            if cell.font:
+                classes.append(f"f-{cell.font}")
+            if cell.fill:
+                classes.append(f"fill-{cell.fill}")
+            text = _display(layout, number, column, cell.value)
+            if text == DIV0:
+                classes.append("error")
+            if classes:
+                attrs += f' class="{" ".join(classes)}"'
+            parts.append(f"<td{attrs}>{text}</td>")
+        parts.append("</tr>")
+    parts.append("</table>")
+    return "".join(parts)
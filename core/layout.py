@@ -0,0 +1,121 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from openpyxl.utils import column_index_from_string, get_column_letter
+from openpyxl.utils.cell import coordinate_from_string, range_boundaries
+
+# Uslub nomlari - har bir renderer ularni o'z formatiga o'giradi
+CENTER = "center"
+CENTER_WRAP = "center_wrap"
+LEFT = "left"
+BOLD = "bold"
+TITLE_FONT = "title"
+RED_BOLD = "red_bold"
+YELLOW_FILL = "yellow"
+THIN_BORDER = "thin"
+
+
+class LayoutCell:
+    """Bitta katak: qiymat (matn, son yoki "=" formula) va uslub nomlari"""
+
+    __slots__ = ("value", "font", "fill", "alignment", "border")
+
+    def __init__(self, value=None):
+        self.value = value
+        self.font = None
+        self.fill = None
+        self.alignment = None
+        self.border = None
+
+    @property
+    def is_formula(self) -> bool:
+        return isinstance(self.value, str) and self.value.startswith("=")
+
+
+class LayoutRow:
+    __slots__ = ("number", "height", "cells")
+
+    def __init__(self, number: int):
+        self.number = number
+        self.height: Optional[float] = None
+        # cells[column - 1], bo'sh joylar None
+        self.cells: List[Optional[LayoutCell]] = []
+
+
+class SheetLayout:
+    """Tahlil varag'ining formatdan mustaqil tuzilishi
+
+    Builder funksiyalar uni bir marta to'ldiradi, keyin xlsx yoki HTML
+    renderer tayyor katak/qatorlardan foydalanadi. API openpyxl varag'iga
+    o'xshash (ws["A1"], ws.cell, merge_cells, iter_rows).
+    """
+
+    __slots__ = ("title", "rows", "merged", "column_widths", "cached_values", "shared_groups")
+
+    def __init__(self, title: str = "Sheet"):
+        self.title = title
+        self.rows: Dict[int, LayoutRow] = {}
+        self.merged: List[str] = []
+        self.column_widths: Dict[str, float] = {}
+        # Formulalar natijasi: "E4" -> qiymat
+        self.cached_values: Dict[str, object] = {}
+        # Umumiy formula guruhlari: (ustun harfi, birinchi qator, oxirgi qator)
+        self.shared_groups: List[Tuple[str, int, int]] = []
+
+    def cell(self, row: int, column: int, value=None) -> LayoutCell:
+        layout_row = self.rows.get(row)
+        if layout_row is None:
+            layout_row = self.rows[row] = LayoutRow(row)
+        cells = layout_row.cells
+        if len(cells) < column:
+            cells.extend([None] * (column - len(cells)))
+        cell = cells[column - 1]
+        if cell is None:
+            cell = cells[column - 1] = LayoutCell()
+        if value is not None:
+            cell.value = value
+        return cell
+
+    def __getitem__(self, coordinate: str) -> LayoutCell:
+        column, row = coordinate_from_string(coordinate)
+        return self.cell(row, column_index_from_string(column))
+
+    def __setitem__(self, coordinate: str, value):
+        self[coordinate].value = value
+
+    def merge_cells(self, cell_range: str):
+        self.merged.append(cell_range)
+
+    def merged_spans(self) -> Dict[Tuple[int, int], Tuple[int, int]]:
+        """(qator, ustun) -> (qator soni, ustun soni) birlashgan kataklar boshi uchun"""
+        spans = {}
+        for cell_range in self.merged:
+            min_col, min_row, max_col, max_row = range_boundaries(cell_range)
+            spans[(min_row, min_col)] = (max_row - min_row + 1, max_col - min_col + 1)
+        return spans
+
+    def set_row_height(self, row: int, height: float):
+        if row not in self.rows:
+            self.rows[row] = LayoutRow(row)
+        self.rows[row].height = height
+
+    def set_column_width(self, column_letter: str, width: float):
+        self.column_widths[column_letter] = width
+
+    def iter_rows(self, min_row: int, max_row: int, min_col: int, max_col: int) -> Iterator[Tuple[LayoutCell, ...]]:
+        for row in range(min_row, max_row + 1):
+            yield tuple(self.cell(row, col) for col in range(min_col, max_col + 1))
+
+    @property
+    def max_row(self) -> int:
+        return max(self.rows) if self.rows else 0
+
+    @property
+    def max_column(self) -> int:
+        return max((len(r.cells) for r in self.rows.values()), default=0)
+
+    def sorted_rows(self) -> List[LayoutRow]:
+        return [self.rows[n] for n in sorted(self.rows)]
+
+    @staticmethod
+    def coordinate(row: int, column: int) -> str:
+        return f"{get_column_letter(column)}{row}"
@@ -0,0 +1,73 @@
+# reader.py - to'ldirilgan tahlil varag'ini o'qish
+from typing import Dict, List, Optional
+
+from openpyxl import load_workbook
+
+FIRST_STUDENT_ROW = 4
+
+
+def locate_sheet(ws) -> Dict:
+    """Tahlil varag'i tuzilishi: Jami/% ustunlari va "Jami" qatori"""
+    jami_col = None
+    for col in range(3, ws.max_column + 1):
+        if ws.cell(2, col).value == "Jami ball":
+            jami_col = col
+            break
+    if jami_col is None or ws.cell(2, 2).value != "FISH":
+        raise ValueError("Fayl tahlil varag'iga o'xshamaydi: sarlavha qatori topilmadi")
+
+    jami_row = None
+    for row in range(FIRST_STUDENT_ROW, ws.max_row + 1):
+        if ws.cell(row, 2).value == "Jami":
+            jami_row = row
+            break
+    if jami_row is None:
+        raise ValueError("Fayl tahlil varag'iga o'xshamaydi: \"Jami\" qatori topilmadi")
+
+    return {"num_tasks": jami_col - 3, "jami_col": jami_col, "percent_col": jami_col + 1,
+            "jami_row": jami_row}
+
+
+def _score(value) -> Optional[float]:
+    """Katakdagi ball: son yoki sonli matn ("7", "7,5"), aks holda None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.strip().replace(",", "."))
+        except ValueError:
+            return None
+    return None
+
+
+def read_assessment_results(source) -> Dict:
+    """To'ldirilgan tahlil faylidagi ballar
+
+    Formulalar (Jami, %) o'qilmaydi - natijalar xom ballardan hisoblanadi.
+    Bali kiritilmagan topshiriq None bo'ladi.
+
+    Returns:
+        {"num_tasks", "max_scores": [...], "students": [(ism, [ball | None, ...]), ...]}
+    """
+    wb = load_workbook(source)
+    try:
+        ws = wb.active
+        layout = locate_sheet(ws)
+        num_tasks = layout["num_tasks"]
+        task_cols = range(3, 3 + num_tasks)
+
+        max_scores = [_score(ws.cell(3, col).value) for col in task_cols]
+        if any(score is None or score <= 0 for score in max_scores):
+            raise ValueError("Maksimal ballar qatori to'liq emas")
+
+        students: List = []
+        for row in range(FIRST_STUDENT_ROW, layout["jami_row"]):
+            name = ws.cell(row, 2).value
+            if name is None or not str(name).strip():
+                continue
+            students.append((str(name).strip(), [_score(ws.cell(row, col).value) for col in task_cols]))
+        return {"num_tasks": num_tasks, "max_scores": max_scores, "students": students}
+    finally:
+        wb.close()
@@ -0,0 +1,110 @@
+import os
+import re
+import zipfile
+from typing import Dict, List, Optional, Tuple
+
+from .formula import DIV0, build_shared_formula_ref
+
+# openpyxl formulani natijasiz yozadi: <c r="E4" s="5"><f>SUM(C4:D4)</f><v></v></c>
+# (lxml) yoki <v /> (lxml o'rnatilmagan bo'lsa et_xmlfile) - ikkalasi ham qabul qilinadi
+_FORMULA_CELL = re.compile(rb'<c r="([A-Z]+)([0-9]+)"([^>]*)><f>([^<]*)</f>(?:<v></v>|<v\s*/>)</c>')
+# Qiymatsiz (faqat uslubli) katak: <c r="E5" s="5" t="n"></c> (lxml),
+# <c r="E5" s="5" t="n" /> (et_xmlfile) yoki <c r="E5" s="5"/>
+_EMPTY_CELL = rb'<c r="(%s)([0-9]+)"((?: s="[0-9]+")?)(?: t="n")?(?:\s*/>|></c>)'
+
+# (ustun harfi, birinchi qator, oxirgi qator)
+SharedGroup = Tuple[str, int, int]
+
+
+def _format_value(value) -> bytes:
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return (repr(value) if isinstance(value, float) else str(value)).encode()
+
+
+def _cell(ref: bytes, attrs: bytes, formula: bytes, value) -> bytes:
+    if value is None:
+        return b'<c r="%s"%s>%s<v></v></c>' % (ref, attrs, formula)
+    if value == DIV0:
+        attrs += b' t="e"'
+    return b'<c r="%s"%s>%s<v>%s</v></c>' % (ref, attrs, formula, _format_value(value))
+
+
+def rewrite_sheet(data: bytes, cached_values: Optional[Dict[str, object]] = None,
+                  shared_groups: Optional[List[SharedGroup]] = None) -> bytes:
+    """Sheet XML ga formula natijalari va umumiy (shared) formulalarni yozish
+
+    Natijasi berilgan har bir katak va umumiy formula guruhining har bir
+    katagi topilib yozilishi shart, aks holda ValueError - fayl jimgina
+    natijasiz yoki formulasiz qolmaydi.
+    """
+    cached_values = cached_values or {}
+    written = set()
+    groups = {}
+    for si, (col, first, last) in enumerate(shared_groups or []):
+        groups[col.encode()] = (first, last, si)
+
+    def fill_formula(match):
+        col, row, attrs, formula = match.groups()
+        ref = col + row
+        group = groups.get(col)
+        if group and int(row) == group[0]:
+            # Guruh boshi: formula matni faqat shu yerda saqlanadi
+            f = b'<f t="shared" ref="%s" si="%d">%s</f>' % (
+                build_shared_formula_ref(col.decode(), group[0], group[1]).encode(), group[2], formula)
+        else:
+            f = b'<f>%s</f>' % formula
+        written.add(ref.decode())
+        return _cell(ref, attrs, f, cached_values.get(ref.decode()))
+
+    data = _FORMULA_CELL.sub(fill_formula, data)
+    if groups:
+        data = _fill_followers(data, groups, cached_values, written)
+    expected = set(cached_values)
+    for col, (first, last, _) in groups.items():
+        expected.update(f"{col.decode()}{row}" for row in range(first, last + 1))
+    missing = expected - written
+    if missing:
+        raise ValueError(f"Katak qayta yozilmadi: {', '.join(sorted(missing)[:5])} "
+                         f"(jami {len(missing)} ta)")
+    return data
+
+
+def _fill_followers(data: bytes, groups: Dict[bytes, Tuple[int, int, int]],
+                    cached_values: Dict[str, object], written: set) -> bytes:
+    """Umumiy formula guruhining qolgan (bo'sh) kataklarini to'ldirish"""
+
+    def fill_follower(match):
+        col, row, attrs = match.groups()
+        first, last, si = groups[col]
+        if not first < int(row) <= last:
+            return match.group(0)
+        ref = col + row
+        written.add(ref.decode())
+        return _cell(ref, attrs, b'<f t="shared" si="%d"/>' % si, cached_values.get(ref.decode()))
+
+    columns = b"|".join(re.escape(col) for col in groups)
+    return re.sub(_EMPTY_CELL % columns, fill_follower, data)
+
+
+def postprocess_workbook(xlsx_path: str, cached_values: Optional[Dict[str, object]] = None,
+                         shared_groups: Optional[List[SharedGroup]] = None,
+                         sheet: str = "xl/worksheets/sheet1.xml"):
+    """openpyxl saqlagan faylni qayta yozish
+
+    Formula kataklariga hisoblangan natija (<v>) qo'shiladi - Excel'siz
+    o'quvchilar (pandas, openpyxl data_only, ko'rish dasturlari) qiymatlarni
+    darhol ko'radi, Excel baribir qayta hisoblaydi. `shared_groups` dagi
+    ustunlar bitta umumiy formula sifatida yoziladi.
+    """
+    if not cached_values and not shared_groups:
+        return
+    tmp_path = f"{xlsx_path}.post.tmp"
+    with zipfile.ZipFile(xlsx_path) as src, \
+            zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as dst:
+        for item in src.infolist():
+            data = src.read(item.filename)
+            if item.filename == sheet:
+                data = rewrite_sheet(data, cached_values, shared_groups)
+            dst.writestr(item, data)
+    os.replace(tmp_path, xlsx_path)
@@ -21,3 +21,10 @@ THIN_BORDER = Border(
 
 # Fills
 YELLOW_FILL = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+
+
+# core.layout uslub nomlari -> openpyxl obyektlari (xlsx renderer uchun)
+ALIGNMENTS = {"center": CENTER, "center_wrap": CENTER_WRAP, "left": LEFT}
+FONTS = {"bold": BOLD, "title": TITLE_FONT, "red_bold": RED_BOLD}
+FILLS = {"yellow": YELLOW_FILL}
+BORDERS = {"thin": THIN_BORDER}
@@ -0,0 +1,47 @@
+import time
+from contextlib import contextmanager
+from typing import Callable, List
+
+# (stage_name, seconds) qabul qiluvchi funksiyalar - masalan app.metrics
+_observers: List[Callable[[str, float], None]] = []
+
+
+def add_stage_observer(observer: Callable[[str, float], None]):
+    if observer not in _observers:
+        _observers.append(observer)
+
+
+def remove_stage_observer(observer: Callable[[str, float], None]):
+    if observer in _observers:
+        _observers.remove(observer)
+
+
+def _report(name: str, elapsed: float):
+    for observer in list(_observers):
+        observer(name, elapsed)
+
+
+@contextmanager
+def stage(name: str):
+    """Bosqich vaqtini o'lchash; kuzatuvchi bo'lmasa deyarli bepul"""
+    if not _observers:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _report(name, time.perf_counter() - started)
+
+
+class StageClock:
+    """Ketma-ket bosqichlar uchun: clock.lap("generate.build") oldingi lapdan beri vaqtni yozadi"""
+
+    def __init__(self):
+        self._last = time.perf_counter()
+
+    def lap(self, name: str):
+        now = time.perf_counter()
+        if _observers:
+            _report(name, now - self._last)
+        self._last = now
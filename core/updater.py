@@ -0,0 +1,227 @@
+import os
+from collections import defaultdict, deque
+from copy import copy
+from typing import Dict, List, Optional
+
+from openpyxl import load_workbook
+from openpyxl.utils import coordinate_to_tuple, get_column_letter
+from openpyxl.worksheet.cell_range import CellRange
+
+from .reader import FIRST_STUDENT_ROW, locate_sheet
+from .formula import (
+    build_average_formula,
+    build_percentage_formula,
+    build_sum_formula,
+    average_value,
+    percentage_value,
+    sum_value,
+)
+from .sheet_xml import postprocess_workbook
+from .timing import StageClock
+from .validators import validate_students_list
+
+
+def _name_key(name) -> str:
+    return " ".join(str(name or "").split()).casefold()
+
+
+def match_rows(old_names: List, new_names: List[str]) -> List[Optional[int]]:
+    """Har bir yangi o'quvchi uchun eski qator indeksi (ism bo'yicha), yangi bo'lsa None
+
+    Bir xil ismlar tartib bo'yicha juftlanadi.
+    """
+    by_name = defaultdict(deque)
+    for index, name in enumerate(old_names):
+        by_name[_name_key(name)].append(index)
+    sources = []
+    for name in new_names:
+        queue = by_name.get(_name_key(name))
+        sources.append(queue.popleft() if queue else None)
+    return sources
+
+
+def _cached_values(ws, layout: Dict, new_jami: int) -> Dict[str, object]:
+    """Barcha formulalar natijasi - ballar allaqachon xotirada, arzon
+
+    Foydalanuvchi formulani qiymat bilan almashtirgan kataklar tashlab
+    ketiladi - ularga natija yozilmaydi.
+    """
+    num_tasks = layout["num_tasks"]
+    jami_letter = get_column_letter(layout["jami_col"])
+    percent_letter = get_column_letter(layout["percent_col"])
+    cells = ws._cells
+
+    def value(row, col):
+        cell = cells.get((row, col))
+        return cell.value if cell is not None else None
+
+    cached = {}
+    max_total = sum_value([value(3, col) for col in range(3, 3 + num_tasks)])
+    cached[f"{jami_letter}3"] = max_total
+    columns = defaultdict(list)
+    for row in range(FIRST_STUDENT_ROW, new_jami):
+        scores = [value(row, col) for col in range(3, 3 + num_tasks)]
+        total = sum_value(scores)
+        percent = percentage_value(total, max_total)
+        cached[f"{jami_letter}{row}"] = total
+        cached[f"{percent_letter}{row}"] = percent
+        for col, score in enumerate(scores, start=3):
+            columns[col].append(score)
+        columns[layout["jami_col"]].append(total)
+        columns[layout["percent_col"]].append(percent)
+    for col in range(3, layout["percent_col"] + 1):
+        cached[f"{get_column_letter(col)}{new_jami}"] = average_value(columns[col])
+    formulas = {}
+    for ref, result in cached.items():
+        formula = value(*coordinate_to_tuple(ref))
+        if isinstance(formula, str) and formula.startswith("="):
+            formulas[ref] = result
+    return formulas
+
+
+def update_assessment_workbook(
+    source,
+    students_list: List[str],
+    output_path: str,
+    cache_values: bool = True,
+    shared_formulas: bool = False
+) -> Dict:
+    """To'ldirilgan tahlil faylini yangi ro'yxatga moslash, kiritilgan ballar saqlanadi
+
+    O'quvchilar ism bo'yicha juftlanadi: ketganlar qatori o'chadi, yangilar
+    qo'shiladi, qolganlar ballari bilan yangi o'rniga ko'chadi. Faqat o'rni
+    yoki mazmuni o'zgargan qatorlar qayta yoziladi (raqam, ism, ballar,
+    Jami/% formulalari); qator soni o'zgarsa "Jami" qatori va imzolar
+    siljiydi, AVERAGE oraliqlari yangilanadi. O'zgarishdan oldingi
+    qatorlarga tegilmaydi.
+
+    Args:
+        source: xlsx fayl yo'li yoki fayl obyekti
+        students_list: Sinfning hozirgi ro'yxati
+        output_path: Natija fayli
+    """
+    validate_students_list(students_list)
+    clock = StageClock()
+    wb = load_workbook(source)
+    ws = wb.active
+    layout = locate_sheet(ws)
+    clock.lap("update.load")
+
+    num_tasks = layout["num_tasks"]
+    jami_col, percent_col = layout["jami_col"], layout["percent_col"]
+    jami_letter = get_column_letter(jami_col)
+    old_jami = layout["jami_row"]
+    old_count = old_jami - FIRST_STUDENT_ROW
+    new_count = len(students_list)
+    new_jami = FIRST_STUDENT_ROW + new_count
+    delta = new_jami - old_jami
+    last_col = max(ws.max_column, percent_col)
+    cells = ws._cells
+
+    old_names = [ws.cell(row, 2).value for row in range(FIRST_STUDENT_ROW, old_jami)]
+    sources = match_rows(old_names, students_list)
+    used = {src for src in sources if src is not None}
+    removed = [old_names[i] for i in range(old_count) if i not in used]
+    added = [students_list[i] for i, src in enumerate(sources) if src is None]
+    changed = [i for i, src in enumerate(sources) if src != i]
+
+    # 1. Ko'chadigan qatorlar mazmuni va uslublar - hali hech narsa yozilmagan
+    row_styles = {col: copy(ws.cell(FIRST_STUDENT_ROW, col)._style)
+                  for col in range(1, percent_col + 1)} if old_count else {}
+    moved_data = {}
+    for i in changed:
+        src = sources[i]
+        if src is None:
+            continue
+        row = FIRST_STUDENT_ROW + src
+        moved_data[i] = {col: (cells[(row, col)].value, copy(cells[(row, col)]._style))
+                         for col in range(3, last_col + 1)
+                         if col not in (jami_col, percent_col) and (row, col) in cells}
+
+    # 2. Quyi qism (Jami, imzolar) siljiydi
+    if delta:
+        old_max_row = ws.max_row
+        tail = {}
+        for row in range(old_jami, old_max_row + 1):
+            for col in range(1, last_col + 1):
+                cell = cells.get((row, col))
+                if cell is not None:
+                    tail[(row - old_jami, col)] = (cell.value, copy(cell._style))
+        heights = {}
+        for row in range(old_jami, old_max_row + 1):
+            if row in ws.row_dimensions:
+                heights[row - old_jami] = ws.row_dimensions[row].height
+                del ws.row_dimensions[row]
+        tail_merges = [cr for cr in ws.merged_cells.ranges if cr.min_row >= old_jami]
+        for cr in tail_merges:
+            ws.merged_cells.remove(cr)
+
+        for row in range(min(old_jami, new_jami), max(old_max_row, old_max_row + delta) + 1):
+            for col in range(1, last_col + 1):
+                cells.pop((row, col), None)
+
+        for (offset, col), (value, style) in tail.items():
+            cell = ws.cell(new_jami + offset, col)
+            cell.value = value
+            cell._style = style
+        for offset, height in heights.items():
+            ws.row_dimensions[new_jami + offset].height = height
+        for cr in tail_merges:
+            ws.merged_cells.add(CellRange(min_col=cr.min_col, min_row=cr.min_row + delta,
+                                          max_col=cr.max_col, max_row=cr.max_row + delta))
+
+        # AVERAGE oraliqlari yangi oxirgi qatorgacha
+        for col in range(3, percent_col + 1):
+            ws.cell(new_jami, col).value = build_average_formula(
+                get_column_letter(col), FIRST_STUDENT_ROW, new_jami - 1)
+
+    # 3. O'zgargan o'quvchi qatorlari
+    for i in changed:
+        row = FIRST_STUDENT_ROW + i
+        for col in range(1, last_col + 1):
+            cells.pop((row, col), None)
+        for col, style in row_styles.items():
+            ws.cell(row, col)._style = copy(style)
+        ws.cell(row, 1).value = i + 1
+        ws.cell(row, 2).value = students_list[i]
+        for col, (value, style) in moved_data.get(i, {}).items():
+            cell = ws.cell(row, col)
+            cell.value = value
+            cell._style = style
+        ws.cell(row, jami_col).value = build_sum_formula(3, 2 + num_tasks, row)
+        ws.cell(row, percent_col).value = build_percentage_formula(jami_letter, row)
+    # Joyida qolgan, lekin ismi boshqacha yozilgan (bo'shliq, harf katta-kichikligi)
+    for i, src in enumerate(sources):
+        if src == i and old_names[i] != students_list[i]:
+            ws.cell(FIRST_STUDENT_ROW + i, 2).value = students_list[i]
+
+    # Natijalar umumiy formula qo'yilishidan oldin: keyin kataklar bo'shatiladi
+    cached = _cached_values(ws, layout, new_jami) if cache_values else None
+    shared_groups = None
+    if shared_formulas:
+        # Umumiy formula: matn faqat birinchi qatorda, qolganlari bo'sh - postprocess guruhlaydi
+        percent_letter = get_column_letter(percent_col)
+        shared_groups = [(jami_letter, FIRST_STUDENT_ROW, new_jami - 1),
+                         (percent_letter, FIRST_STUDENT_ROW, new_jami - 1)]
+        ws.cell(FIRST_STUDENT_ROW, jami_col).value = build_sum_formula(3, 2 + num_tasks, FIRST_STUDENT_ROW)
+        ws.cell(FIRST_STUDENT_ROW, percent_col).value = build_percentage_formula(jami_letter, FIRST_STUDENT_ROW)
+        for row in range(FIRST_STUDENT_ROW + 1, new_jami):
+            ws.cell(row, jami_col).value = None
+            ws.cell(row, percent_col).value = None
+    clock.lap("update.apply")
+
+    tmp_path = f"{output_path}.{os.getpid()}.{id(wb)}.tmp"
+    wb.save(tmp_path)
+    postprocess_workbook(tmp_path, cached, shared_groups)
+    os.replace(tmp_path, output_path)
+    clock.lap("update.save")
+
+    return {
+        'file_path': output_path,
+        'total_students': new_count,
+        'total_tasks': num_tasks,
+        'added': added,
+        'removed': removed,
+        'moved': sum(1 for i in changed if sources[i] is not None),
+        'rows_written': len(changed),
+    }
@@ -0,0 +1,71 @@
+from typing import Optional
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.worksheet.cell_range import CellRange
+
+from .layout import SheetLayout
+from .sheet_xml import postprocess_workbook
+from .styles import ALIGNMENTS, BORDERS, FILLS, FONTS
+from .timing import StageClock
+
+
+def render_xlsx(layout: SheetLayout, path: str, cache_values: bool = True,
+                clock: Optional[StageClock] = None):
+    """Tayyor layout'ni xlsx faylga yozish
+
+    Qatorlar oqim (write-only) rejimida bir marta yoziladi - openpyxl
+    butun varaqni xotirada ushlab turmaydi. Keyin formulalar natijasi va
+    umumiy formulalar sheet XML ga qo'shiladi. clock berilsa
+    "generate.save" va "generate.postprocess" alohida yoziladi.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(layout.title)
+
+    for letter, width in layout.column_widths.items():
+        ws.column_dimensions[letter].width = width
+    for cell_range in layout.merged:
+        ws.merged_cells.add(CellRange(cell_range))
+
+    # Bir xil uslublar to'plami uchun bitta katak namunasi - openpyxl uslubni qayta hisoblamaydi
+    styled = {}
+    next_row = 1
+    for layout_row in layout.sorted_rows():
+        while next_row < layout_row.number:
+            ws.append([])
+            next_row += 1
+        if layout_row.height is not None:
+            ws.row_dimensions[layout_row.number].height = layout_row.height
+        values = []
+        for cell in layout_row.cells:
+            if cell is None:
+                values.append(None)
+                continue
+            key = (cell.font, cell.fill, cell.alignment, cell.border)
+            if key == (None, None, None, None):
+                values.append(cell.value)
+                continue
+            out = WriteOnlyCell(ws, value=cell.value)
+            template = styled.get(key)
+            if template is None:
+                if cell.font:
+                    out.font = FONTS[cell.font]
+                if cell.fill:
+                    out.fill = FILLS[cell.fill]
+                if cell.alignment:
+                    out.alignment = ALIGNMENTS[cell.alignment]
+                if cell.border:
+                    out.border = BORDERS[cell.border]
+                styled[key] = out
+            else:
+                out._style = template._style
+            values.append(out)
+        ws.append(values)
+        next_row += 1
+
+    wb.save(path)
+    if clock:
+        clock.lap("generate.save")
+    postprocess_workbook(path, layout.cached_values if cache_values else None, layout.shared_groups)
+    if clock:
+        clock.lap("generate.postprocess")
@@ -0,0 +1,11 @@
+import pytest
+
+from app.generation import GenerationCounter
+from app.profile_manager import ProfileManager
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    """ProfileManager on an empty data dir (no subjects.json / students_data.json to seed from)"""
+    monkeypatch.chdir(tmp_path)
+    return ProfileManager(str(tmp_path / "profiles"), GenerationCounter(str(tmp_path / "generations")))
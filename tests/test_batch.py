@@ -0,0 +1,50 @@
+import pytest
+
+from app.batch import BatchError, apply_batch, parse_operations
+from app.session import ProfileSession
+
+OPERATIONS = [{"op": "add_subject", "subject": "Fizika"}, {"op": "delete_class", "class": "9-Z"}]
+
+
+def make_session(manager):
+    manager.add_to_master_classes("5-A", ["Ali"])
+    profile_id = manager.create_profile_with_selection("Maktab", selected_classes=["5-A"])["profile_id"]
+    return ProfileSession(manager, profile_id)
+
+
+def test_atomic_batch_keeps_nothing_when_one_operation_fails(manager):
+    session = make_session(manager)
+
+    result = apply_batch(session, manager, OPERATIONS, atomic=True)
+
+    assert (result["applied"], result["failed"]) == (False, 1)
+    assert "Fizika" not in manager.get_profile(session.profile_id)["data"]["subjects"]
+    assert "Fizika" not in manager.get_master_subjects()
+
+
+def test_non_atomic_batch_applies_the_rest(manager):
+    session = make_session(manager)
+
+    result = apply_batch(session, manager, OPERATIONS, atomic=False)
+
+    assert (result["applied"], result["failed"]) == (True, 1)
+    assert "Fizika" in manager.get_profile(session.profile_id)["data"]["subjects"]
+    assert "Fizika" in manager.get_master_subjects()
+
+
+def test_failed_profile_save_leaves_master_data_unchanged(manager, monkeypatch):
+    session = make_session(manager)
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(manager, "save_profile", fail)
+    with pytest.raises(OSError):
+        apply_batch(session, manager, OPERATIONS[:1])
+    assert "Fizika" not in manager.get_master_subjects()
+
+
+def test_atomic_must_be_a_boolean():
+    with pytest.raises(BatchError):
+        parse_operations({"operations": OPERATIONS, "atomic": "false"})
+    assert parse_operations({"operations": OPERATIONS})[1] is True
@@ -0,0 +1,47 @@
+from app.generation import GenerationCounter
+from app.profile_manager import ProfileManager
+from app.settings_manager import SettingsManager
+
+
+def other_worker(manager):
+    """A second ProfileManager on the same files, as in another uvicorn worker"""
+    return ProfileManager(manager.profiles_dir, GenerationCounter(manager.generations.directory))
+
+
+def test_profile_save_reaches_the_other_worker(manager):
+    manager.add_to_master_classes("5-A", ["Ali"])
+    profile_id = manager.create_profile_with_selection("Maktab", selected_classes=["5-A"])["profile_id"]
+    other = other_worker(manager)
+    assert other.get_profile(profile_id)["data"]["subjects"] == []
+
+    profile = manager.get_profile(profile_id)
+    profile["data"]["subjects"] = ["Fizika"]
+    manager.save_profile(profile_id, profile)
+
+    assert other.get_profile(profile_id)["data"]["subjects"] == ["Fizika"]
+    assert other.list_profiles() == manager.list_profiles()
+
+
+def test_master_data_reaches_the_other_worker(manager):
+    other = other_worker(manager)
+    assert other.get_master_subjects() == []
+    version = other.master.current_version()
+
+    manager.add_to_master_subjects(["Fizika"])
+    manager.add_to_master_classes("5-A", ["Ali"])
+
+    assert other.get_master_subjects() == ["Fizika"]
+    assert other.get_master_classes() == {"5-A": ["Ali"]}
+    assert other.master.current_version() > version
+
+
+def test_settings_save_reaches_the_other_worker(tmp_path):
+    generations = GenerationCounter(str(tmp_path / "generations"))
+    path = str(tmp_path / "settings.json")
+    first, second = SettingsManager(path, generations), SettingsManager(path, generations)
+    assert second.load()["maktab"] == ""
+
+    first.save({"maktab": "12-maktab"})
+
+    assert second.load()["maktab"] == "12-maktab"
+    assert second.version() == first.version()
@@ -0,0 +1,21 @@
+from types import SimpleNamespace
+
+from app.generation_cache import GenerationCache
+from app.pregeneration import Pregenerator
+
+
+def test_cache_is_off_unless_a_budget_is_set(tmp_path, monkeypatch):
+    monkeypatch.delenv("TAHLILCHI_GENERATION_CACHE_MB", raising=False)
+    assert GenerationCache.from_env(str(tmp_path)) is None
+
+    monkeypatch.setenv("TAHLILCHI_GENERATION_CACHE_MB", "64")
+    cache = GenerationCache.from_env(str(tmp_path))
+    assert cache.max_bytes == 64 * 1024 * 1024
+
+
+def test_warmer_needs_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("TAHLILCHI_PREGENERATE", "1")
+    assert Pregenerator.from_env(SimpleNamespace(generation_cache=None)) is None
+
+    controller = SimpleNamespace(generation_cache=GenerationCache(str(tmp_path)))
+    assert Pregenerator.from_env(controller) is not None
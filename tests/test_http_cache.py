@@ -0,0 +1,44 @@
+from datetime import datetime, timezone
+
+from starlette.requests import Request
+
+from web.http_cache import cached_json, make_etag
+
+MODIFIED = datetime(2026, 3, 1, 8, 30, 15, 250000, tzinfo=timezone.utc)
+
+
+def request(**headers):
+    return Request({"type": "http", "method": "GET", "path": "/", "query_string": b"",
+                    "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]})
+
+
+def test_matching_etag_skips_the_build():
+    etag = make_etag("p1", "2026-03-01T08:30:15", "master-1")
+    built = []
+
+    response = cached_json(request(if_none_match=f'"x", {etag}'), etag, lambda: built.append(1) or {})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert built == []
+
+
+def test_changed_version_rebuilds():
+    old = make_etag("p1", "2026-03-01T08:30:15", "master-1")
+    new = make_etag("p1", "2026-03-01T08:30:15", "master-2")
+
+    response = cached_json(request(if_none_match=old), new, lambda: {"success": True})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] == new
+
+
+def test_if_modified_since_uses_second_resolution():
+    etag = make_etag("p1")
+    since = "Sun, 01 Mar 2026 08:30:15 GMT"
+    assert cached_json(request(if_modified_since=since), etag, dict, MODIFIED).status_code == 304
+
+    earlier = "Sun, 01 Mar 2026 08:30:14 GMT"
+    response = cached_json(request(if_modified_since=earlier), etag, dict, MODIFIED)
+    assert response.status_code == 200
+    assert response.headers["last-modified"] == since
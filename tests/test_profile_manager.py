@@ -0,0 +1,103 @@
+import json
+import os
+
+from app.profile_manager import ProfileManager
+
+
+def stored_classes(manager, profile_id):
+    with open(os.path.join(manager.profiles_dir, f"{profile_id}.json"), encoding="utf-8") as f:
+        return json.load(f)["data"]["classes"]
+
+
+def test_profiles_reference_master_rosters(manager):
+    manager.add_to_master_classes("5-A", ["Ali", "Vali"])
+    profile = manager.create_profile_with_selection("Maktab", selected_classes=["5-A"])
+
+    assert stored_classes(manager, profile["profile_id"])["5-A"] == {"master": "5-A", "version": 1}
+    assert manager.get_profile(profile["profile_id"])["data"]["classes"]["5-A"] == ["Ali", "Vali"]
+
+
+def test_master_update_keeps_referencing_profiles_unchanged(manager):
+    manager.add_to_master_classes("5-A", ["Ali", "Vali"])
+    old = manager.create_profile_with_selection("Eski", selected_classes=["5-A"])["profile_id"]
+
+    assert manager.update_master_classes({"5-A": ["Ali", "Vali", "Hasan"]}) == ["5-A"]
+
+    assert manager.get_profile(old)["data"]["classes"]["5-A"] == ["Ali", "Vali"]
+    assert stored_classes(manager, old)["5-A"] == ["Ali", "Vali"]
+    assert manager.get_master_class_versions()["5-A"] == 2
+    new = manager.create_profile_with_selection("Yangi", selected_classes=["5-A"])["profile_id"]
+    assert stored_classes(manager, new)["5-A"] == {"master": "5-A", "version": 2}
+    assert manager.get_profile(new)["data"]["classes"]["5-A"] == ["Ali", "Vali", "Hasan"]
+    # Unchanged rosters are not rewritten
+    assert manager.update_master_classes({"5-A": ["Ali", "Vali", "Hasan"]}) == []
+
+
+def test_other_workers_see_the_detached_copy(manager, tmp_path):
+    manager.add_to_master_classes("5-A", ["Ali"])
+    profile_id = manager.create_profile_with_selection("Maktab", selected_classes=["5-A"])["profile_id"]
+    other = ProfileManager(manager.profiles_dir, manager.generations)
+    assert other.get_profile(profile_id)["data"]["classes"]["5-A"] == ["Ali"]
+
+    manager.update_master_classes({"5-A": ["Ali", "Vali"]})
+
+    assert other.get_profile(profile_id)["data"]["classes"]["5-A"] == ["Ali"]
+
+
+def test_dangling_reference_survives_a_save(manager):
+    manager.add_to_master_classes("5-A", ["Ali"])
+    manager.add_to_master_classes("5-B", ["Vali"])
+    profile_id = manager.create_profile_with_selection("Maktab", selected_classes=["5-A", "5-B"])["profile_id"]
+    # Master class removed by hand
+    path = manager.master.classes_path
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    del data["classes"]["5-B"]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    manager.master.invalidate()
+
+    profile = manager.get_profile(profile_id)
+    assert list(profile["data"]["classes"]) == ["5-A"]
+    profile["data"]["subjects"].append("Fizika")
+    manager.save_profile(profile_id, profile)
+
+    assert stored_classes(manager, profile_id)["5-B"] == {"master": "5-B", "version": 1}
+
+
+def test_list_profiles_returns_summaries_only(manager):
+    manager.add_to_master_classes("5-A", ["Ali", "Vali"])
+    profile_id = manager.create_profile_with_selection("Maktab", selected_classes=["5-A"])["profile_id"]
+
+    listed = {p["profile_id"]: p for p in manager.list_profiles()}
+
+    assert set(listed) == {"default", profile_id}
+    assert "data" not in listed[profile_id] and "settings" not in listed[profile_id]
+    assert listed[profile_id]["stats"] == {"classes": 1, "students": 2, "subjects": 0}
+
+
+def test_list_profiles_copies_are_independent(manager):
+    first = manager.list_profiles()
+    first[0]["stats"]["classes"] = 99
+    first[0]["meta"]["can_delete"] = "changed"
+
+    second = manager.list_profiles()
+    assert second[0]["stats"]["classes"] != 99
+    assert second[0]["meta"]["can_delete"] != "changed"
+
+
+def test_list_profiles_sees_hand_edited_and_removed_files(manager):
+    profile_id = manager.create_profile_with_selection("Maktab")["profile_id"]
+    manager.list_profiles()
+    path = os.path.join(manager.profiles_dir, f"{profile_id}.json")
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    data["profile_name"] = "Qo'lda o'zgartirilgan"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+    names = {p["profile_id"]: p["profile_name"] for p in manager.list_profiles()}
+    assert names[profile_id] == "Qo'lda o'zgartirilgan"
+
+    os.remove(path)
+    assert [p["profile_id"] for p in manager.list_profiles()] == ["default"]
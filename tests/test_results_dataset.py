@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from app.results_dataset import ResultsDataset
+from app.results_store import ResultsStore
+
+YEAR = "2025-2026"
+
+
+def results(*students):
+    return {"num_tasks": 2, "max_scores": [10, 10], "students": list(students)}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.sqlite3"))
+    store.ingest("p1", "5-A", "Matematika", "1", results(("Ali", [10, 10]), ("Vali", [5, 5])), year=YEAR)
+    store.ingest("p2", "6-B", "Matematika", "1", results(("Sardor", [2, 2])), year=YEAR)
+    return store
+
+
+def test_sync_writes_sets_and_query_filters_by_profile(tmp_path, store):
+    dataset = ResultsDataset(str(tmp_path / "parquet"))
+
+    assert dataset.sync(store) == {"sets": 2, "written": 2, "removed": 0}
+    frame = dataset.query(columns=["profile_id", "student", "score"], filters={"profile_id": ["p1"]})
+
+    assert set(frame["profile_id"]) == {"p1"}
+    assert sorted(set(frame["student"])) == ["Ali", "Vali"]
+    assert len(frame) == 4
+
+
+def test_sync_catches_up_and_removes_orphans(tmp_path, store):
+    dataset = ResultsDataset(str(tmp_path / "parquet"))
+    dataset.sync(store)
+    # Re-ingest with the dataset write missed (e.g. a crash) leaves the old file behind
+    store.ingest("p2", "6-B", "Matematika", "1", results(("Sardor", [2, 2]), ("Hasan", [4, 4])), year=YEAR)
+
+    assert dataset.sync(store)["written"] == 1
+    # The set's old file went with the rewrite
+    assert len(dataset._files()) == 2
+    frame = dataset.query(columns=["student"], filters={"profile_id": ["p2"]})
+    assert sorted(set(frame["student"])) == ["Hasan", "Sardor"]
+
+    # A file no set in the store points to (e.g. restored from a backup)
+    orphan = os.path.join(os.path.dirname(dataset._files()[0]), "p9+9-Z+0123456789abcdef.parquet")
+    os.link(dataset._files()[0], orphan)
+    assert dataset.sync(store) == {"sets": 2, "written": 0, "removed": 1}
+    assert not os.path.exists(orphan)
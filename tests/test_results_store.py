@@ -0,0 +1,79 @@
+import pytest
+
+from app.results_store import ResultsStore
+
+YEAR = "2025-2026"
+
+
+def results(*students):
+    return {"num_tasks": 2, "max_scores": [10, 10], "students": list(students)}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultsStore(str(tmp_path / "results.sqlite3"))
+
+
+def test_ingest_replace_unchanged_keeps_rollup_in_step(store):
+    first = results(("Ali", [10, 10]), ("Vali", [5, 5]))
+    other = results(("Sardor", [2, 2]))
+
+    added = store.ingest("p1", "5-A", "Matematika", "1", first, year=YEAR)
+    store.ingest("p1", "5-B", "Matematika", "1", other, year=YEAR)
+    assert added["status"] == "added"
+    assert added["average"] == 75.0
+    [rollup] = store.subject_trend("p1", "Matematika", YEAR)
+    assert (rollup["classes"], rollup["students"], rollup["average"]) == (2, 3, 56.67)
+
+    # Re-ingest of a changed workbook subtracts the old contribution first
+    changed = results(("Ali", [10, 10]), ("Vali", [5, 5]), ("Hasan", [0, 2]))
+    replaced = store.ingest("p1", "5-A", "Matematika", "1", changed, year=YEAR)
+    assert replaced["status"] == "replaced"
+    assert replaced["set_id"] != added["set_id"]
+    [rollup] = store.subject_trend("p1", "Matematika", YEAR)
+    assert (rollup["classes"], rollup["students"]) == (2, 4)
+    assert rollup["average"] == round((100 + 50 + 10 + 20) / 4, 2)
+    assert rollup["histogram"][1] == 1 and rollup["histogram"][2] == 1
+    assert sum(rollup["histogram"]) == 4
+
+    unchanged = store.ingest("p1", "5-A", "Matematika", "1", changed, year=YEAR)
+    assert unchanged["status"] == "unchanged"
+    assert unchanged["set_id"] == replaced["set_id"]
+    assert store.subject_trend("p1", "Matematika", YEAR) == [rollup]
+
+
+def test_delete_subtracts_and_drops_empty_rollup(store):
+    store.ingest("p1", "5-A", "Fizika", "2", results(("Ali", [4, 6])), year=YEAR)
+    store.ingest("p1", "5-B", "Fizika", "2", results(("Vali", [8, 8])), year=YEAR)
+
+    assert store.delete("p1", "5-A", "Fizika", "2", year=YEAR)
+    [rollup] = store.subject_trend("p1", "Fizika", YEAR)
+    assert (rollup["classes"], rollup["students"], rollup["average"]) == (1, 1, 80.0)
+
+    assert store.delete("p1", "5-B", "Fizika", "2", year=YEAR)
+    assert store.subject_trend("p1", "Fizika", YEAR) == []
+    assert not store.delete("p1", "5-B", "Fizika", "2", year=YEAR)
+
+
+def test_students_without_scores_are_left_out(store):
+    outcome = store.ingest("p1", "5-A", "Tarix", "1",
+                           results(("Ali", [6, 4]), ("Vali", [None, None])), year=YEAR)
+    assert outcome["students"] == 1
+    with pytest.raises(ValueError):
+        store.ingest("p1", "5-B", "Tarix", "1", results(("Vali", [None, None])), year=YEAR)
+
+
+def test_delete_class_removes_all_its_sets(store):
+    store.ingest("p1", "5-A", "Matematika", "1", results(("Ali", [10, 10])), year=YEAR)
+    store.ingest("p1", "5-A", "Fizika", "2", results(("Ali", [5, 5])), year=YEAR)
+    store.ingest("p1", "5-B", "Matematika", "1", results(("Vali", [4, 4])), year=YEAR)
+    store.ingest("p2", "5-A", "Matematika", "1", results(("Hasan", [2, 2])), year=YEAR)
+
+    removed = store.delete_class("p1", "5-A")
+
+    assert sorted(s["subject"] for s in removed) == ["Fizika", "Matematika"]
+    assert store.subject_trend("p1", "Fizika", YEAR) == []
+    [rollup] = store.subject_trend("p1", "Matematika", YEAR)
+    assert (rollup["classes"], rollup["students"], rollup["average"]) == (1, 1, 40.0)
+    assert [r["class"] for r in store.ranking("p2", "Matematika", "1", year=YEAR)] == ["5-A"]
+    assert store.delete_class("p1", "5-A") == []
@@ -0,0 +1,46 @@
+from app.roster_import import merge_rosters
+
+STORED = {
+    "5-A": ["Ali", "Vali", "Hasan"],
+    "5-B": ["Sardor", "Jasur"],
+    "6-A": ["Dilnoza"],
+}
+
+
+def test_merge_keeps_classes_missing_from_export():
+    incoming = {"5-A": ["Vali", "Ali", "Hasan"], "5-B": ["Sardor", "Jasur", "Bobur"]}
+
+    merged, report = merge_rosters(STORED, incoming)
+
+    assert merged["5-A"] == ["Vali", "Ali", "Hasan"]
+    assert merged["5-B"] == ["Sardor", "Jasur", "Bobur"]
+    assert merged["6-A"] is STORED["6-A"]
+    assert report["classes"]["6-A"]["status"] == "kept"
+    assert report["classes"]["5-A"]["status"] == "changed"
+    assert report["classes"]["5-A"]["moved"] == ["Vali"]
+    assert report["classes"]["5-B"]["added"] == ["Bobur"]
+    assert report["changed"] == ["5-A", "5-B"]
+    assert report["totals"]["classes"] == 3
+
+
+def test_merge_with_remove_missing_drops_classes_and_finds_transfers():
+    incoming = {"5-A": ["Ali", "Vali", "Hasan"], "5-B": ["Sardor", "Jasur", "Dilnoza"]}
+
+    merged, report = merge_rosters(STORED, incoming, remove_missing=True)
+
+    assert sorted(merged) == ["5-A", "5-B"]
+    assert merged["5-A"] is STORED["5-A"]
+    assert report["classes"]["5-A"]["status"] == "unchanged"
+    assert report["classes"]["6-A"] == {"status": "removed", "added": [], "removed": ["Dilnoza"], "moved": []}
+    assert report["changed"] == ["5-B", "6-A"]
+    assert report["transferred"] == [{"name": "Dilnoza", "from": "6-A", "to": "5-B"}]
+    assert report["totals"]["removed"] == 1
+
+
+def test_merge_of_identical_export_changes_nothing():
+    merged, report = merge_rosters(STORED, {name: list(s) for name, s in STORED.items()},
+                                   remove_missing=True)
+
+    assert merged == STORED
+    assert report["changed"] == []
+    assert report["transferred"] == []
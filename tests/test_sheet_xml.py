@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from openpyxl import load_workbook
+
+from core.reader import FIRST_STUDENT_ROW
+from core.sheet_xml import rewrite_sheet
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUDENTS = ["Aliyev Ali", "Boboyev Bobur", "Karimova Dilnoza"]
+
+# The same formula cell as written by lxml and by et_xmlfile (no lxml installed)
+SERIALIZED = {
+    "lxml": b'<row r="4"><c r="F4" s="5"><f>SUM(C4:E4)</f><v></v></c></row>',
+    "et_xmlfile": b'<row r="4"><c r="F4" s="5"><f>SUM(C4:E4)</f><v /></c></row>',
+}
+
+
+def run_core(tmp_path, lxml, call):
+    """Run a core call in a subprocess so openpyxl picks the serializer at import"""
+    env = dict(os.environ, OPENPYXL_LXML=str(lxml), PYTHONPATH=ROOT)
+    script = "import core\nprint(core.%s['file_path'])\n" % call
+    out = subprocess.run([sys.executable, "-c", script], env=env, cwd=str(tmp_path),
+                         capture_output=True, text=True, check=True)
+    return out.stdout.strip().splitlines()[-1]
+
+
+def generate(tmp_path, lxml=True, **options):
+    return run_core(tmp_path, lxml, "create_assessment_template(%r, 3, max_scores=[5, 5, 10], "
+                                    "output_dir=%r, **%r)" % (STUDENTS, str(tmp_path), options))
+
+
+@pytest.mark.parametrize("serializer", sorted(SERIALIZED))
+def test_rewrite_fills_value_for_either_serializer(serializer):
+    data = rewrite_sheet(SERIALIZED[serializer], {"F4": 12})
+    assert data == b'<row r="4"><c r="F4" s="5"><f>SUM(C4:E4)</f><v>12</v></c></row>'
+
+
+def test_rewrite_raises_when_a_cell_is_not_found():
+    with pytest.raises(ValueError):
+        rewrite_sheet(SERIALIZED["lxml"], {"F4": 12, "G4": 0})
+
+
+@pytest.mark.parametrize("lxml", [True, False])
+def test_cached_values_readable_with_data_only(tmp_path, lxml):
+    path = generate(tmp_path, lxml)
+    ws = load_workbook(path, data_only=True).active
+    footer = FIRST_STUDENT_ROW + len(STUDENTS)
+
+    assert ws["F3"].value == 20
+    for row in range(FIRST_STUDENT_ROW, footer):
+        assert ws[f"F{row}"].value == 0
+        assert ws[f"G{row}"].value == 0
+    assert [ws.cell(footer, col).value for col in range(3, 6)] == ["#DIV/0!"] * 3
+    assert ws[f"F{footer}"].value == 0
+    assert ws[f"G{footer}"].value == 0
+
+
+def assert_row_formulas(path, rows):
+    ws = load_workbook(path).active
+    for row in rows:
+        assert ws[f"F{row}"].value == f"=SUM(C{row}:E{row})"
+        assert ws[f"G{row}"].value == f"=F{row}/$F$3*100"
+
+
+@pytest.mark.parametrize("lxml", [True, False])
+@pytest.mark.parametrize("cache_values", [True, False])
+def test_shared_formulas_expand_on_every_row(tmp_path, lxml, cache_values):
+    path = generate(tmp_path, lxml, shared_formulas=True, cache_values=cache_values)
+    assert_row_formulas(path, range(FIRST_STUDENT_ROW, FIRST_STUDENT_ROW + len(STUDENTS)))
+
+
+@pytest.mark.parametrize("lxml", [True, False])
+def test_updater_shared_formulas_expand_on_every_row(tmp_path, lxml):
+    source = generate(tmp_path)
+    roster = STUDENTS + ["Yusupov Jasur", "Rahimov Sardor"]
+    output = run_core(tmp_path, lxml, "update_assessment_workbook(%r, %r, %r, shared_formulas=True)"
+                      % (source, roster, str(tmp_path / "updated.xlsx")))
+    assert_row_formulas(output, range(FIRST_STUDENT_ROW, FIRST_STUDENT_ROW + len(roster)))
+
+
+def test_rewrite_raises_when_a_shared_cell_is_not_found():
+    # Follower row 5 is missing from the sheet
+    with pytest.raises(ValueError):
+        rewrite_sheet(SERIALIZED["lxml"], shared_groups=[("F", 4, 5)])
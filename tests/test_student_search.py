@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from app.student_search import StudentSearch
+
+
+def add_private_class(manager, profile_id, class_name, students):
+    profile = manager.get_profile(profile_id)
+    profile["data"]["classes"][class_name] = students
+    manager.save_profile(profile_id, profile)
+
+
+def test_unknown_profile_is_rejected(manager):
+    search = StudentSearch(manager)
+    with pytest.raises(KeyError):
+        search.search("ali", ["no-such-profile"])
+    assert search.search("ali", ["no-such-profile"], missing_ok=True) == []
+
+
+def test_all_profiles_rank_together_and_share_master_students(manager):
+    manager.add_to_master_classes("5-A", ["Aliyev Ali", "Karimov Bek"])
+    first = manager.create_profile_with_selection("Birinchi", selected_classes=["5-A"])["profile_id"]
+    second = manager.create_profile_with_selection("Ikkinchi", selected_classes=["5-A"])["profile_id"]
+    add_private_class(manager, second, "6-B", ["Ali"])
+    search = StudentSearch(manager)
+
+    results = search.search("ali", [first, second], limit=10)
+
+    # The exact match from the second profile outranks the first profile's prefix match
+    assert [(r["name"], r["class"]) for r in results] == [("Ali", "6-B"), ("Aliyev Ali", "5-A")]
+    assert results[0]["profile_ids"] == [second]
+    assert results[1]["profile_ids"] == [first, second]
+    assert search.search("ali", [first, second], limit=1)[0]["name"] == "Ali"
+
+
+def test_indexes_of_removed_profiles_are_dropped(manager):
+    manager.add_to_master_classes("5-A", ["Aliyev Ali"])
+    kept = manager.create_profile_with_selection("Qoladi", selected_classes=["5-A"])["profile_id"]
+    removed = manager.create_profile_with_selection("Ketadi", selected_classes=["5-A"])["profile_id"]
+    search = StudentSearch(manager)
+    search.search("ali", [kept, removed])
+
+    os.remove(os.path.join(manager.profiles_dir, f"{removed}.json"))
+    add_private_class(manager, kept, "6-B", ["Vali"])
+    assert search.search("vali", [kept])[0]["name"] == "Vali"
+
+    assert set(search._indexes) == {kept}
+    with pytest.raises(KeyError):
+        search.index_for(removed)
@@ -0,0 +1,65 @@
+from openpyxl import load_workbook
+
+from core import create_assessment_template, read_assessment_results, update_assessment_workbook
+from core.reader import FIRST_STUDENT_ROW
+
+STUDENTS = ["Aliyev Ali", "Boboyev Bobur", "Karimova Dilnoza", "Rahimov Sardor"]
+SCORES = {
+    "Aliyev Ali": [5, 3, 4],
+    "Boboyev Bobur": [2, 5, 1],
+    "Karimova Dilnoza": [4, 4, 5],
+    "Rahimov Sardor": [1, 0, 3],
+}
+
+
+def filled_template(tmp_path):
+    result = create_assessment_template(
+        STUDENTS, 3, {"sinf": "5-A", "fan": "Matematika", "chorak": 1}, [5, 5, 5], str(tmp_path))
+    wb = load_workbook(result["file_path"])
+    ws = wb.active
+    for row in range(FIRST_STUDENT_ROW, FIRST_STUDENT_ROW + len(STUDENTS)):
+        for task, score in enumerate(SCORES[ws.cell(row, 2).value]):
+            ws.cell(row, 3 + task, score)
+    path = tmp_path / "filled.xlsx"
+    wb.save(path)
+    wb.close()
+    return path
+
+
+def scores_by_name(path):
+    return {name: scores for name, scores in read_assessment_results(str(path))["students"]}
+
+
+def test_add_remove_move_keeps_scores(tmp_path):
+    source = filled_template(tmp_path)
+    # Boboyev leaves, Yusupov joins, Rahimov moves to the top
+    roster = ["Rahimov Sardor", "Aliyev Ali", "Karimova Dilnoza", "Yusupov Jasur"]
+    output = tmp_path / "updated.xlsx"
+
+    report = update_assessment_workbook(str(source), roster, str(output))
+
+    assert report["added"] == ["Yusupov Jasur"]
+    assert report["removed"] == ["Boboyev Bobur"]
+    results = read_assessment_results(str(output))
+    assert [name for name, _ in results["students"]] == roster
+    assert results["max_scores"] == [5, 5, 5]
+    scores = scores_by_name(output)
+    for name in ("Rahimov Sardor", "Aliyev Ali", "Karimova Dilnoza"):
+        assert scores[name] == SCORES[name]
+    assert scores["Yusupov Jasur"] == [None, None, None]
+
+
+def test_round_trip_back_to_original_roster(tmp_path):
+    source = filled_template(tmp_path)
+    shrunk = tmp_path / "shrunk.xlsx"
+    update_assessment_workbook(str(source), ["Karimova Dilnoza", "Aliyev Ali"], str(shrunk))
+    restored = tmp_path / "restored.xlsx"
+
+    update_assessment_workbook(str(shrunk), STUDENTS, str(restored))
+
+    scores = scores_by_name(restored)
+    assert [name for name, _ in read_assessment_results(str(restored))["students"]] == STUDENTS
+    assert scores["Aliyev Ali"] == SCORES["Aliyev Ali"]
+    assert scores["Karimova Dilnoza"] == SCORES["Karimova Dilnoza"]
+    # Rows that were removed on the way come back empty
+    assert scores["Boboyev Bobur"] == [None, None, None]
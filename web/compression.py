@@ -0,0 +1,39 @@
+# web/compression.py
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+from starlette.types import Message, Receive, Scope, Send
+
+# Bodies that are compressed already - gzip only costs CPU there
+COMPRESSED_MEDIA_TYPES = (
+    "application/vnd.openxmlformats-officedocument.",  # xlsx (zip)
+    "application/vnd.apache.parquet",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "image/",
+)
+
+
+class _SelectiveGZipResponder(GZipResponder):
+    async def send_with_compression(self, message: Message) -> None:
+        await super().send_with_compression(message)
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            if content_type.startswith(COMPRESSED_MEDIA_TYPES):
+                # Same path Starlette uses for text/event-stream: body passes through
+                self.content_type_is_excluded = True
+
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that leaves already-compressed downloads alone
+
+    JSON, NDJSON and HTML are compressed as before; xlsx workbooks,
+    Parquet exports and images are sent as is.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("Accept-Encoding", ""):
+            responder = _SelectiveGZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
@@ -0,0 +1,72 @@
+# web/fragments.py
+import threading
+from collections import OrderedDict
+
+from jinja2 import pass_context
+from markupsafe import Markup
+
+from app.metrics import record_cache
+
+# Context values (besides the shell key) each component depends on
+FRAGMENT_EXTRA_KEYS = {
+    "components/sidebar.html": lambda ctx: ctx["request"].url.path,
+}
+
+
+class FragmentCache:
+    """Bounded LRU of rendered shell components
+
+    Keyed by (template, active_profile_id, fragment_version, dark_mode) -
+    fragment_version changes whenever the profile index or master data
+    changes. A context without fragment_version renders uncached.
+    """
+
+    def __init__(self, env, max_entries: int = 256):
+        self.env = env
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, name: str, ctx):
+        version = ctx.get("fragment_version")
+        if version is None:
+            return None
+        extra = FRAGMENT_EXTRA_KEYS.get(name)
+        return (name, ctx.get("active_profile_id"), version, ctx.get("dark_mode"),
+                extra(ctx) if extra else None)
+
+    def render(self, name: str, ctx) -> Markup:
+        key = self._key(name, ctx)
+        if key is not None:
+            with self._lock:
+                html = self._entries.get(key)
+                if html is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    record_cache("fragment", hit=True)
+                    return html
+
+        html = Markup(self.env.get_template(name).render(ctx.get_all()))
+        if key is not None:
+            with self._lock:
+                self.misses += 1
+                record_cache("fragment", hit=False)
+                self._entries[key] = html
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def install(self):
+        """Expose as {{ fragment("components/header.html") }} in templates"""
+        @pass_context
+        def fragment(ctx, name):
+            return self.render(name, ctx)
+
+        self.env.globals["fragment"] = fragment
+        return self
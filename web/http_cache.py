@@ -0,0 +1,67 @@
+# web/http_cache.py
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+# Browsers may reuse the response but must revalidate it first (cheap 304)
+DEFAULT_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Weak ETag from the given version parts"""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """ISO timestamp from a profile (local time) -> aware UTC datetime"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).astimezone(timezone.utc)
+    except ValueError:
+        return None
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since (ETag wins when both are sent)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison - W/ prefixes are ignored
+        tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        return etag.removeprefix("W/") in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have second resolution
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def cached_json(
+    request: Request,
+    etag: str,
+    build: Callable[[], dict],
+    last_modified: Optional[datetime] = None,
+    cache_control: str = DEFAULT_CACHE_CONTROL,
+) -> Response:
+    """JSON response with validators; `build` only runs when the client copy is stale"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(build(), headers=headers)
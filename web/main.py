@@ -1,50 +1,212 @@
 # web/main.py
-from fastapi import FastAPI, Request, Form, File, UploadFile
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, Request, Form, File, UploadFile, Depends
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+import asyncio
+from html import escape
+import hmac
+import json
+import logging
 import os
+import re
 
 from app.profile_manager import ProfileManager
+from app.batch import BatchError, apply_batch, parse_operations
 from app.controller import AppController
+from app.generation_cache import GenerationCache
 from app.settings_manager import SettingsManager
+from app.metrics import record_request, render_prometheus
+from app.output_store import OutputStore
+from app.pregeneration import Pregenerator
+from app.results_dataset import ResultsDataset
+from app.results_store import ResultsStore, school_year
+from app import request_log
+from app.profiling import RequestProfiler
+from app.roster_import import RosterFormatError, merge_rosters, read_admin_export
+from app.session import ProfileSession
+from app.student_search import StudentSearch
+from app.startup import StartupReport
+from web.compression import SelectiveGZipMiddleware
+from web.fragments import FragmentCache
+from web.http_cache import cached_json, make_etag, parse_timestamp
+from web.roster_api import build_classes_page, ndjson_response, parse_roster_query
+from core.timing import stage
 
-import pandas as pd
-from io import BytesIO, StringIO
+from io import BytesIO
 
-app = FastAPI(title="Baholash Tahlili Generator")
+logging.basicConfig(
+    level=os.environ.get("TAHLILCHI_LOG_LEVEL", "INFO"),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
 
-# Yangi: templates direktoriyasini o'zgartirish
-templates = Jinja2Templates(directory="web/templates")
+startup_report = StartupReport(origin=_IMPORT_STARTED)
+startup_report.record("imports", _IMPORT_STARTED)
+logger = logging.getLogger(__name__)
 
-controller = AppController()
+OUTPUT_DIR = "outputs"
+SCHOOL_YEAR_RE = re.compile(r"^\d{4}-\d{4}$")
+CHORAKS = ("1", "2", "3", "4")
+# Dataset queries see the active profile only, unless this token is sent (cross-profile analysis)
+DATASET_TOKEN = os.environ.get("TAHLILCHI_DATASET_TOKEN", "")
+DATASET_TOKEN_HEADER = "X-Dataset-Token"
+EXPORT_MAX_ROWS = int(os.environ.get("TAHLILCHI_EXPORT_MAX_ROWS", "500000"))
+
+# Managers are cheap to construct; their file setup runs once in lifespan
+profile_manager = ProfileManager(initialize=False)
+# Workbooks keyed by roster + form values - opt-in, off unless
+# TAHLILCHI_GENERATION_CACHE_MB sets a budget (pregeneration needs it too)
+generation_cache = GenerationCache.from_env(os.path.join(OUTPUT_DIR, ".cache"))
+controller = AppController(profile_manager, generation_cache=generation_cache)
 settings_mgr = SettingsManager()
-profile_manager = ProfileManager()
+# In-memory per-profile student indexes, refreshed on the first search after a change
+student_search = StudentSearch(profile_manager)
+output_store = OutputStore.from_env(OUTPUT_DIR)
+# Ingested workbook results with per-chorak rollups (TAHLILCHI_RESULTS_DB)
+results_store = ResultsStore.from_env()
+# Partitioned Parquet copy of the store for cross-school analysis (TAHLILCHI_RESULTS_DATASET)
+results_dataset = ResultsDataset.from_env()
+# None unless TAHLILCHI_PREGENERATE=1 and the cache is on - warms it after roster uploads and at quarter start
+pregenerator = Pregenerator.from_env(controller)
+# One JSON line per request in logs/requests-<pid>.jsonl, opened in lifespan (TAHLILCHI_REQUEST_LOG="" disables)
+requests_log = request_log.RequestLog.from_env()
+# None unless TAHLILCHI_PROFILING_TOKEN is set - no middleware or routes then
+request_profiler = RequestProfiler.from_env()
+OUTPUT_SWEEP_MINUTES = float(os.environ.get("TAHLILCHI_OUTPUT_SWEEP_MINUTES", "60"))
+
+async def sweep_outputs_periodically(interval_seconds: float):
+    """Background retention/quota sweep of outputs/ (first run right after startup)"""
+    while True:
+        try:
+            await asyncio.to_thread(output_store.sweep)
+            if generation_cache is not None:
+                await asyncio.to_thread(generation_cache.prune)
+        except Exception:
+            logger.exception("Output sweep failed")
+        await asyncio.sleep(interval_seconds)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    with startup_report.phase("profile_data"):
+        profile_manager.initialize()
+    with startup_report.phase("output_dir"):
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+    with startup_report.phase("request_log"):
+        requests_log.open()
+    startup_report.mark_ready()
+    logger.info("Startup report: %s", startup_report.as_dict())
+    
+    background = []
+    if OUTPUT_SWEEP_MINUTES > 0:
+        background.append(asyncio.create_task(sweep_outputs_periodically(OUTPUT_SWEEP_MINUTES * 60)))
+    if pregenerator is not None:
+        background.append(asyncio.create_task(pregenerator.run()))
+        background.append(asyncio.create_task(pregenerator.run_schedule()))
+    yield
+    for task in background:
+        task.cancel()
+    requests_log.close()
+
+app = FastAPI(title="Baholash Tahlili Generator", lifespan=lifespan)
+# Roster payloads are large and repetitive - compress when the client accepts gzip
+# (xlsx/parquet downloads are zip-compressed already and pass through)
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=1024)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    logged = requests_log.start(request.method, request.url.path,
+                                request.cookies.get("active_profile", "default"))
+    status = 500
+    error = None
+    if pregenerator is not None:
+        # Real traffic pauses the background warmer
+        pregenerator.request_started()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        # Route template (/profile/{profile_id}/data), not the raw path - bounded label set
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", None) or "unmatched"
+        record_request(route_path, request.method, status, time.perf_counter() - started)
+        requests_log.finish(logged, route_path, status, error)
+        if pregenerator is not None:
+            pregenerator.request_finished()
+
+if request_profiler is not None:
+    @app.middleware("http")
+    async def profile_requests(request: Request, call_next):
+        if request_profiler.wants(request.url.path, request.headers):
+            return await request_profiler.profile(request, call_next)
+        return await call_next(request)
+
+# Yangi: templates direktoriyasini o'zgartirish
+templates = Jinja2Templates(directory="web/templates")
+# Header, sidebar, footer and profile modal are rendered once per profile-index version
+fragment_cache = FragmentCache(templates.env).install()
 
-OUTPUT_DIR = "outputs"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 # Yangi: dark mode uchun helper funksiya
 def get_dark_mode(request: Request):
     dark_mode = request.cookies.get("dark_mode", "false")
     return dark_mode == "true"
 
-async def get_base_context(request: Request):
+async def get_profile_session(request: Request):
+    """Request-scoped active profile, pending changes are saved once at the end"""
+    session = ProfileSession(profile_manager, request.cookies.get("active_profile", "default"))
+    yield session
+    # Only reached when the handler did not raise
+    session.flush()
+
+async def get_path_profile_session(profile_id: str):
+    """Same unit of work for routes that name the profile in the path"""
+    session = ProfileSession(profile_manager, profile_id)
+    yield session
+    session.flush()
+
+# scope="function": flush before the response is sent, so the next request sees it
+ActiveProfile = Depends(get_profile_session, scope="function")
+PathProfile = Depends(get_path_profile_session, scope="function")
+
+XLSX_MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+def workbook_response(file_path: str) -> Response:
+    """Send a generated workbook read through one open handle
+
+    FileResponse stats the path and reopens it later; a concurrent
+    regeneration of the same class/subject replaces the file in between
+    and the body no longer matches Content-Length.
+    """
+    with open(file_path, 'rb') as f:
+        content = f.read()
+    filename = os.path.basename(file_path)
+    return Response(content, media_type=XLSX_MEDIA_TYPE,
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+async def get_base_context(request: Request, session: ProfileSession = None):
     """Get base context for all templates"""
     try:
-        # Get active profile ID
-        active_profile_id = request.cookies.get("active_profile", "default")
+        if session is None:
+            session = ProfileSession(profile_manager, request.cookies.get("active_profile", "default"))
         
         # Get active profile
-        profile = profile_manager.get_profile(active_profile_id)
-        if not profile:
-            active_profile_id = "default"
-            profile = profile_manager.get_profile("default")
+        profile = session.profile
+        active_profile_id = session.profile_id
         
         # Get data from profile
-        settings = profile.get("settings", {}) if profile else {}
-        classes = controller.get_classes(active_profile_id)
-        subjects = controller.get_subjects(active_profile_id)
+        settings = session.settings
+        classes = controller.get_classes(active_profile_id, profile=profile)
+        subjects = controller.get_subjects(active_profile_id, profile=profile)
                 
         # Dark mode
         dark_mode = get_dark_mode(request)
@@ -52,6 +214,9 @@ async def get_base_context(request: Request):
         # Get all profiles for selector
         all_profiles = profile_manager.list_profiles()
         
+        # Unsaved changes are not in the index version yet - render fragments uncached
+        fragment_version = None if session.dirty else profile_manager.profiles_version()
+        
         return {
             "request": request,
             "classes": classes,
@@ -60,7 +225,8 @@ async def get_base_context(request: Request):
             "dark_mode": dark_mode,
             "profiles": all_profiles,
             "active_profile_id": active_profile_id,
-            "active_profile_name": profile.get("profile_name", "Default") if profile else "Default",
+            "active_profile_name": session.profile_name,
+            "fragment_version": fragment_version,
             "is_admin": True
         }
         
@@ -78,13 +244,22 @@ async def get_base_context(request: Request):
             "is_admin": True
         }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text format"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/startup-report", include_in_schema=False)
+async def get_startup_report():
+    return JSONResponse(startup_report.as_dict())
+
 @app.get("/favicon.ico", include_in_schema=False)
 async def favicon():
     return FileResponse("web/static/favicon.ico")
 
 @app.get("/", response_class=HTMLResponse)
-async def home(request: Request):
-    context = await get_base_context(request)
+async def home(request: Request, session: ProfileSession = ActiveProfile):
+    context = await get_base_context(request, session)
     return templates.TemplateResponse("index.html", context)
 
 @app.post("/generate")
@@ -101,9 +276,11 @@ async def generate(
     oibdo: str = Form(None),
     metod_rahbari: str = Form(None),
     fan_oqituvchisi: str = Form(None),
+    session: ProfileSession = ActiveProfile,
 ):
-    active_profile_id = request.cookies.get("active_profile", "default")
-    settings = settings_mgr.load()
+    active_profile_id = session.profile_id
+    settings = {**settings_mgr.defaults, **session.settings}
+    request_log.annotate(num_tasks=num_tasks, roster_size=len(session.classes.get(sinf) or ()))
     
     config = {
         "tuman": tuman or settings["tuman"],
@@ -124,7 +301,7 @@ async def generate(
             if len(max_scores) != num_tasks:
                 raise ValueError(f"{num_tasks} ta topshiriq uchun {num_tasks} ta ball kiriting")
         except:
-            context = await get_base_context(request)
+            context = await get_base_context(request, session)
             context["error"] = "Maksimal ballar noto'g'ri formatda (masalan: 10,15,20,5)"
             return templates.TemplateResponse("index.html", context)
     else:
@@ -138,28 +315,286 @@ async def generate(
         imtihon_nomi=imtihon_nomi,
         num_tasks=num_tasks,
         max_scores=max_scores,
-        output_dir=OUTPUT_DIR,
+        output_dir=output_store.profile_dir(active_profile_id),
         profile_id=active_profile_id,  # ADD THIS
         tuman=tuman,
         maktab=maktab,
         oibdo=oibdo,
         metod_rahbari=metod_rahbari,
-        fan_oqituvchisi=fan_oqituvchisi
+        fan_oqituvchisi=fan_oqituvchisi,
+        profile=session.profile
     )
 
-        file_path = result['file_path']
-        filename = os.path.basename(file_path)
+        request_log.annotate(cached=result.get('cached', False))
+        if pregenerator is not None:
+            pregenerator.remember_form(active_profile_id, chorak, imtihon_nomi, num_tasks, max_scores)
+        return workbook_response(result['file_path'])
+    except Exception as e:
+        request_log.annotate(outcome="error", error=str(e))
+        context = await get_base_context(request, session)
+        context["error"] = str(e)
+        return templates.TemplateResponse("index.html", context)
+
+def parse_max_scores(max_scores_str: str, num_tasks: int) -> list:
+    """"10,15,20" -> [10.0, 15.0, 20.0]; empty means 10 for every task"""
+    if not max_scores_str.strip():
+        return [10] * num_tasks
+    max_scores = [float(x) for x in max_scores_str.split(",") if x.strip()]
+    if len(max_scores) != num_tasks:
+        raise ValueError(f"{num_tasks} ta topshiriq uchun {num_tasks} ta ball kiriting")
+    return max_scores
 
-        return FileResponse(
-            path=file_path,
-            filename=filename,
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+@app.post("/preview", response_class=HTMLResponse)
+async def preview(
+    sinf: str = Form(...),
+    fan: str = Form(...),
+    chorak: str = Form(...),
+    imtihon_nomi: str = Form(...),
+    num_tasks: int = Form(...),
+    max_scores_str: str = Form(""),
+    tuman: str = Form(None),
+    maktab: str = Form(None),
+    oibdo: str = Form(None),
+    metod_rahbari: str = Form(None),
+    fan_oqituvchisi: str = Form(None),
+    session: ProfileSession = ActiveProfile,
+):
+    """The sheet /generate would produce, as an HTML table (no file is written)"""
+    request_log.annotate(num_tasks=num_tasks, roster_size=len(session.classes.get(sinf) or ()))
+    try:
+        max_scores = parse_max_scores(max_scores_str, num_tasks)
+    except ValueError:
+        return HTMLResponse('<p class="text-red-600">Maksimal ballar noto\'g\'ri formatda (masalan: 10,15,20,5)</p>',
+                            status_code=400)
+    try:
+        with stage("preview.render"):
+            html = controller.preview_html(
+                sinf=sinf, fan=fan, chorak=chorak, imtihon_nomi=imtihon_nomi,
+                num_tasks=num_tasks, max_scores=max_scores,
+                profile_id=session.profile_id, tuman=tuman, maktab=maktab, oibdo=oibdo,
+                metod_rahbari=metod_rahbari, fan_oqituvchisi=fan_oqituvchisi,
+                profile=session.profile,
+            )
+    except (TypeError, ValueError) as e:
+        return HTMLResponse(f'<p class="text-red-600">{escape(str(e))}</p>', status_code=400)
+    return HTMLResponse(html)
+
+@app.post("/update-workbook")
+async def update_workbook(
+    request: Request,
+    file: UploadFile = File(...),
+    sinf: str = Form(...),
+    session: ProfileSession = ActiveProfile,
+):
+    """Partly filled workbook + the class's current roster -> same workbook, rows added/removed"""
+    if not file.filename or not file.filename.lower().endswith(".xlsx"):
+        context = await get_base_context(request, session)
+        context["error"] = "Faqat .xlsx fayl!"
+        return templates.TemplateResponse("index.html", context)
+
+    contents = await file.read()
+    request_log.annotate(upload_bytes=len(contents), roster_size=len(session.classes.get(sinf) or ()))
+    try:
+        result = controller.update_excel(
+            source=BytesIO(contents),
+            filename=file.filename,
+            sinf=sinf,
+            output_dir=output_store.profile_dir(session.profile_id),
+            profile_id=session.profile_id,
+            profile=session.profile,
         )
     except Exception as e:
-        context = await get_base_context(request)
-        context["error"] = str(e)
+        request_log.annotate(outcome="error", error=str(e))
+        context = await get_base_context(request, session)
+        context["error"] = f"Faylni yangilashda xato: {str(e)}"
         return templates.TemplateResponse("index.html", context)
 
+    request_log.annotate(added=len(result["added"]), removed=len(result["removed"]),
+                         rows_written=result["rows_written"])
+    return workbook_response(result["file_path"])
+
+@app.post("/results/ingest")
+async def ingest_results(
+    file: UploadFile = File(...),
+    sinf: str = Form(...),
+    fan: str = Form(...),
+    chorak: str = Form(...),
+    oquv_yili: str = Form(None),
+    session: ProfileSession = ActiveProfile,
+):
+    """Filled workbook of one class/subject/chorak into the results store (re-upload replaces it)
+
+    oquv_yili ("2025-2026") defaults to the current school year.
+    """
+    if not file.filename or not file.filename.lower().endswith(".xlsx"):
+        return JSONResponse({"success": False, "message": "Faqat .xlsx fayl!"}, status_code=400)
+    if oquv_yili and not SCHOOL_YEAR_RE.match(oquv_yili):
+        return JSONResponse({"success": False, "message": "O'quv yili 2025-2026 ko'rinishida bo'lishi kerak"},
+                            status_code=400)
+    fan, chorak = fan.strip(), chorak.strip()
+    if chorak not in CHORAKS:
+        return JSONResponse({"success": False, "message": "Chorak 1, 2, 3 yoki 4 bo'lishi kerak"},
+                            status_code=400)
+    if sinf not in session.classes:
+        return JSONResponse({"success": False, "message": f"'{sinf}' sinfi topilmadi!"}, status_code=404)
+    if fan not in session.subjects:
+        return JSONResponse({"success": False, "message": f"'{fan}' fani profilda yo'q"}, status_code=404)
+
+    # openpyxl is only needed here - keep it out of app startup
+    from core import read_assessment_results
+
+    contents = await file.read()
+    request_log.annotate(upload_bytes=len(contents))
+    try:
+        results = await asyncio.to_thread(read_assessment_results, BytesIO(contents))
+        outcome = await asyncio.to_thread(results_store.ingest, session.profile_id, sinf,
+                                          fan, chorak, results, oquv_yili)
+    except Exception as e:
+        request_log.annotate(outcome="error", error=str(e))
+        return JSONResponse({"success": False, "message": f"Natijalarni o'qishda xato: {str(e)}"},
+                            status_code=400)
+    if outcome["status"] != "unchanged":
+        try:
+            await asyncio.to_thread(write_dataset_set, outcome["set_id"])
+        except Exception:
+            # The store has the data; POST /results/dataset/sync catches the dataset up
+            logger.exception("Results dataset update failed")
+    request_log.annotate(status=outcome["status"], students=outcome["students"])
+    return JSONResponse({"success": True, **outcome})
+
+@app.get("/results/trend")
+async def get_results_trend(fan: str, sinf: str = None, oquv_yili: str = None,
+                            session: ProfileSession = ActiveProfile):
+    """Per-chorak averages of a subject - of one class (with per-task averages) or the whole profile"""
+    if sinf:
+        trend = await asyncio.to_thread(results_store.class_trend, session.profile_id, sinf, fan, oquv_yili)
+    else:
+        trend = {"subject": fan, "school_year": oquv_yili or school_year(),
+                 "chorak": await asyncio.to_thread(results_store.subject_trend, session.profile_id,
+                                                   fan, oquv_yili)}
+    return JSONResponse({"success": True, **trend})
+
+@app.get("/results/ranking")
+async def get_results_ranking(fan: str, chorak: str, oquv_yili: str = None, limit: int = 50,
+                              session: ProfileSession = ActiveProfile):
+    """Classes of the active profile ranked by average percentage"""
+    ranking = await asyncio.to_thread(results_store.ranking, session.profile_id, fan, chorak,
+                                      max(1, min(limit, 500)), oquv_yili)
+    return JSONResponse({"success": True, "subject": fan, "chorak": chorak, "ranking": ranking})
+
+@app.get("/results/student")
+async def get_student_progress(name: str, sinf: str = None, session: ProfileSession = ActiveProfile):
+    """One student's results per subject across chorak"""
+    if not name.strip():
+        return JSONResponse({"success": False, "message": "name bo'sh bo'lmasligi kerak"}, status_code=400)
+    progress = await asyncio.to_thread(results_store.student_progress, session.profile_id, name, sinf)
+    return JSONResponse({"success": True, "name": name, "subjects": progress})
+
+def write_dataset_set(set_id: int):
+    for result_set in results_store.result_sets(set_id=set_id):
+        results_dataset.write_set(result_set, results_store.score_rows(set_id))
+
+async def forget_class_results(profile_id: str, class_names):
+    """Drop stored results of classes deleted from the profile (call after the profile is saved)"""
+    for class_name in class_names:
+        try:
+            removed = await asyncio.to_thread(results_store.delete_class, profile_id, class_name)
+            if removed:
+                await asyncio.to_thread(results_dataset.remove_sets, removed)
+        except Exception:
+            logger.exception("Could not remove results of %s/%s", profile_id, class_name)
+
+def _values(param: str = None) -> list:
+    """"a,b" query parameter -> ["a", "b"]"""
+    return [value.strip() for value in (param or "").split(",") if value.strip()]
+
+def has_dataset_token(request: Request) -> bool:
+    """X-Dataset-Token matches TAHLILCHI_DATASET_TOKEN (never when no token is configured)"""
+    supplied = request.headers.get(DATASET_TOKEN_HEADER, "")
+    return bool(DATASET_TOKEN) and hmac.compare_digest(supplied.encode(), DATASET_TOKEN.encode())
+
+def dataset_profiles(request: Request, session: ProfileSession) -> list:
+    """profile_id filter of a dataset query: the active profile, any with the dataset token"""
+    requested = _values(request.query_params.get("profile_id"))
+    if has_dataset_token(request):
+        return requested
+    if requested and requested != [session.profile_id]:
+        raise PermissionError("Boshqa profillar natijalari uchun ruxsat yo'q")
+    return [session.profile_id]
+
+def dataset_query(request: Request, profile_ids: list, limit: int = None):
+    """Run a dataset query from ?columns=&group_by=&oquv_yili=&chorak=&fan=&sinf=&task="""
+    params = request.query_params
+    filters = {"school_year": _values(params.get("oquv_yili")), "chorak": _values(params.get("chorak")),
+               "subject": _values(params.get("fan")), "class_name": _values(params.get("sinf")),
+               "profile_id": profile_ids, "task": _values(params.get("task"))}
+    return results_dataset.query(columns=_values(params.get("columns")) or None, filters=filters,
+                                 group_by=_values(params.get("group_by")), limit=limit)
+
+@app.get("/results/dataset/query")
+async def query_results_dataset(request: Request, limit: int = 1000,
+                                session: ProfileSession = ActiveProfile):
+    """Student x task rows (or group_by= aggregates) from the Parquet dataset
+
+    Only the active profile's rows, unless the X-Dataset-Token header
+    matches TAHLILCHI_DATASET_TOKEN - then profile_id= may select any
+    profiles (all when omitted). columns= and every filter take
+    comma-separated values; filters on oquv_yili, chorak and fan only
+    open the matching partitions.
+    """
+    started = time.perf_counter()
+    try:
+        profile_ids = dataset_profiles(request, session)
+        frame = await asyncio.to_thread(dataset_query, request, profile_ids, max(1, min(limit, 100000)))
+    except PermissionError as e:
+        return JSONResponse({"success": False, "message": str(e)}, status_code=403)
+    except ImportError:
+        return JSONResponse({"success": False, "message": "pyarrow o'rnatilmagan"}, status_code=503)
+    except ValueError as e:
+        return JSONResponse({"success": False, "message": str(e)}, status_code=400)
+    request_log.annotate(rows=len(frame))
+    return JSONResponse({"success": True, "columns": list(frame.columns),
+                         "rows": json.loads(frame.to_json(orient="records", force_ascii=False)),
+                         "took_ms": round((time.perf_counter() - started) * 1000, 2)})
+
+@app.get("/results/dataset/export")
+async def export_results_dataset(request: Request, session: ProfileSession = ActiveProfile):
+    """Same selection as /results/dataset/query as one Parquet file, at most EXPORT_MAX_ROWS rows"""
+    try:
+        profile_ids = dataset_profiles(request, session)
+        # One row over the cap is enough to tell it was exceeded
+        frame = await asyncio.to_thread(dataset_query, request, profile_ids, EXPORT_MAX_ROWS + 1)
+        if len(frame) > EXPORT_MAX_ROWS:
+            return JSONResponse({"success": False,
+                                 "message": f"Eksport {EXPORT_MAX_ROWS} qatordan oshadi - filtrlarni toraytiring"},
+                                status_code=413)
+        buffer = BytesIO()
+        await asyncio.to_thread(frame.to_parquet, buffer, engine="pyarrow", index=False)
+    except PermissionError as e:
+        return JSONResponse({"success": False, "message": str(e)}, status_code=403)
+    except ImportError:
+        return JSONResponse({"success": False, "message": "pyarrow o'rnatilmagan"}, status_code=503)
+    except ValueError as e:
+        return JSONResponse({"success": False, "message": str(e)}, status_code=400)
+    request_log.annotate(rows=len(frame), bytes=buffer.tell())
+    return Response(buffer.getvalue(), media_type="application/vnd.apache.parquet",
+                    headers={"Content-Disposition": 'attachment; filename="natijalar.parquet"'})
+
+@app.post("/results/dataset/sync")
+async def sync_results_dataset(request: Request, oquv_yili: str = None):
+    """Rewrite missing and drop stale dataset files (after a failed write or a manual restore)
+
+    Touches every profile's files, so it needs the X-Dataset-Token header.
+    """
+    if not has_dataset_token(request):
+        return JSONResponse({"success": False, "message": "Dataset sinxronlash uchun ruxsat yo'q"},
+                            status_code=403)
+    try:
+        report = await asyncio.to_thread(results_dataset.sync, results_store, oquv_yili)
+    except ImportError:
+        return JSONResponse({"success": False, "message": "pyarrow o'rnatilmagan"}, status_code=503)
+    return JSONResponse({"success": True, **report})
+
 @app.post("/save-settings")
 async def save_settings(
     request: Request,
@@ -168,9 +603,9 @@ async def save_settings(
     oibdo: str = Form(None),
     metod_rahbari: str = Form(None),
     fan_oqituvchisi: str = Form(None),
+    session: ProfileSession = ActiveProfile,
 ):
     """Save settings to ACTIVE PROFILE"""
-    active_profile_id = request.cookies.get("active_profile", "default")
     
     # Validation
     if not tuman or not maktab:
@@ -180,7 +615,7 @@ async def save_settings(
         )
     
     try:
-        profile = profile_manager.get_profile(active_profile_id)
+        profile = session.profile
         if not profile:
             return JSONResponse(
                 {"success": False, "message": "Profil topilmadi"}
@@ -196,7 +631,8 @@ async def save_settings(
             "output_dir": profile["settings"].get("output_dir", "outputs")
         }
         
-        profile_manager.update_profile_settings(active_profile_id, new_settings)
+        profile["settings"] = new_settings
+        session.mark_dirty()
         
         # Also update global settings.json for backward compatibility
         settings_mgr.save(new_settings)
@@ -251,12 +687,12 @@ async def save_profile_settings(
     oibdo: str = Form(None),
     metod_rahbari: str = Form(None),
     fan_oqituvchisi: str = Form(None),
-    output_dir: str = Form(None)
+    output_dir: str = Form(None),
+    session: ProfileSession = ActiveProfile,
 ):
     """Save settings for active profile"""
     try:
-        active_profile_id = request.cookies.get("active_profile", "default")
-        profile = profile_manager.get_profile(active_profile_id)
+        profile = session.profile
         
         if not profile:
             return JSONResponse({"success": False, "message": "Profil topilmadi"})
@@ -271,7 +707,7 @@ async def save_profile_settings(
             "output_dir": output_dir or profile["settings"].get("output_dir", "outputs")
         }
         
-        profile_manager.save_profile(active_profile_id, profile)
+        session.mark_dirty()
         return JSONResponse({"success": True, "message": "Sozlamalar saqlandi"})
         
     except Exception as e:
@@ -292,33 +728,40 @@ async def switch_profile(request: Request):
 
 
 @app.get("/profile/master-data")
-async def get_master_data():
+async def get_master_data(request: Request):
     """Get all available subjects and classes for selection"""
-    subjects = profile_manager.get_master_subjects()
-    classes = list(profile_manager.get_master_classes().keys())
+    etag = make_etag("master-data", profile_manager.master.etag())
     
-    return JSONResponse({
-        "success": True,
-        "subjects": subjects,
-        "classes": classes
-    })
+    def build():
+        return {
+            "success": True,
+            "subjects": profile_manager.get_master_subjects(),
+            "classes": list(profile_manager.get_master_classes().keys())
+        }
+    
+    return cached_json(request, etag, build)
 
 # 4. Add subject to profile
 @app.post("/profile/add-subject")
-async def add_subject(request: Request):
+async def add_subject(request: Request, session: ProfileSession = ActiveProfile):
     """Add subject to active profile"""
     try:
         data = await request.json()
         subject = data.get("subject", "").strip()
-        active_profile_id = request.cookies.get("active_profile", "default")
         
         if not subject:
             return JSONResponse({"success": False, "message": "Fan nomi kerak"})
         
-        # Add to profile
-        success = profile_manager.add_subject_to_profile(active_profile_id, subject)
-        
-        if success:
+        profile = session.profile
+        if profile:
+            subjects = profile["data"]["subjects"]
+            if subject not in subjects:
+                subjects.append(subject)
+                subjects.sort()
+                session.mark_dirty()
+            # Profile first: a failed save must not leave master data changed
+            session.flush()
+            profile_manager.add_to_master_subjects([subject])
             return JSONResponse({
                 "success": True, 
                 "message": f"'{subject}' fani profilga qo'shildi",
@@ -332,19 +775,20 @@ async def add_subject(request: Request):
 
 # 5. Remove subject from profile
 @app.post("/profile/remove-subject")
-async def remove_subject(request: Request):
+async def remove_subject(request: Request, session: ProfileSession = ActiveProfile):
     """Remove subject from active profile"""
     try:
         data = await request.json()
         subject = data.get("subject", "").strip()
-        active_profile_id = request.cookies.get("active_profile", "default")
         
         if not subject:
             return JSONResponse({"success": False, "message": "Fan nomi kerak"})
         
-        success = profile_manager.remove_subject_from_profile(active_profile_id, subject)
-        
-        if success:
+        profile = session.profile
+        if profile:
+            if subject in profile["data"]["subjects"]:
+                profile["data"]["subjects"].remove(subject)
+                session.mark_dirty()
             return JSONResponse({
                 "success": True, 
                 "message": f"'{subject}' fani profildan olib tashlandi"
@@ -357,22 +801,24 @@ async def remove_subject(request: Request):
 
 # 6. Add new subject to master
 @app.post("/profile/create-subject")
-async def create_subject(request: Request):
+async def create_subject(request: Request, session: ProfileSession = ActiveProfile):
     """Create new subject in master and add to active profile"""
     try:
         data = await request.json()
         subject = data.get("subject", "").strip()
-        active_profile_id = request.cookies.get("active_profile", "default")
         
         if not subject:
             return JSONResponse({"success": False, "message": "Fan nomi kerak"})
         
-        # Add to master
+        # Add to active profile, then to master
+        profile = session.profile
+        if profile and subject not in profile["data"]["subjects"]:
+            profile["data"]["subjects"].append(subject)
+            profile["data"]["subjects"].sort()
+            session.mark_dirty()
+        session.flush()
         profile_manager.add_to_master_subjects([subject])
         
-        # Add to active profile
-        profile_manager.add_subject_to_profile(active_profile_id, subject)
-        
         return JSONResponse({
             "success": True, 
             "message": f"'{subject}' fani yaratildi va profilga qo'shildi",
@@ -382,6 +828,27 @@ async def create_subject(request: Request):
     except Exception as e:
         return JSONResponse({"success": False, "message": str(e)})
 
+@app.post("/profile/batch")
+async def batch_profile_operations(request: Request, session: ProfileSession = ActiveProfile):
+    """Ordered admin panel operations on the active profile, saved once
+
+    Body: {"operations": [{"op": "add_subject", "subject": "..."},
+                          {"op": "delete_class", "class": "..."}, ...],
+           "atomic": true}
+    op is add_subject, remove_subject, create_subject or delete_class.
+    """
+    try:
+        operations, atomic = parse_operations(await request.json())
+        classes_before = set(session.classes)
+        result = apply_batch(session, profile_manager, operations, atomic)
+    except BatchError as e:
+        return JSONResponse({"success": False, "message": str(e)}, status_code=400)
+    except ValueError:
+        return JSONResponse({"success": False, "message": "JSON noto'g'ri"}, status_code=400)
+    await forget_class_results(session.profile_id, sorted(classes_before - set(session.classes)))
+    request_log.annotate(operations=len(operations), failed=result["failed"])
+    return JSONResponse(result)
+
 @app.get("/profile/{profile_id}")
 async def get_profile_details(profile_id: str):
     profile = profile_manager.get_profile(profile_id)
@@ -403,42 +870,122 @@ async def get_profile_details(profile_id: str):
         }
     })
 
+def profile_validators(profile_id: str, *extra):
+    """(etag, last_modified) of a profile; master data included for shared rosters
+
+    Last-Modified is the later of the profile and the master files, so a
+    client revalidating with If-Modified-Since alone still sees master edits.
+    """
+    stamp = profile_manager.get_profile_stamp(profile_id)
+    if stamp is None:
+        return None, None
+    resolved_id, last_modified = stamp
+    etag = make_etag(resolved_id, last_modified, profile_manager.master.etag(), *extra)
+    modified = parse_timestamp(last_modified)
+    master_modified = profile_manager.master.last_modified()
+    if master_modified is not None:
+        master_modified = datetime.fromtimestamp(master_modified, timezone.utc)
+        modified = max(modified, master_modified) if modified is not None else master_modified
+    return etag, modified
+
+@app.get("/api/students/search")
+async def search_students(request: Request, q: str = "", scope: str = "profile",
+                          profile_id: str = None, limit: int = 20):
+    """Students whose name contains every word of ?q= (apostrophe and case insensitive)
+
+    scope=profile searches the active (or ?profile_id=) profile, scope=all every profile,
+    ranked together; a master-roster student is listed once with all its profiles.
+    """
+    if not q.strip():
+        return JSONResponse({"success": False, "message": "q bo'sh bo'lmasligi kerak"}, status_code=400)
+    if scope not in ("profile", "all"):
+        return JSONResponse({"success": False, "message": "scope: profile yoki all"}, status_code=400)
+    limit = max(1, min(limit, 100))
+    if scope == "all":
+        profile_ids = [p["profile_id"] for p in profile_manager.list_profiles()]
+    else:
+        profile_ids = [profile_id or request.cookies.get("active_profile") or "default"]
+
+    def run():
+        with stage("search.query"):
+            return student_search.search(q, profile_ids, limit, missing_ok=scope == "all")
+
+    started = time.perf_counter()
+    try:
+        # Index builds read profile files - keep them off the event loop
+        results = await asyncio.to_thread(run)
+    except KeyError:
+        return JSONResponse({"success": False, "message": "Profil topilmadi"}, status_code=404)
+    return JSONResponse({"success": True, "query": q, "results": results,
+                         "took_ms": round((time.perf_counter() - started) * 1000, 2)})
+
 @app.get("/profile/{profile_id}/data")
-async def get_profile_data(profile_id: str):
-    """Get profile data (subjects and classes)"""
-    profile = profile_manager.get_profile(profile_id)
-    if not profile:
+async def get_profile_data(request: Request, profile_id: str, fields: str = "students",
+                           cursor: str = None, limit: int = None):
+    """Get profile data (subjects and classes)
+
+    ?fields=students|counts|names, ?limit= and ?cursor= page through classes.
+    """
+    try:
+        fields, limit = parse_roster_query(fields, limit)
+    except ValueError as e:
+        return JSONResponse({"success": False, "message": str(e)}, status_code=400)
+    
+    etag, last_modified = profile_validators(profile_id, "data", fields, cursor, limit)
+    if etag is None:
         return JSONResponse({"success": False, "message": "Profil topilmadi"})
     
-    return JSONResponse({
-        "success": True,
-        "data": profile.get("data", {}),
-        "settings": profile.get("settings", {})
-    })
+    def build():
+        model = profile_manager.get_profile_model(profile_id, fallback=True)
+        page = build_classes_page(profile_manager.iter_classes(profile_id, cursor), fields, limit)
+        return {
+            "success": True,
+            "data": {"classes": page["classes"], "subjects": list(model.subjects)},
+            "settings": model.settings.to_dict(),
+            **({"next_cursor": page["next_cursor"]} if "next_cursor" in page else {})
+        }
+    
+    return cached_json(request, etag, build, last_modified)
 
 @app.get("/profile/{profile_id}/classes")
-async def get_profile_classes(profile_id: str):
-    """Get classes from specific profile"""
-    profile = profile_manager.get_profile(profile_id)
-    if not profile:
+async def get_profile_classes(request: Request, profile_id: str, fields: str = "students",
+                              cursor: str = None, limit: int = None, format: str = "json"):
+    """Get classes from specific profile
+
+    ?fields=students|counts|names, ?limit= and ?cursor= page through classes,
+    ?format=ndjson streams one class per line.
+    """
+    try:
+        fields, limit = parse_roster_query(fields, limit)
+    except ValueError as e:
+        return JSONResponse({"success": False, "message": str(e)}, status_code=400)
+    
+    etag, last_modified = profile_validators(profile_id, "classes", fields, cursor, limit, format)
+    if etag is None:
         return JSONResponse({"success": False, "message": "Profil topilmadi"})
     
-    return JSONResponse({
-        "success": True,
-        "classes": profile.get("data", {}).get("classes", {})
-    })
+    rosters = profile_manager.iter_classes(profile_id, cursor)
+    if format == "ndjson":
+        return ndjson_response(request, etag, rosters, fields, limit)
+    
+    def build():
+        return {"success": True, **build_classes_page(rosters, fields, limit)}
+    
+    return cached_json(request, etag, build, last_modified)
 
 @app.post("/profile/{profile_id}/delete-class")
-async def delete_class_from_profile(profile_id: str, class_name: str = Form(...)):
+async def delete_class_from_profile(class_name: str = Form(...), session: ProfileSession = PathProfile):
     """Delete class from profile"""
     try:
-        profile = profile_manager.get_profile(profile_id)
+        profile = session.profile
         if not profile:
             return JSONResponse({"success": False, "message": "Profil topilmadi"})
         
         if class_name in profile["data"]["classes"]:
             del profile["data"]["classes"][class_name]
-            profile_manager.save_profile(profile_id, profile)
+            session.mark_dirty()
+            session.flush()
+            await forget_class_results(session.profile_id, [class_name])
             
             return JSONResponse({
                 "success": True,
@@ -458,8 +1005,13 @@ async def delete_class_from_profile(profile_id: str, class_name: str = Form(...)
 async def extract_class_name(file: UploadFile = File(...)):
     """Extract class name from journal file"""
     try:
+        # pandas is imported on first upload, not at startup
+        import pandas as pd
+        
         contents = await file.read()
-        df = pd.read_excel(BytesIO(contents), header=None)
+        request_log.annotate(upload_bytes=len(contents))
+        with stage("upload.read_excel"):
+            df = pd.read_excel(BytesIO(contents), header=None)
         
         # Extract class name from A2 cell
         sinf_cell = df.iloc[1, 0] if df.shape[0] > 1 else None
@@ -481,20 +1033,21 @@ async def extract_class_name(file: UploadFile = File(...)):
         return JSONResponse({"success": False, "message": str(e)})
 
 @app.get("/admin-upload", response_class=HTMLResponse)
-async def admin_upload_page(request: Request):
-    context = await get_base_context(request)
+async def admin_upload_page(request: Request, session: ProfileSession = ActiveProfile):
+    context = await get_base_context(request, session)
     return templates.TemplateResponse("admin_upload.html", context)
 
 @app.get("/journal-upload", response_class=HTMLResponse)
-async def journal_upload_page(request: Request):
-    context = await get_base_context(request)
+async def journal_upload_page(request: Request, session: ProfileSession = ActiveProfile):
+    context = await get_base_context(request, session)
     return templates.TemplateResponse("journal_upload.html", context)
 
 # web/main.py - admin_upload endpoint ni yangilang:
 @app.post("/admin-upload")
-async def admin_upload(request: Request, file: UploadFile = File(...)):
-    context = await get_base_context(request)
-    active_profile_id = request.cookies.get("active_profile", "default")
+async def admin_upload(request: Request, file: UploadFile = File(...),
+                       dry_run: bool = Form(False), remove_missing: bool = Form(False),
+                       session: ProfileSession = ActiveProfile):
+    context = await get_base_context(request, session)
     
     filename = file.filename.lower() if file.filename else ""
     allowed_extensions = ('.xls', '.xlsx', '.html', '.htm')
@@ -504,65 +1057,58 @@ async def admin_upload(request: Request, file: UploadFile = File(...)):
         return templates.TemplateResponse("admin_upload.html", context)
 
     contents = await file.read()
+    request_log.annotate(upload_bytes=len(contents))
 
     try:
-
-        if b'<html' in contents.lower()[:100] or filename.endswith(('.html', '.htm')):
-            html_text = contents.decode('utf-8', errors='ignore')
-            df_list: list[pd.DataFrame] = pd.read_html(StringIO(html_text), flavor='lxml')
-        else:
-            engine = 'openpyxl' if filename.endswith('.xlsx') else 'xlrd'
-            df = pd.read_excel(BytesIO(contents), header=None, engine=engine)
-            df_list: list[pd.DataFrame] = [df]
-
-        if len(df_list) == 0:
-            context["error"] = "Jadval topilmadi!"
-            return templates.TemplateResponse("admin_upload.html", context)
-
-        df = df_list[0]
-        df_data = df.iloc[2:].copy()
-        df_data.reset_index(drop=True, inplace=True)
-
-        if df_data.shape[1] < 6:
-            context["error"] = "Jadvalda yetarli ustun yo'q (kamida 6 ta bo'lishi kerak)"
-            return templates.TemplateResponse("admin_upload.html", context)
-
-        names_series = df_data.iloc[:, 1].dropna()
-        classes_series = df_data.iloc[:, 5].dropna()
-
-
-        min_len = min(len(names_series), len(classes_series))
-        names = names_series.iloc[:min_len].astype(str).str.strip().tolist()
-        classes = classes_series.iloc[:min_len].astype(str).str.strip().tolist()
-
-        new_classes = {}
-        total_students = 0
-        
-        for name, sinf in zip(names, classes):
-            if name.lower() == "nan" or sinf.lower() == "nan":
-                continue
-            name = name.strip()
-            sinf = sinf.strip()
-            if name and sinf:
-                if sinf not in new_classes:
-                    new_classes[sinf] = []
-                if name not in new_classes[sinf]:
-                    new_classes[sinf].append(name)
-                    total_students += 1
+        new_classes = read_admin_export(contents, filename)
+        total_students = sum(len(students) for students in new_classes.values())
 
         # ACTIVE PROFILE GA SAQLASH
-        profile = profile_manager.get_profile(active_profile_id)
+        profile = session.profile
         if not profile:
             context["error"] = "Profil topilmadi!"
             return templates.TemplateResponse("admin_upload.html", context)
         
-        profile["data"]["classes"] = new_classes
-        profile_manager.save_profile(active_profile_id, profile)
+        merged, report = merge_rosters(session.classes, new_classes, remove_missing)
+        changed = report["changed"]
+        request_log.annotate(roster_size=total_students, classes=len(new_classes),
+                             changed_classes=len(changed), dry_run=dry_run)
+        context["merge_report"] = report
+        context["dry_run"] = dry_run
+        
+        if dry_run:
+            context["success"] = f"Sinov: {len(changed)} ta sinf o'zgaradi, hech narsa saqlanmadi"
+            return templates.TemplateResponse("admin_upload.html", context)
+        if not changed:
+            # Same roster as last time - the profile file is not rewritten
+            context["success"] = f"O'zgarish yo'q: {len(new_classes)} ta sinf va {total_students} ta o'quvchi profildagi bilan bir xil"
+            return templates.TemplateResponse("admin_upload.html", context)
+        
+        profile["data"]["classes"] = merged
+        session.mark_dirty()
+        session.flush()
+        await forget_class_results(session.profile_id,
+                                   [name for name in changed if name not in merged])
+        if profile.get("meta", {}).get("is_master"):
+            # The master profile's import is the school roster - master data follows it,
+            # profiles referencing a changed class keep their own copy
+            await asyncio.to_thread(profile_manager.update_master_classes,
+                                    {name: merged[name] for name in changed if name in merged})
+        if pregenerator is not None:
+            # Jobs start after this request saved the profile and the app went idle
+            pregenerator.schedule(session.profile_id, [name for name in changed if name in merged])
+        context.update(await get_base_context(request, session))
 
-        context["success"] = f"{len(new_classes)} ta sinf va {total_students} ta o'quvchi profilga yuklandi!"
+        context["success"] = (f"{len(changed)} ta sinf yangilandi "
+                              f"(+{report['totals']['added']} / -{report['totals']['removed']} o'quvchi), "
+                              f"profilda {report['totals']['classes']} ta sinf va {report['totals']['students']} ta o'quvchi")
         return templates.TemplateResponse("admin_upload.html", context)
 
+    except RosterFormatError as e:
+        context["error"] = str(e)
+        return templates.TemplateResponse("admin_upload.html", context)
     except Exception as e:
+        request_log.annotate(outcome="error", error=str(e))
         context["error"] = f"Fayl o'qishda xato: {str(e)}"
         return templates.TemplateResponse("admin_upload.html", context)
     
@@ -580,18 +1126,24 @@ async def journal_upload(
     oibdo: str = Form(None),
     metod_rahbari: str = Form(None),
     fan_oqituvchisi: str = Form(None),
+    session: ProfileSession = ActiveProfile,
 ):
-    context = await get_base_context(request)
-    active_profile_id = request.cookies.get("active_profile", "default")
+    context = await get_base_context(request, session)
+    active_profile_id = session.profile_id
     
     if not file.filename or not file.filename.lower().endswith(('.xls', '.xlsx')):
         context["error"] = "Faqat .xls yoki .xlsx fayl!"
         return templates.TemplateResponse("journal_upload.html", context)
 
     contents = await file.read()
+    request_log.annotate(upload_bytes=len(contents), num_tasks=num_tasks)
 
     try:
-        df = pd.read_excel(BytesIO(contents), header=None)
+        # pandas is imported on first upload, not at startup
+        import pandas as pd
+        
+        with stage("upload.read_excel"):
+            df = pd.read_excel(BytesIO(contents), header=None)
     except Exception as e:
         context["error"] = f"Fayl o'qilmadi: {str(e)}"
         return templates.TemplateResponse("journal_upload.html", context)
@@ -610,15 +1162,19 @@ async def journal_upload(
         context["error"] = "O'quvchilar topilmadi (B11 dan pastga tekshiring)"
         return templates.TemplateResponse("journal_upload.html", context)
 
+    request_log.annotate(roster_size=len(students))
+
     # Bazaga saqlash - ACTIVE PROFILE GA
-    profile = profile_manager.get_profile(active_profile_id)
+    profile = session.profile
     if not profile:
         context["error"] = "Profil topilmadi!"
         return templates.TemplateResponse("journal_upload.html", context)
     
     # Yangi sinfni profile ga qo'shish
     profile["data"]["classes"][sinf_name] = students
-    profile_manager.save_profile(active_profile_id, profile)
+    session.mark_dirty()
+    if pregenerator is not None:
+        pregenerator.schedule(active_profile_id, [sinf_name], chorak)
 
     # max_scores parse
     if max_scores_str.strip():
@@ -644,47 +1200,40 @@ async def journal_upload(
             imtihon_nomi=imtihon_nomi,
             num_tasks=num_tasks,
             max_scores=max_scores,
-            output_dir=OUTPUT_DIR,
+            output_dir=output_store.profile_dir(active_profile_id),
             profile_id=active_profile_id,  # <- ADD THIS
             tuman=tuman,
             maktab=maktab,
             oibdo=oibdo,
             metod_rahbari=metod_rahbari,
-            fan_oqituvchisi=fan_oqituvchisi
+            fan_oqituvchisi=fan_oqituvchisi,
+            profile=profile
         )
         
-        file_path = result['file_path']
-        filename = os.path.basename(file_path)
-
-        return FileResponse(
-            path=file_path,
-            filename=filename,
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
+        if pregenerator is not None:
+            pregenerator.remember_form(active_profile_id, chorak, imtihon_nomi, num_tasks, max_scores)
+        return workbook_response(result['file_path'])
     except Exception as e:
+        request_log.annotate(outcome="error", error=str(e))
         context["error"] = f"Excel yaratishda xato: {str(e)}"
         return templates.TemplateResponse("journal_upload.html", context)
     
 @app.get("/admin")
-async def admin_panel(request: Request):
-    context = await get_base_context(request)
-    active_profile_id = request.cookies.get("active_profile", "default")
-    
-    profile = profile_manager.get_profile(active_profile_id)
-    classes = profile["data"]["classes"] if profile else {}
+async def admin_panel(request: Request, session: ProfileSession = ActiveProfile):
+    context = await get_base_context(request, session)
     
     context.update({
-        "page_title": f"Admin Panel - {profile['profile_name'] if profile else 'Default'}",
-        "classes": classes,
-        "subjects": controller.get_subjects(active_profile_id)
+        "page_title": f"Admin Panel - {session.profile_name}",
+        "classes": session.classes,
+        "subjects": controller.get_subjects(session.profile_id, profile=session.profile)
     })
     return templates.TemplateResponse("admin_panel.html", context)
 
 @app.post("/admin/delete-class")
-async def delete_class(request: Request, sinf_nomi: str = Form(...)):
+async def delete_class(request: Request, sinf_nomi: str = Form(...),
+                       session: ProfileSession = ActiveProfile):
     try:
-        active_profile_id = request.cookies.get("active_profile", "default")
-        profile = profile_manager.get_profile(active_profile_id)
+        profile = session.profile
         
         if not profile:
             return JSONResponse({"success": False, "message": "Profil topilmadi"})
@@ -692,7 +1241,9 @@ async def delete_class(request: Request, sinf_nomi: str = Form(...)):
         if sinf_nomi in profile["data"]["classes"]:
             # Remove class from profile
             del profile["data"]["classes"][sinf_nomi]
-            profile_manager.save_profile(active_profile_id, profile)
+            session.mark_dirty()
+            session.flush()
+            await forget_class_results(session.profile_id, [sinf_nomi])
             
             return JSONResponse({
                 "success": True,
@@ -748,6 +1299,43 @@ async def delete_subject(request: Request, fan_nomi: str = Form(...)):
     })
 
 
+@app.get("/admin/outputs")
+async def get_outputs_usage():
+    """Disk usage of outputs/ and the last sweep report"""
+    usage = await asyncio.to_thread(output_store.usage)
+    return JSONResponse({"success": True, "usage": usage, "last_sweep": output_store.last_report})
+
+@app.post("/admin/outputs/sweep")
+async def sweep_outputs():
+    """Run the retention/quota sweep now"""
+    report = await asyncio.to_thread(output_store.sweep)
+    return JSONResponse({"success": True, "report": report})
+
+@app.get("/admin/pregeneration")
+async def get_pregeneration_status():
+    """Generation cache usage and the background warmer's queue/counters"""
+    cache = await asyncio.to_thread(generation_cache.usage) if generation_cache is not None else None
+    warmer = pregenerator.status() if pregenerator is not None else None
+    return JSONResponse({"success": True, "cache": cache, "pregeneration": warmer})
+
+if request_profiler is not None:
+    @app.get("/admin/profiles", include_in_schema=False)
+    async def list_profile_reports(request: Request):
+        """Saved profiling reports, newest first"""
+        if not request_profiler.authorized(request.headers, request.query_params):
+            return JSONResponse({"success": False, "error": "Forbidden"}, status_code=403)
+        return JSONResponse({"success": True, "reports": request_profiler.list_reports()})
+
+    @app.get("/admin/profiles/{name}", include_in_schema=False)
+    async def download_profile_report(request: Request, name: str):
+        if not request_profiler.authorized(request.headers, request.query_params):
+            return JSONResponse({"success": False, "error": "Forbidden"}, status_code=403)
+        path = request_profiler.report_path(name)
+        if path is None:
+            return JSONResponse({"success": False, "error": "Report not found"}, status_code=404)
+        media_type = "text/plain; charset=utf-8" if name.endswith(".txt") else "application/octet-stream"
+        return FileResponse(path, filename=name, media_type=media_type)
+
 # Yangi: Dark mode sozlamasini saqlash uchun endpoint
 @app.post("/toggle-dark-mode")
 async def toggle_dark_mode(request: Request):
@@ -760,19 +1348,21 @@ async def toggle_dark_mode(request: Request):
 
 # Yangi: Sinf va fanlar ro'yxatini JSON formatida olish (AJAX uchun)
 @app.get("/api/classes")
-async def get_classes_api():
-    classes = controller.get_classes()
-    return JSONResponse({"classes": classes})
+async def get_classes_api(request: Request):
+    etag, last_modified = profile_validators("default", "api-classes")
+    return cached_json(request, etag or make_etag("api-classes"),
+                       lambda: {"classes": controller.get_classes()}, last_modified)
 
 @app.get("/api/subjects")
-async def get_subjects_api():
-    subjects = controller.get_subjects()
-    return JSONResponse({"subjects": subjects})
+async def get_subjects_api(request: Request):
+    etag, last_modified = profile_validators("default", "api-subjects")
+    return cached_json(request, etag or make_etag("api-subjects"),
+                       lambda: {"subjects": controller.get_subjects()}, last_modified)
 
 @app.get("/api/settings")
-async def get_settings_api():
-    settings = settings_mgr.load()
-    return JSONResponse(settings)
+async def get_settings_api(request: Request):
+    etag = make_etag("api-settings", settings_mgr.version())
+    return cached_json(request, etag, settings_mgr.load)
 
 static_dir = "web/static"
 if os.path.exists(static_dir):
@@ -0,0 +1,64 @@
+# web/roster_api.py
+import json
+from itertools import islice
+from typing import Iterable, Iterator, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+from web.http_cache import DEFAULT_CACHE_CONTROL, is_not_modified
+
+# students - full rosters, counts - number of students, names - class names only
+ROSTER_FIELDS = ("students", "counts", "names")
+MAX_PAGE_SIZE = 500
+
+
+def parse_roster_query(fields: str, limit: Optional[int]) -> Tuple[str, Optional[int]]:
+    """Validate ?fields= and ?limit=, raises ValueError with a user message"""
+    if fields not in ROSTER_FIELDS:
+        raise ValueError(f"fields quyidagilardan biri bo'lishi kerak: {', '.join(ROSTER_FIELDS)}")
+    if limit is not None:
+        if limit <= 0:
+            raise ValueError("limit musbat son bo'lishi kerak")
+        limit = min(limit, MAX_PAGE_SIZE)
+    return fields, limit
+
+
+def build_classes_page(rosters: Iterable, fields: str, limit: Optional[int]) -> dict:
+    """One page of classes; next_cursor is set when more classes follow"""
+    rosters = iter(rosters)
+    page = list(islice(rosters, limit)) if limit else list(rosters)
+
+    if fields == "names":
+        classes = [name for name, _ in page]
+    elif fields == "counts":
+        classes = {name: len(students) for name, students in page}
+    else:
+        classes = {name: students for name, students in page}
+
+    result = {"classes": classes}
+    if limit:
+        has_more = next(rosters, None) is not None
+        result["next_cursor"] = page[-1][0] if page and has_more else None
+    return result
+
+
+def _ndjson_lines(rosters: Iterable, fields: str, limit: Optional[int]) -> Iterator[bytes]:
+    for name, students in islice(rosters, limit) if limit else rosters:
+        if fields == "names":
+            line = {"class": name}
+        elif fields == "counts":
+            line = {"class": name, "count": len(students)}
+        else:
+            line = {"class": name, "students": students}
+        yield json.dumps(line, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def ndjson_response(request: Request, etag: str, rosters: Iterable,
+                    fields: str, limit: Optional[int]) -> Response:
+    """Stream one class per line, rosters are resolved while writing"""
+    headers = {"ETag": etag, "Cache-Control": DEFAULT_CACHE_CONTROL}
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return StreamingResponse(_ndjson_lines(rosters, fields, limit),
+                             media_type="application/x-ndjson", headers=headers)